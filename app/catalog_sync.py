@@ -0,0 +1,304 @@
+"""
+Medusa catalog sync.
+
+Copies the store's products into the local products table, with each variant's
+color already extracted (hex and CIELAB), so recommendations never call Medusa on
+the request path. Incremental: only products updated since the newest one stored
+(the updated_at watermark) are fetched, and the first page is requested with
+If-None-Match so an unchanged catalog costs a single 304. Pages are keyset-paged
+on (updated_at, id), so products edited mid-sync cannot shift a page boundary and
+be skipped, and each page is fetched while the previous one is stored. On
+PostgreSQL, syncs from different processes run one at a time (advisory lock).
+
+Usage:
+    python -m app.catalog_sync          # Incremental sync
+    python -m app.catalog_sync --full   # Refetch everything and drop products Medusa no longer has
+"""
+
+import argparse
+import asyncio
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from .color import hex_to_lab
+from . import metrics
+from .config import settings
+from .database import AsyncSessionLocal, dialect_insert
+from .models import Product
+
+HEX_COLOR = re.compile(r"^#[0-9A-Fa-f]{6}$")
+PRODUCT_FIELDS = "id,title,handle,thumbnail,updated_at,metadata,*variants"
+SYNC_LOCK_KEY = 0x70616C65  # pg advisory lock held by the transaction that is syncing
+
+
+def _metadata_hex(metadata: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Product color from Medusa metadata: primary_color (see rules/README.md), color_hex or hex"""
+    metadata = metadata or {}
+    for candidate in (
+        (metadata.get("color_analysis") or {}).get("primary_color"),
+        metadata.get("primary_color"),
+        metadata.get("color_hex"),
+        metadata.get("hex"),
+    ):
+        if isinstance(candidate, str) and HEX_COLOR.match(candidate):
+            return candidate.upper()
+    return None
+
+
+def product_colors(product: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """One {variant_id, hex} per colored variant (variant metadata, falling back to the product's)"""
+    product_hex = _metadata_hex(product.get("metadata"))
+    colors = []
+    for variant in product.get("variants") or [{}]:
+        hex_value = _metadata_hex(variant.get("metadata")) or product_hex
+        if hex_value:
+            colors.append({"variant_id": variant.get("id"), "hex": hex_value})
+    return colors
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Medusa ISO timestamp ('2026-09-02T10:00:00.000Z') -> aware datetime"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def format_timestamp(value: datetime) -> str:
+    """Aware or naive-UTC datetime (SQLite drops the zone) -> Medusa filter value"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def product_rows(products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """products table rows for a page of Medusa products - CIELAB for every color in one pass"""
+    colors = [product_colors(product) for product in products]
+    flat = [color for product_colors_ in colors for color in product_colors_]
+    if flat:
+        for color, lab in zip(flat, hex_to_lab(color["hex"] for color in flat).round(2).tolist()):
+            color["lab"] = lab
+
+    return [
+        {
+            "medusa_id": product["id"],
+            "title": product.get("title") or "",
+            "handle": product.get("handle"),
+            "thumbnail": product.get("thumbnail"),
+            "colors": product_colors_,
+            "medusa_updated_at": parse_timestamp(product.get("updated_at")),
+        }
+        for product, product_colors_ in zip(products, colors)
+    ]
+
+
+class CatalogSync:
+    """
+    Incremental Medusa -> products table sync. One pooled AsyncClient per process,
+    created on first use and shared by every sync; close() it on shutdown.
+    """
+
+    def __init__(
+        self,
+        base_url: str = settings.MEDUSA_API_URL,
+        publishable_key: Optional[str] = settings.MEDUSA_PUBLISHABLE_KEY,
+        page_size: int = settings.MEDUSA_PAGE_SIZE,
+        session_factory=AsyncSessionLocal,
+    ):
+        self.base_url = base_url
+        self.publishable_key = publishable_key
+        self.page_size = page_size
+        self.session_factory = session_factory
+        self.last_synced_at: Optional[float] = None  # time.time() of the last successful sync
+        self.last_full_sync_at: Optional[float] = None  # ... of the last successful full sync
+        self.last_stats: Optional[Dict[str, Any]] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._etags: Dict[str, str] = {}  # Watermark -> ETag of that query's first page
+        self._lock = asyncio.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.publishable_key)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"x-publishable-api-key": self.publishable_key or ""},
+                timeout=settings.MEDUSA_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=settings.MEDUSA_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.MEDUSA_MAX_CONNECTIONS,
+                ),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _fetch_page(
+        self, cursor: Optional[str], skip: int = 0, etag: Optional[str] = None, first: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        The next page of products ordered by updated_at from the cursor on (inclusive), or None
+        if etag still matches (304). The first `skip` are products already stored at the cursor's
+        timestamp, so the page is widened by that many to always hold page_size new ones.
+        """
+        params = {"limit": self.page_size + skip, "offset": 0, "order": "updated_at", "fields": PRODUCT_FIELDS}
+        if cursor:
+            # $gte, not $gt: products sharing the cursor's millisecond are refetched rather than missed
+            params["updated_at[$gte]"] = cursor
+        headers = {"If-None-Match": etag} if etag else {}
+
+        response = await self.client.get("/store/products", params=params, headers=headers)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        page = response.json()
+        if first and response.headers.get("etag"):
+            self._etags = {cursor or "": response.headers["etag"]}
+        return page
+
+    async def _upsert(self, db: AsyncSession, products: List[Dict[str, Any]]) -> int:
+        if not products:
+            return 0
+        stmt = dialect_insert(db)(Product).values(product_rows(products))
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[Product.medusa_id],
+            set_={
+                "title": stmt.excluded.title,
+                "handle": stmt.excluded.handle,
+                "thumbnail": stmt.excluded.thumbnail,
+                "colors": stmt.excluded.colors,
+                "medusa_updated_at": stmt.excluded.medusa_updated_at,
+                "synced_at": func.now(),
+            },
+        ))
+        return len(products)
+
+    async def _lock_sync(self, db: AsyncSession):
+        """Wait for any sync running in another process (e.g. the CLI vs the app) - held until commit"""
+        if db.bind.dialect.name == "postgresql":
+            await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SYNC_LOCK_KEY})
+
+    async def sync(self, full: bool = False) -> Dict[str, Any]:
+        """
+        Fetch changed products (every product if full) and upsert them in one
+        transaction, so the watermark only moves once the whole change set is stored.
+        A full sync also deletes products Medusa no longer returns.
+        Returns rows, rows/sec and the lag since the previous sync.
+        """
+        async with self._lock:
+            start = time.perf_counter()
+            async with self.session_factory() as db:
+                await self._lock_sync(db)
+                newest, last_synced = (await db.execute(
+                    select(func.max(Product.medusa_updated_at), func.max(Product.synced_at))
+                )).one()
+                if self.last_synced_at is None and last_synced is not None:
+                    self.last_synced_at = (last_synced if last_synced.tzinfo else last_synced.replace(tzinfo=timezone.utc)).timestamp()
+                lag = time.time() - self.last_synced_at if self.last_synced_at else None
+
+                watermark = None if full or newest is None else format_timestamp(newest)
+                stats = {"full": full, "watermark": watermark, "pages": 0, "products": 0, "deleted": 0, "not_modified": False}
+
+                page = await self._fetch_page(watermark, etag=None if full else self._etags.get(watermark or ""), first=True)
+                if page is None:
+                    stats["not_modified"] = True
+                else:
+                    # Keyset cursor: the newest updated_at so far, and the ids already stored at it
+                    cursor, at_cursor, seen = watermark, set(), set()
+                    while page is not None:
+                        stamped = [(product, format_timestamp(parse_timestamp(product["updated_at"]))) for product in page["products"]]
+                        new = [(product, stamp) for product, stamp in stamped if not (stamp == cursor and product["id"] in at_cursor)]
+                        products = [product for product, _ in new]
+
+                        next_page = None
+                        if len(page["products"]) < page.get("count", 0):
+                            if not new:
+                                raise RuntimeError(f"Catalog paging is stuck at {cursor}: more products share "
+                                                   f"that updated_at than Medusa returns in one page")
+                            newest = new[-1][1]
+                            at_cursor = (at_cursor if newest == cursor else set()) | {
+                                product["id"] for product, stamp in new if stamp == newest
+                            }
+                            cursor = newest
+                            # Fetched while this page is stored
+                            next_page = asyncio.create_task(self._fetch_page(cursor, len(at_cursor)))
+
+                        try:
+                            stats["pages"] += 1
+                            stats["products"] += await self._upsert(db, products)
+                            seen.update(product["id"] for product in products)
+                            page = await next_page if next_page is not None else None
+                        except BaseException:
+                            if next_page is not None:
+                                next_page.cancel()
+                            raise
+
+                    if full:
+                        result = await db.execute(delete(Product).where(Product.medusa_id.not_in(seen)))
+                        stats["deleted"] = result.rowcount
+                    await db.commit()
+
+            seconds = time.perf_counter() - start
+            self.last_synced_at = time.time()
+            if full:
+                self.last_full_sync_at = self.last_synced_at
+            stats.update({
+                "seconds": round(seconds, 3),
+                "rows_per_second": round(stats["products"] / seconds, 1) if seconds else 0.0,
+                "lag_seconds": round(lag, 1) if lag is not None else None,
+            })
+            self.last_stats = stats
+            if not stats["not_modified"]:
+                metrics.catalog_sync_rows_per_second.set(stats["rows_per_second"])
+            return stats
+
+    def lag_seconds(self) -> Optional[float]:
+        """Seconds since the last successful sync (None before the first)"""
+        return time.time() - self.last_synced_at if self.last_synced_at else None
+
+
+def describe(stats: Dict[str, Any]) -> str:
+    lag = f"{stats['lag_seconds']:.0f}s since the last sync" if stats["lag_seconds"] is not None else "first sync"
+    if stats["not_modified"]:
+        return f"🔄 Catalog unchanged (304 in {stats['seconds'] * 1000:.0f}ms, {lag})"
+    return (f"🔄 Catalog synced: {stats['products']} products in {stats['pages']} pages, "
+            f"{stats['deleted']} deleted, {stats['rows_per_second']:.0f} rows/s ({lag})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync the Medusa catalog into the products table")
+    parser.add_argument("--full", action="store_true", help="Refetch every product and delete the ones Medusa no longer has")
+    args = parser.parse_args()
+
+    if not catalog_sync.configured:
+        print("❌ MEDUSA_PUBLISHABLE_KEY is not set")
+        raise SystemExit(1)
+
+    async def run():
+        try:
+            return await catalog_sync.sync(full=args.full)
+        finally:
+            await catalog_sync.close()
+
+    print(describe(asyncio.run(run())))
+
+
+# Global instance
+catalog_sync = CatalogSync()
+
+
+if __name__ == "__main__":
+    main()
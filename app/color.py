@@ -0,0 +1,186 @@
+import numpy as np
+from typing import Iterable
+
+# sRGB (D65) -> CIE XYZ
+SRGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+
+# Reference hexes for color names used in avoid_colors that no palette defines
+# (palette colors resolve by their own hex first). Umbrella terms such as
+# "Warm Colors" have no single hex and are left out.
+NAMED_COLORS = {
+    "black": "#000000",
+    "pure black": "#000000",
+    "pure white": "#FFFFFF",
+    "brown": "#964B00",
+    "plum": "#8E4585",
+    "gold": "#FFD700",
+    "orange": "#FFA500",
+    "bright orange": "#FF5F1F",
+    "bright yellow": "#FFEA00",
+    "bright pink": "#FF007F",
+    "cool pink": "#E4A0C8",
+    "pastel pink": "#F8C8DC",
+    "light blue": "#ADD8E6",
+    "dark navy": "#0B1538",
+    "charcoal gray": "#36454F",
+    "silver gray": "#A8A9AD",
+}
+
+
+def hex_to_rgb(hexes: Iterable[str]) -> np.ndarray:
+    """'#RRGGBB' strings -> (n, 3) sRGB in 0-1"""
+    values = np.array([int(str(value).lstrip("#"), 16) for value in hexes], dtype=np.int64)
+    return np.stack([(values >> 16) & 0xFF, (values >> 8) & 0xFF, values & 0xFF], axis=-1).reshape(-1, 3) / 255.0
+
+
+def srgb_to_linear(rgb: np.ndarray) -> np.ndarray:
+    """Undo the sRGB transfer curve"""
+    return np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+
+
+def linear_to_xyz(linear: np.ndarray) -> np.ndarray:
+    return linear @ SRGB_TO_XYZ.T
+
+
+def xyz_to_lab(xyz: np.ndarray) -> np.ndarray:
+    """CIE XYZ -> CIELAB (D65 white point)"""
+    scaled = xyz / D65_WHITE
+    epsilon, kappa = 216 / 24389, 24389 / 27
+    f = np.where(scaled > epsilon, np.cbrt(scaled), (kappa * scaled + 16) / 116)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """sRGB in 0-1 -> CIELAB"""
+    return xyz_to_lab(linear_to_xyz(srgb_to_linear(rgb)))
+
+
+def hex_to_lab(hexes: Iterable[str]) -> np.ndarray:
+    """'#RRGGBB' strings -> (n, 3) CIELAB"""
+    return rgb_to_lab(hex_to_rgb(hexes))
+
+
+def lab_to_lch(lab: np.ndarray) -> np.ndarray:
+    """CIELAB -> CIE LCh(ab): lightness, chroma, hue angle in degrees (0-360)"""
+    return np.stack([
+        lab[..., 0],
+        np.hypot(lab[..., 1], lab[..., 2]),
+        np.degrees(np.arctan2(lab[..., 2], lab[..., 1])) % 360,
+    ], axis=-1)
+
+
+def hex_to_lch(hexes: Iterable[str]) -> np.ndarray:
+    """'#RRGGBB' strings -> (n, 3) LCh"""
+    return lab_to_lch(hex_to_lab(hexes))
+
+
+def delta_e76(lab_a: np.ndarray, lab_b: np.ndarray) -> np.ndarray:
+    """Euclidean distance in CIELAB between every row of lab_a and every row of lab_b: (n, m)"""
+    return np.linalg.norm(lab_a[:, None, :] - lab_b[None, :, :], axis=-1)
+
+
+def _pow7(x: np.ndarray) -> np.ndarray:
+    x2 = x * x
+    return x2 * x2 * x2 * x
+
+
+def _mean_hue(h1: np.ndarray, h2: np.ndarray, achromatic: np.ndarray) -> np.ndarray:
+    """CIEDE2000 mean hue in radians (0-2π) from hues in 0-2π, the textbook way"""
+    h_sum = h1 + h2
+    return np.where(
+        achromatic, h_sum,
+        np.where(np.abs(h1 - h2) <= np.pi, h_sum / 2,
+                 np.where(h_sum < 2 * np.pi, h_sum / 2 + np.pi, h_sum / 2 - np.pi)),
+    )
+
+
+def delta_e2000(lab_a: np.ndarray, lab_b: np.ndarray) -> np.ndarray:
+    """
+    CIEDE2000 color difference between every row of lab_a and every row of lab_b: (n, m).
+    Follows Sharma, Wu & Dalal (2005) with kL = kC = kH = 1; about 1.0 is a just
+    noticeable difference.
+    """
+    return _ciede2000(lab_a[:, None, :], lab_b[None, :, :])
+
+
+def delta_e2000_pairs(lab_a: np.ndarray, lab_b: np.ndarray) -> np.ndarray:
+    """CIEDE2000 between row i of lab_a and row i of lab_b: (n,)"""
+    return _ciede2000(lab_a, lab_b)
+
+
+def delta_e2000_matrix(lab: np.ndarray) -> np.ndarray:
+    """Symmetric (n, n) CIEDE2000 matrix of a set of colors - half the work of delta_e2000(lab, lab)"""
+    rows, columns = np.triu_indices(len(lab), 1)
+    matrix = np.zeros((len(lab), len(lab)))
+    matrix[rows, columns] = matrix[columns, rows] = _ciede2000(lab[rows], lab[columns])
+    return matrix
+
+
+def _ciede2000(lab_a: np.ndarray, lab_b: np.ndarray) -> np.ndarray:
+    """
+    CIEDE2000 over broadcastable (..., 3) arrays.
+
+    Elementwise sin/cos/where are the slow part, so hue is kept as unit vectors: ΔH
+    comes from the chord identity ΔH² = 2(C1C2 - a1a2 - b1b2), the mean hue from the
+    bisector of the two hue vectors, and T from multiple-angle identities. Pairs with
+    a neutral color or exactly opposite hues (no bisector) are patched in afterwards.
+    """
+    lab_a, lab_b = np.broadcast_arrays(np.asarray(lab_a, dtype=float), np.asarray(lab_b, dtype=float))
+    l1, a1, b1 = lab_a[..., 0], lab_a[..., 1], lab_a[..., 2]
+    l2, a2, b2 = lab_b[..., 0], lab_b[..., 1], lab_b[..., 2]
+
+    # Chroma-dependent stretch of the a* axis (fixes the blue region)
+    c_mean7 = _pow7((np.sqrt(a1 * a1 + b1 * b1) + np.sqrt(a2 * a2 + b2 * b2)) / 2)
+    g = 1.5 - 0.5 * np.sqrt(c_mean7 / (c_mean7 + 25.0 ** 7))
+    a1, a2 = a1 * g, a2 * g
+    c1, c2 = np.sqrt(a1 * a1 + b1 * b1), np.sqrt(a2 * a2 + b2 * b2)
+    c1c2 = c1 * c2
+
+    d_l, d_c = l2 - l1, c2 - c1
+    # Signed like h2 - h1 wrapped to ±180°: the sign of the cross product
+    d_h = np.copysign(np.sqrt(np.maximum(2 * (c1c2 - a1 * a2 - b1 * b2), 0.0)), a1 * b2 - b1 * a2)
+
+    # Mean hue: bisector of the unit hue vectors (the shorter arc, as in the formula)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cos_sum, sin_sum = a1 / c1 + a2 / c2, b1 / c1 + b2 / c2
+        length = np.sqrt(cos_sum * cos_sum + sin_sum * sin_sum)
+        cos_h, sin_h = cos_sum / length, sin_sum / length
+    special = ~(length > 0)  # A neutral color (NaN) or opposite hues (0)
+    if special.any():
+        h1 = np.arctan2(b1[special], a1[special]) % (2 * np.pi)
+        h2 = np.arctan2(b2[special], a2[special]) % (2 * np.pi)
+        achromatic = c1c2[special] == 0
+        h_mean = _mean_hue(h1, h2, achromatic)
+        cos_h[special], sin_h[special] = np.cos(h_mean), np.sin(h_mean)
+        # No hue difference against a neutral color
+        d_h[special] = np.where(achromatic, 0.0, d_h[special])
+
+    # T = 1 - 0.17cos(h - 30°) + 0.24cos(2h) + 0.32cos(3h + 6°) - 0.20cos(4h - 63°)
+    cos2h, sin2h = 2 * cos_h * cos_h - 1, 2 * sin_h * cos_h
+    cos3h, sin3h = cos_h * (4 * cos_h * cos_h - 3), sin_h * (3 - 4 * sin_h * sin_h)
+    cos4h, sin4h = 2 * cos2h * cos2h - 1, 2 * sin2h * cos2h
+    r30, r6, r63 = np.radians(30), np.radians(6), np.radians(63)
+    t = (1 - 0.17 * (cos_h * np.cos(r30) + sin_h * np.sin(r30))
+         + 0.24 * cos2h
+         + 0.32 * (cos3h * np.cos(r6) - sin3h * np.sin(r6))
+         - 0.20 * (cos4h * np.cos(r63) + sin4h * np.sin(r63)))
+
+    l_mean, c_mean = (l1 + l2) / 2, (c1 + c2) / 2
+    s_l = 1 + 0.015 * (l_mean - 50) ** 2 / np.sqrt(20 + (l_mean - 50) ** 2)
+    s_c = 1 + 0.045 * c_mean
+    s_h = 1 + 0.015 * c_mean * t
+
+    # Blue-region rotation term, peaking at a mean hue of 275° (arctan2 gives -180..180)
+    h_mean = np.degrees(np.arctan2(sin_h, cos_h))
+    h_mean += 360 * (h_mean < 0)
+    c_mean7 = _pow7(c_mean)
+    rotation = np.radians(60) * np.exp(-(((h_mean - 275) / 25) ** 2))
+    r_t = -np.sin(rotation) * 2 * np.sqrt(c_mean7 / (c_mean7 + 25.0 ** 7))
+
+    d_l, d_c, d_h = d_l / s_l, d_c / s_c, d_h / s_h
+    return np.sqrt(d_l * d_l + d_c * d_c + d_h * d_h + r_t * d_c * d_h)
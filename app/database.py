@@ -1,9 +1,48 @@
-from sqlalchemy import create_engine
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
 
-# Create database engine
+
+def async_database_url(url: str) -> str:
+    """Swap the sync driver in DATABASE_URL for its asyncio counterpart"""
+    for sync_prefix, async_prefix in (
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("sqlite:///", "sqlite+aiosqlite:///"),
+    ):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+
+def _pool_options(url: str) -> dict:
+    """Pool sizing and timeouts (SQLite has no connection pool to size)"""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+
+def _configure_sqlite(sqlite_engine):
+    """SQLite stand-in: WAL so readers don't block the writer, and wait for locks instead of failing"""
+    @event.listens_for(sqlite_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.DB_SQLITE_BUSY_TIMEOUT * 1000)}")
+        cursor.close()
+
+
+# Create database engine (Alembic, background workers and CLI jobs)
 engine = create_engine(
     settings.DATABASE_URL,
     echo=settings.DEBUG,  # Log SQL queries in debug mode
@@ -13,20 +52,57 @@ engine = create_engine(
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the FastAPI routes - queries never block the event loop
+ASYNC_DATABASE_URL = async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=settings.DEBUG,
+    pool_pre_ping=True,
+    connect_args=(
+        {"timeout": settings.DB_CONNECT_TIMEOUT, "command_timeout": settings.DB_COMMAND_TIMEOUT}
+        if ASYNC_DATABASE_URL.startswith("postgresql+asyncpg")
+        else {}
+    ),
+    **_pool_options(ASYNC_DATABASE_URL),
+)
+
+if settings.DATABASE_URL.startswith("sqlite"):
+    _configure_sqlite(engine)
+    _configure_sqlite(async_engine.sync_engine)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Base class for models
 Base = declarative_base()
 
 
-def get_db():
-    """Dependency for FastAPI routes to get database session"""
-    db = SessionLocal()
-    try:
+def dialect_insert(db: AsyncSession):
+    """INSERT construct with ON CONFLICT support for the session's database"""
+    if db.bind.dialect.name == "postgresql":
+        return postgresql.insert
+    if db.bind.dialect.name == "sqlite":
+        return sqlite.insert
+    raise RuntimeError(
+        f"Unsupported database dialect {db.bind.dialect.name!r}: upserts need postgresql or sqlite (check DATABASE_URL)"
+    )
+
+
+async def get_db():
+    """Dependency for FastAPI routes to get an async database session"""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 def init_db():
-    """Initialize database - create all tables"""
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database tables created successfully")
+    """
+    Bring DATABASE_URL up to date by running the Alembic migrations (alembic upgrade head).
+    Used by the testing/ harnesses to set up scratch databases with the same schema path as a deployment.
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    # No alembic.ini, so its logging setup is not applied to the calling process
+    config = Config()
+    config.set_main_option("script_location", str(Path(__file__).resolve().parent.parent / "migrations"))
+    command.upgrade(config, "head")
+    print("✅ Database schema is up to date")
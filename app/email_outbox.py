@@ -0,0 +1,225 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import settings
+from .database import SessionLocal
+from .email_service import email_service, EmailService, PermanentEmailError
+from .metrics import email_failures
+from .models import EmailOutbox
+from .schemas import PaletteResult
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def palette_email_values(user_id: Optional[int], to_email: str, palette: PaletteResult, language: str = "en") -> Dict[str, Any]:
+    """Outbox row for a palette email, due immediately"""
+    return {
+        "user_id": user_id,
+        "to_email": to_email,
+        "kind": "palette_result",
+        "language": language,
+        "payload": palette.model_dump(),
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": utcnow(),
+    }
+
+
+class OutboxWorker:
+    """
+    Drains the email outbox off the request path.
+
+    Rendering (premailer) and the Resend HTTP call are blocking, so each delivery runs
+    on a bounded thread pool. Failed sends are retried with exponential backoff and
+    dead-lettered after EMAIL_MAX_ATTEMPTS. Claimed rows carry a lease in next_attempt_at,
+    so a message left in "sending" by a crashed process is picked up again once it expires.
+    Threads cannot be interrupted, so a send that hangs past send_timeout_seconds keeps its
+    thread and lease, but the dispatcher stops waiting for it and claims for the free threads.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        service: EmailService = email_service,
+        workers: int = settings.EMAIL_WORKERS,
+        max_attempts: int = settings.EMAIL_MAX_ATTEMPTS,
+        retry_base_seconds: float = settings.EMAIL_RETRY_BASE_SECONDS,
+        retry_max_seconds: float = settings.EMAIL_RETRY_MAX_SECONDS,
+        poll_seconds: float = settings.EMAIL_POLL_SECONDS,
+        send_timeout_seconds: float = settings.EMAIL_SEND_TIMEOUT_SECONDS,
+        lease_seconds: float = 300.0,
+    ):
+        if send_timeout_seconds >= lease_seconds:
+            raise ValueError("send_timeout_seconds must be shorter than lease_seconds, or a slow send could be claimed twice")
+        self.session_factory = session_factory
+        self.service = service
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.poll_seconds = poll_seconds
+        self.send_timeout_seconds = send_timeout_seconds
+        self.lease_seconds = lease_seconds
+        self.in_flight = 0  # Deliveries holding a thread, including ones past send_timeout_seconds
+        self._in_flight_lock = threading.Lock()
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def backoff(self, attempts: int) -> float:
+        """Delay before the next attempt, doubling after every failure"""
+        return min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (attempts - 1))
+
+    async def start(self):
+        """Start the background dispatcher (call from the app startup hook)"""
+        if self._task is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="email-outbox")
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        """Check the outbox now instead of waiting for the next poll"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def stop(self, timeout: Optional[float] = settings.EMAIL_SHUTDOWN_TIMEOUT_SECONDS):
+        """Stop polling after delivering every message that is currently due"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            print("⚠️  Email outbox not fully drained before shutdown - remaining messages stay pending")
+        self._executor.shutdown(wait=True)
+        self._task = None
+        self._executor = None
+        self._loop = None
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                processed = await self.process_due()
+            except Exception as e:
+                print(f"❌ Email outbox error: {e}")
+                processed = 0
+
+            if processed:
+                continue
+            if self._stopping:
+                break
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def process_due(self) -> int:
+        """
+        Claim a batch of due messages for the free threads and deliver them; returns how
+        many were claimed. Waits at most send_timeout_seconds for the batch: slower sends
+        finish in the background and record their own outcome.
+        """
+        free = self.workers - self.in_flight
+        if free <= 0:
+            return 0
+        claimed = await asyncio.get_running_loop().run_in_executor(self._executor, self._claim, free)
+        if not claimed:
+            return 0
+
+        futures = []
+        for message in claimed:
+            with self._in_flight_lock:
+                self.in_flight += 1
+            future = self._executor.submit(self._deliver, message)
+            future.add_done_callback(self._delivered)
+            futures.append(asyncio.wrap_future(future))
+
+        done, slow = await asyncio.wait(futures, timeout=self.send_timeout_seconds)
+        if slow:
+            print(f"⚠️  {len(slow)} email send(s) still running after {self.send_timeout_seconds:g}s - continuing without them")
+        for future in done:
+            future.result()  # Surface database errors from recording an outcome
+        return len(claimed)
+
+    def _delivered(self, future: Future):
+        """Free the delivery's thread slot, and let the dispatcher claim for it right away"""
+        with self._in_flight_lock:
+            self.in_flight -= 1
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self.wake)
+
+    def _claim(self, limit: int) -> List[Tuple[int, str, str, Dict[str, Any], int]]:
+        db = self.session_factory()
+        try:
+            now = utcnow()
+            rows = (
+                db.query(EmailOutbox)
+                .filter(EmailOutbox.status.in_(("pending", "sending")), EmailOutbox.next_attempt_at <= now)
+                .order_by(EmailOutbox.next_attempt_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            for row in rows:
+                row.status = "sending"
+                row.attempts += 1
+                row.next_attempt_at = now + timedelta(seconds=self.lease_seconds)
+            claimed = [(row.id, row.to_email, row.language, row.payload, row.attempts) for row in rows]
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def _deliver(self, message: Tuple[int, str, str, Dict[str, Any], int]):
+        message_id, to_email, language, payload, attempts = message
+
+        try:
+            provider_message_id = self.service.deliver(to_email, PaletteResult.model_validate(payload), language)
+        except PermanentEmailError as e:
+            email_failures.inc(outcome="dead")
+            print(f"❌ Email to {to_email} dead-lettered: {e}")
+            self._update(message_id, status="dead", last_error=str(e))
+        except Exception as e:
+            if attempts >= self.max_attempts:
+                email_failures.inc(outcome="dead")
+                print(f"❌ Email to {to_email} dead-lettered after {attempts} attempts: {e}")
+                self._update(message_id, status="dead", last_error=str(e))
+            else:
+                delay = self.backoff(attempts)
+                email_failures.inc(outcome="retry")
+                print(f"⚠️  Email to {to_email} failed (attempt {attempts}), retrying in {delay:.0f}s: {e}")
+                self._update(
+                    message_id,
+                    status="pending",
+                    last_error=str(e),
+                    next_attempt_at=utcnow() + timedelta(seconds=delay),
+                )
+        else:
+            print(f"✅ Palette email sent to {to_email} - ID: {provider_message_id}")
+            self._update(message_id, status="sent", provider_message_id=provider_message_id, sent_at=utcnow())
+
+    def _update(self, message_id: int, **values):
+        db = self.session_factory()
+        try:
+            db.query(EmailOutbox).filter(EmailOutbox.id == message_id).update(values, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+
+# Global instance
+outbox_worker = OutboxWorker()
@@ -1,115 +1,316 @@
-import resend
-from typing import Dict, List
+import re
+import secrets
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 from jinja2 import Template
-from premailer import transform
+from markupsafe import escape
 from .config import settings
 from .schemas import PaletteResult
+from .palettes import SeasonPalette
+from .metrics import submit_stage_seconds
+from .products import product_index
 
-# Configure Resend
-if settings.RESEND_API_KEY:
-    resend.api_key = settings.RESEND_API_KEY
+LANGUAGES = ("en", "it")
+DEFAULT_LANGUAGE = "en"
+
+# Static copy per language (season and color names come from seasons.yaml)
+COPY = {
+    "en": {
+        "subject": "Your Color Season: {season_name}",
+        "subtitle": "Personal Color Analysis",
+        "season": "YOUR COLOR SEASON",
+        "confidence": "Confidence",
+        "characteristics": "YOUR CHARACTERISTICS",
+        "undertone": "Undertone",
+        "value": "Value",
+        "chroma": "Chroma",
+        "core_neutrals": "CORE NEUTRALS",
+        "accent_colors": "ACCENT COLORS",
+        "avoid_colors": "COLORS TO AVOID",
+        "recommendations": "PICKED FOR YOU",
+        "shop": "Shop your colors at https://maisonguida.com",
+        "footer": "This email was sent because you completed our color analysis questionnaire.",
+        "visit": "Visit us at https://maisonguida.com",
+    },
+    "it": {
+        "subject": "La Tua Stagione Cromatica: {season_name}",
+        "subtitle": "Analisi Cromatica Personale",
+        "season": "LA TUA STAGIONE CROMATICA",
+        "confidence": "Affidabilità",
+        "characteristics": "LE TUE CARATTERISTICHE",
+        "undertone": "Sottotono",
+        "value": "Valore",
+        "chroma": "Intensità",
+        "core_neutrals": "NEUTRI DI BASE",
+        "accent_colors": "COLORI D'ACCENTO",
+        "avoid_colors": "COLORI DA EVITARE",
+        "recommendations": "SCELTI PER TE",
+        "shop": "Scopri i tuoi colori su https://maisonguida.com",
+        "footer": "Hai ricevuto questa email perché hai completato il nostro questionario di analisi cromatica.",
+        "visit": "Visitaci su https://maisonguida.com",
+    },
+}
+
+# Characteristic values as shown in Italian emails (English uses the values capitalized)
+CHARACTERISTIC_LABELS_IT = {
+    "undertone": {"warm": "Caldo", "cool": "Freddo", "neutral": "Neutro"},
+    "value": {"light": "Chiaro", "medium": "Medio", "deep": "Scuro"},
+    "chroma": {"bright": "Brillante", "rich": "Ricca", "muted": "Smorzata", "soft": "Tenue", "clear": "Limpida"},
+}
+
+# Per-user fields and the product picks are rendered as these placeholder tokens ({{ late.confidence }}
+# etc. in the email templates), and the inlined HTML is split around them once; sending joins the pieces
+# with the values. The rendered HTML, which includes catalog text, is never parsed as a template again.
+# The tokens are random per process, so no catalog text can contain them.
+LATE_FIELDS = ("confidence", "undertone", "value", "chroma", "recommendations")
+_late_nonce = secrets.token_hex(8)
+_late_tokens = {name: f"late-{_late_nonce}-{name}" for name in LATE_FIELDS + ("recommendations_start", "recommendations_end")}
+_late_pattern = re.compile(f"late-{_late_nonce}-({'|'.join(LATE_FIELDS)})\\b")
+
+
+def normalize_language(language: str) -> str:
+    """Fall back to English for anything we have no template for"""
+    return language if language in LANGUAGES else DEFAULT_LANGUAGE
+
+
+class EmailDeliveryError(Exception):
+    """Sending failed; the outbox retries these"""
+
+
+class PermanentEmailError(EmailDeliveryError):
+    """Sending can never succeed as configured; the outbox dead-letters these immediately"""
+
+
+class ResendTransport:
+    """Delivers messages through the Resend API (blocking HTTP round trip)"""
+
+    def send(self, params: Dict) -> str:
+        if not settings.RESEND_API_KEY:
+            raise PermanentEmailError("No RESEND_API_KEY configured")
+
+        import resend  # Slow import, only needed once something is actually sent
+        resend.api_key = settings.RESEND_API_KEY
+
+        try:
+            response = resend.Emails.send(params)
+        except Exception as e:
+            raise EmailDeliveryError(str(e)) from e
+
+        return response.get("id")
+
+
+class FakeTransport:
+    """Local transport that records messages instead of sending them - no network"""
+
+    def __init__(self, fail_times: int = 0):
+        self.sent: List[Dict] = []
+        self.fail_times = fail_times  # Simulate this many transient failures first
+
+    def send(self, params: Dict) -> str:
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise EmailDeliveryError("Simulated transport failure")
+
+        self.sent.append(params)
+        print(f"🧪 Fake transport: would send email to {', '.join(params['to'])} ({params['subject']})")
+        return f"fake-{len(self.sent)}"
+
+
+def default_transport():
+    """Fake transport in TESTING_MODE or when EMAIL_TRANSPORT=fake, Resend otherwise"""
+    if settings.TESTING_MODE or settings.EMAIL_TRANSPORT == "fake":
+        return FakeTransport()
+    return ResendTransport()
 
 
 class EmailService:
     """Handles sending palette results via Resend"""
 
-    def __init__(self):
+    def __init__(self, transport=None):
         self.from_email = settings.FROM_EMAIL
         self.template_dir = Path(__file__).parent.parent / "email_templates"
+        self.transport = transport or default_transport()
+
+        # language -> (template mtime, compiled season template)
+        self._season_templates: Dict[str, Tuple[float, Template]] = {}
+        # (season, language) -> (template mtime, CSS-inlined HTML split around the per-user fields:
+        # [html, field name, html, field name, ..., html]). Independent of the catalog, so the entries
+        # preloaded in the gunicorn master stay valid (and shared) for the life of the workers.
+        self._inlined: Dict[Tuple[str, str], Tuple[float, List[str]]] = {}
+        # (season, language) -> (template mtime, product index version, CSS-inlined product picks section)
+        self._recommendations: Dict[Tuple[str, str], Tuple[float, Optional[str], str]] = {}
+
+    def build_message(self, to_email: str, palette: PaletteResult, language: str = DEFAULT_LANGUAGE) -> Dict:
+        """Render the HTML and text versions into transport-ready message params"""
+        language = normalize_language(language)
+        with submit_stage_seconds.time(stage="email_render"):
+            return {
+                "from": self.from_email,
+                "to": [to_email],
+                "subject": COPY[language]["subject"].format(season_name=palette.season_display_name),
+                "html": self._render_template(palette, language),
+                "text": self._generate_text_version(palette, language),
+            }
 
-    def send_palette_email(self, to_email: str, palette: PaletteResult) -> bool:
+    def deliver(self, to_email: str, palette: PaletteResult, language: str = DEFAULT_LANGUAGE) -> str:
+        """
+        Render and send a palette email, raising EmailDeliveryError on failure
+
+        Returns:
+            Provider message ID
+        """
+        message = self.build_message(to_email, palette, language)
+        with submit_stage_seconds.time(stage="email_send"):
+            return self.transport.send(message)
+
+    def send_palette_email(self, to_email: str, palette: PaletteResult, language: str = DEFAULT_LANGUAGE) -> bool:
         """
         Send personalized color palette email
 
         Args:
             to_email: Recipient email address
             palette: PaletteResult object with season and colors
+            language: 'en' or 'it'
 
         Returns:
             True if sent successfully, False otherwise
         """
 
-        if settings.TESTING_MODE:
-            print(f"🧪 TESTING_MODE: Would send email to {to_email} ({palette.season_display_name})")
-            return True
-
-        if not settings.RESEND_API_KEY:
-            print("⚠️  No RESEND_API_KEY configured - skipping email")
-            return False
-
         try:
-            # Load and render email templates
-            html_content = self._render_template(palette)
-            text_content = self._generate_text_version(palette)
-
-            # Send email via Resend
-            params = {
-                "from": self.from_email,
-                "to": [to_email],
-                "subject": f"Your Color Season: {palette.season_display_name}",
-                "html": html_content,
-                "text": text_content,
-            }
-
-            response = resend.Emails.send(params)
-
-            print(f"✅ Email sent to {to_email} - ID: {response.get('id')}")
+            message_id = self.deliver(to_email, palette, language)
+            print(f"✅ Email sent to {to_email} - ID: {message_id}")
             return True
 
         except Exception as e:
             print(f"❌ Failed to send email to {to_email}: {e}")
             return False
 
-    def _render_template(self, palette: PaletteResult) -> str:
-        """Render HTML email template with palette data and inline CSS"""
+    def _template_path(self, language: str) -> Path:
+        """palette-result.<language>.html, or the English palette-result.html"""
+        if language != DEFAULT_LANGUAGE:
+            localized = self.template_dir / f"palette-result.{language}.html"
+            if localized.exists():
+                return localized
+        return self.template_dir / "palette-result.html"
 
-        template_path = self.template_dir / "palette-result.html"
-
-        with open(template_path, "r") as f:
-            template = Template(f.read())
+    def _season_template(self, language: str) -> Tuple[float, Template]:
+        """(template mtime, compiled template) for a language, recompiled when the file changes on disk"""
+        template_path = self._template_path(language)
+        mtime = template_path.stat().st_mtime
+        season_template = self._season_templates.get(language)
+        if season_template is None or season_template[0] != mtime:
+            with open(template_path, "r") as f:
+                season_template = (mtime, Template(f.read()))
+            self._season_templates[language] = season_template
+        return season_template
 
+    def _inline(self, template: Template, palette: PaletteResult, recommendations, late: Dict[str, str]) -> str:
+        """Render the season fields and inline the CSS"""
         html_content = template.render(
             season=palette.season,
             season_name=palette.season_display_name,
-            confidence=palette.confidence,
-            undertone=palette.undertone,
-            value=palette.value,
-            chroma=palette.chroma,
             core_neutrals=palette.core_neutrals,
             accent_colors=palette.accent_colors,
             avoid_colors=palette.avoid_colors,
-            explanation=palette.explanation
+            recommendations=recommendations,
+            explanation=palette.explanation,
+            late=late,
         )
 
-        # Inline CSS for email client compatibility (Gmail, Outlook, etc.)
-        inlined_html = transform(html_content)
+        # Inline CSS for email client compatibility (Gmail, Outlook, etc.) - the expensive step.
+        # premailer pulls in lxml and cssutils, so it is imported on first use rather than at startup
+        from premailer import transform
+        return transform(html_content)
+
+    def _inlined_template(self, palette: PaletteResult, language: str, season_template: Tuple[float, Template]) -> List[str]:
+        """
+        Season-level HTML with CSS already inlined, cached per (season, language) and split
+        around the per-user and product picks placeholder tokens. Rebuilt only when the
+        template file changes on disk.
+        """
+        mtime, template = season_template
+        cached = self._inlined.get((palette.season, language))
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
 
-        return inlined_html
+        inlined = _late_pattern.split(self._inline(template, palette, [], _late_tokens))
+        self._inlined[(palette.season, language)] = (mtime, inlined)
+        return inlined
 
-    def _generate_text_version(self, palette: PaletteResult) -> str:
+    def _recommendations_html(self, palette: PaletteResult, language: str, season_template: Tuple[float, Template]) -> str:
+        """
+        The season's product picks section, CSS-inlined, cached per (season, language) until
+        the template changes or the product index is rebuilt ("" when there are no picks)
+        """
+        mtime, template = season_template
+        products_version = product_index.version
+        cached = self._recommendations.get((palette.season, language))
+        if cached is not None and cached[0] == mtime and cached[1] == products_version:
+            return cached[2]
+
+        html = ""
+        recommendations = product_index.for_season(palette.season)
+        if recommendations:
+            # Inlined in the context of the whole email, so the section gets the same styles, then cut out
+            inlined = self._inline(template, palette, recommendations, {**_late_tokens, "recommendations": ""})
+            start = inlined.index(_late_tokens["recommendations_start"]) + len(_late_tokens["recommendations_start"])
+            html = inlined[start:inlined.index(_late_tokens["recommendations_end"])]
+        self._recommendations[(palette.season, language)] = (mtime, products_version, html)
+        return html
+
+    def preload(self, season_palettes: List[SeasonPalette]):
+        """Inline the templates for these seasons in every language ahead of the first send"""
+        for season_palette in season_palettes:
+            palette = season_palette.result(0, "", "", "")  # Only season fields are used
+            for language in LANGUAGES:
+                self._inlined_template(palette, language, self._season_template(language))
+
+    def _characteristics(self, palette: PaletteResult, language: str) -> Dict[str, str]:
+        """Undertone/value/chroma as displayed in the given language"""
+        values = {"undertone": palette.undertone, "value": palette.value, "chroma": palette.chroma}
+        if language == "it":
+            return {key: CHARACTERISTIC_LABELS_IT[key].get(val, val.capitalize()) for key, val in values.items()}
+        return values
+
+    def _render_template(self, palette: PaletteResult, language: str = DEFAULT_LANGUAGE) -> str:
+        """Render HTML email from the cached CSS-inlined season template, filling in per-user fields"""
+        language = normalize_language(language)
+        fields = {key: escape(value.capitalize()) for key, value in self._characteristics(palette, language).items()}
+        fields["confidence"] = str(palette.confidence)
+        season_template = self._season_template(language)
+        fields["recommendations"] = self._recommendations_html(palette, language, season_template)  # Already HTML
+
+        parts = self._inlined_template(palette, language, season_template)
+        html = list(parts)
+        html[1::2] = [fields[name] for name in parts[1::2]]
+        return "".join(html)
+
+    def _generate_text_version(self, palette: PaletteResult, language: str = DEFAULT_LANGUAGE) -> str:
         """Generate plain text version of the email for accessibility"""
+        language = normalize_language(language)
+        copy = COPY[language]
+        characteristics = self._characteristics(palette, language)
 
         text_parts = [
             "MAISON GUIDA",
-            "Personal Color Analysis",
+            copy["subtitle"],
             "",
-            f"YOUR COLOR SEASON: {palette.season_display_name.upper()}",
-            f"Confidence: {palette.confidence}%",
+            f"{copy['season']}: {palette.season_display_name.upper()}",
+            f"{copy['confidence']}: {palette.confidence}%",
             "",
-            "YOUR CHARACTERISTICS",
-            f"Undertone: {palette.undertone.capitalize()}",
-            f"Value: {palette.value.capitalize()}",
-            f"Chroma: {palette.chroma.capitalize()}",
+            copy["characteristics"],
+            f"{copy['undertone']}: {characteristics['undertone'].capitalize()}",
+            f"{copy['value']}: {characteristics['value'].capitalize()}",
+            f"{copy['chroma']}: {characteristics['chroma'].capitalize()}",
             "",
-            "CORE NEUTRALS",
+            copy["core_neutrals"],
         ]
 
         # Add core neutrals
         for color in palette.core_neutrals:
             text_parts.append(f"• {color.name} ({color.hex})")
 
-        text_parts.extend(["", "ACCENT COLORS"])
+        text_parts.extend(["", copy["accent_colors"]])
 
         # Add accent colors
         for color in palette.accent_colors:
@@ -117,15 +318,21 @@ class EmailService:
 
         # Add colors to avoid
         if palette.avoid_colors:
-            text_parts.extend(["", "COLORS TO AVOID", ", ".join(palette.avoid_colors)])
+            text_parts.extend(["", copy["avoid_colors"], ", ".join(palette.avoid_colors)])
+
+        # Add product picks for the season
+        recommendations = product_index.for_season(palette.season)
+        if recommendations:
+            text_parts.extend(["", copy["recommendations"]])
+            text_parts.extend(f"• {product.title} - {product.url}" for product in recommendations)
 
         text_parts.extend([
             "",
-            "Shop your colors at https://maisonguida.com",
+            copy["shop"],
             "",
             "---",
-            "This email was sent because you completed our color analysis questionnaire.",
-            "Visit us at https://maisonguida.com"
+            copy["footer"],
+            copy["visit"]
         ])
 
         return "\n".join(text_parts)
@@ -1,17 +1,41 @@
-from fastapi import FastAPI, Request, Depends, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+import time
+_started_at = time.perf_counter()  # Startup time is reported from here
+
+import asyncio
+import gc
+import json
+import secrets
+from typing import List, Optional
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import FastAPI, Request, Depends, Header, HTTPException, Query, Form, File, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response as RawResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from sqlalchemy.sql import func
+from pydantic import ValidationError
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pathlib import Path
 
 from .config import settings
-from .database import get_db, init_db
-from .schemas import QuestionnaireSubmission, PaletteResult
-from .models import User, Response, Palette
+from .database import get_db, async_engine, engine
+from .schemas import (
+    QuestionnaireSubmission, PaletteResult, SeasonScores, SubmitResult, SubmissionBatch, SubmissionBatchResult,
+    HEX_PATTERN, MatchResult, MatchBatch, MatchBatchResult, PhotoAnalysisResult,
+)
+from .models import User, Palette, EmailOutbox
 from .questionnaire import analyzer
-from .email_service import email_service
+from .rules_loader import rules
+from .email_service import email_service, DEFAULT_LANGUAGE
+from .email_outbox import outbox_worker
+from .persistence import save_submission, save_submissions, find_duplicate, submission_hash, season_palettes, latest_response, response_submission, save_photo_analysis
+from .cache import latest_palette_cache
+from .catalog_sync import catalog_sync
+from .products import product_index, catalog_refresher
+from .match import SeasonMatchTable, match_index
+from .photo import PhotoError, PhotoPoolBusyError, photo_pool, save_upload
+from . import metrics
+from .profiling import profiler, memory_tracer, ProfilerBusyError, ProfilingMiddleware
 
 # Create FastAPI app
 app = FastAPI(
@@ -20,6 +44,8 @@ app = FastAPI(
     version="1.0.0",
     debug=settings.DEBUG
 )
+app.add_middleware(metrics.RequestTimingMiddleware)
+app.add_middleware(ProfilingMiddleware)
 
 # Mount static files
 static_dir = Path(__file__).parent.parent / "static"
@@ -30,15 +56,81 @@ templates_dir = Path(__file__).parent.parent / "templates"
 templates = Jinja2Templates(directory=str(templates_dir))
 
 
+def warm_up() -> float:
+    """
+    Run one analysis and one email render, so lazy imports (premailer) and template
+    compilation happen before the first request. Returns the seconds it took.
+    """
+    start = time.perf_counter()
+    options = {
+        q_data["id"]: [option["id"] for option in q_data.get("options", [])]
+        for q_data in rules.questionnaire.get("questions", {}).values()
+    }
+    submission = QuestionnaireSubmission.model_construct(
+        hair_color=options["q1"][0],
+        skin_tone=options["q2"][0],
+        eye_color=options["q3"][0],
+        vein_color=options["q4"][0],
+        jewelry_preference=options["q5"][0],
+        colors_worn=options["q6"][:2],
+        colors_avoided=options["q7"][:2],
+        color_feedback=options["q8"][0],
+    )
+    palette_result = analyzer.analyze(submission)
+    rules.palettes.encode_result(palette_result)
+    email_service._render_template(palette_result, DEFAULT_LANGUAGE)
+    email_service._generate_text_version(palette_result, DEFAULT_LANGUAGE)
+    return time.perf_counter() - start
+
+
+def prepare_workers():
+    """
+    Run once in the gunicorn master (preload_app) before the workers are forked.
+    Fills every cache the workers would otherwise each build (email templates),
+    then freezes the garbage collector's view of everything allocated so far:
+    collections in the workers never touch those objects, so the pages holding
+    the rules, palettes, templates and imported modules stay shared copy-on-write.
+    """
+    warm_up()
+    email_service.preload(rules.palettes.all())
+    gc.collect()
+    gc.freeze()
+    print(f"🧊 Preloaded for workers ({gc.get_freeze_count()} objects frozen)")
+
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database on startup"""
-    init_db()
-    print("🎨 PALETTE-AI is running!")
+    """Warm up before accepting requests - the schema is managed by Alembic (alembic upgrade head)"""
+    try:
+        await season_palettes.ensure_current()
+    except Exception:
+        print("❌ Database schema is missing or out of date - run: alembic upgrade head")
+        raise
+    await outbox_worker.start()
+    await catalog_refresher.start()  # Syncs the catalog and builds the product index in the background
+
+    # uvicorn only reports startup complete (and starts serving) once this returns
+    loop = asyncio.get_running_loop()
+    warm_up_seconds = await loop.run_in_executor(None, warm_up)
+    # CSS-inline every other season's email template in the background, ahead of the first send
+    loop.run_in_executor(None, email_service.preload, rules.palettes.all())
+
+    print(f"🎨 PALETTE-AI is running! (ready in {time.perf_counter() - _started_at:.2f}s, "
+          f"rules from {rules.source}, warm-up {warm_up_seconds * 1000:.0f}ms)")
     print(f"📍 http://localhost:{settings.APP_PORT}")
     print(f"📚 API Docs: http://localhost:{settings.APP_PORT}/docs")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Deliver queued emails and close database connections before the process exits"""
+    await catalog_refresher.stop()
+    await catalog_sync.close()
+    photo_pool.close()
+    await outbox_worker.stop()
+    await async_engine.dispose()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Render questionnaire page"""
@@ -51,118 +143,397 @@ async def health_check():
     return {"status": "healthy", "app": "PALETTE-AI"}
 
 
-@app.post("/api/submit", response_model=PaletteResult)
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(db: AsyncSession = Depends(get_db)):
+    """Prometheus metrics (stage latencies, seasons, email failures, pool, outbox and catalog sync gauges)"""
+    for name, pool_engine in (("async", async_engine.sync_engine), ("sync", engine)):
+        checkedout = getattr(pool_engine.pool, "checkedout", None)
+        if checkedout is not None:
+            metrics.db_pool_checked_out.set(checkedout(), engine=name)
+
+    counts = dict((await db.execute(
+        select(EmailOutbox.status, func.count())
+        .where(EmailOutbox.status.in_(("pending", "sending", "dead")))
+        .group_by(EmailOutbox.status)
+    )).all())
+    for status in ("pending", "sending", "dead"):
+        metrics.outbox_messages.set(counts.get(status, 0), status=status)
+
+    sync_lag = catalog_sync.lag_seconds()
+    if sync_lag is not None:
+        metrics.catalog_sync_lag_seconds.set(round(sync_lag, 1))
+
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints need the X-Admin-Token header; they don't exist unless ADMIN_TOKEN is set"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.post("/admin/profile", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def admin_profile(mode: str = "cprofile", seconds: Optional[float] = None, requests: Optional[int] = None):
+    """
+    Profile the next `requests` requests or `seconds` seconds (default 10s, capped at PROFILE_MAX_SECONDS).
+    mode=cprofile returns a pstats file of the event loop thread; mode=sample returns
+    folded stacks of every thread for a flamegraph.
+    """
+    if mode not in ("cprofile", "sample"):
+        raise HTTPException(status_code=400, detail="mode must be 'cprofile' or 'sample'")
+    try:
+        collector = await profiler.profile(mode, seconds, requests)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    filename = f"palette-{int(time.time())}.{collector.extension}"
+    return RawResponse(
+        content=collector.result(),
+        media_type=collector.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.post("/admin/tracemalloc/start", include_in_schema=False, dependencies=[Depends(require_admin)])
+def admin_tracemalloc_start(frames: int = 1):
+    """Start allocation tracing (frames = traceback depth per allocation) and take a baseline snapshot"""
+    try:
+        return memory_tracer.start(frames)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.get("/admin/tracemalloc/diff", include_in_schema=False, dependencies=[Depends(require_admin)])
+def admin_tracemalloc_diff(top: int = 25, key: str = "lineno", path: Optional[str] = None):
+    """Top allocation sites by growth since the previous snapshot, optionally only those under `path` (e.g. app/)"""
+    if key not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=400, detail="key must be 'lineno', 'filename' or 'traceback'")
+    try:
+        return memory_tracer.diff(top, key, path)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.post("/admin/tracemalloc/stop", include_in_schema=False, dependencies=[Depends(require_admin)])
+def admin_tracemalloc_stop():
+    """Stop allocation tracing"""
+    return memory_tracer.stop()
+
+
+def _require_known_answers(submission: QuestionnaireSubmission):
+    """422 listing any answer ids questionnaire.yaml doesn't define - scoring would treat them as unanswered"""
+    unknown = analyzer.unknown_answers(submission)
+    if unknown:
+        raise HTTPException(status_code=422, detail={"message": "Unknown answer ids", "unknown_answers": unknown})
+
+
+def _with_recommendations(body: bytes, season_key: str) -> bytes:
+    """Splice the season's pre-encoded product picks into an encoded PaletteResult"""
+    return body[:-1] + b',"recommendations":' + product_index.encoded(season_key) + b"}"
+
+
+@app.post("/api/submit", response_model=SubmitResult)
 async def submit_questionnaire(
+    request: Request,
     submission: QuestionnaireSubmission,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
     """
     Process questionnaire submission:
     1. Analyze responses to determine season
-    2. Save user, responses, and palette to database
-    3. Return palette result
+    2. Save user, responses, palette and queued email to database
+    3. Return palette result with product picks for the season (the outbox worker sends the email)
+
+    A repeat submission (same Idempotency-Key header, or the identical form within
+    SUBMIT_DEDUP_WINDOW_SECONDS) returns the stored result instead, without writing
+    anything or sending another email - also when the repeat runs concurrently. Answer ids that questionnaire.yaml
+    doesn't define are rejected with 422.
     """
 
+    # Body parsing and validation ran before the handler was called
+    received_at = getattr(request.state, "received_at", None)
+    if received_at is not None:
+        metrics.submit_stage_seconds.observe(time.perf_counter() - received_at, stage="validation")
+    _require_known_answers(submission)
+
+    # Step 0: Double clicks and resubmits of the same answers get the stored result
+    submission_key = submission_hash(submission)
+    with metrics.submit_stage_seconds.time(stage="dedup_lookup"):
+        duplicate = await find_duplicate(db, submission, submission_key, idempotency_key)
+    if duplicate is not None:
+        metrics.duplicate_submissions.inc()
+        body = _with_recommendations(rules.palettes.encode_result(duplicate), duplicate.season)
+        return RawResponse(content=body, media_type="application/json")
+
     # Step 1: Analyze responses
-    palette_result = analyzer.analyze(submission)
+    with metrics.submit_stage_seconds.time(stage="analyze"):
+        palette_result = analyzer.analyze(submission)
+    metrics.seasons_assigned.inc(season=palette_result.season)
 
-    # Step 2: Save to database
+    # Step 2: Save user, response, palette and queued email (delivered by the outbox worker)
     try:
-        # Create or get user
-        user = db.query(User).filter(User.email == submission.email).first()
-        if not user:
-            # New user - create with GDPR fields
-            user = User(
-                first_name=submission.first_name,
-                last_name=submission.last_name,
-                email=submission.email,
-                language=submission.language,
-                privacy_consent=submission.privacy_consent,
-                newsletter_consent=submission.newsletter_consent,
-                submission_count=1,
-                last_submission_at=func.now()
-            )
-            db.add(user)
-            db.flush()  # Get user ID
-        else:
-            # Existing user - update consent and submission tracking
-            user.privacy_consent = submission.privacy_consent
-            user.newsletter_consent = submission.newsletter_consent
-            user.submission_count += 1
-            user.last_submission_at = func.now()
-
-        # Save questionnaire response
-        response = Response(
-            user_id=user.id,
-            hair_color=submission.hair_color,
-            skin_tone=submission.skin_tone,
-            eye_color=submission.eye_color,
-            vein_color=submission.vein_color,
-            jewelry_preference=submission.jewelry_preference,
-            colors_worn=submission.colors_worn,
-            colors_avoided=submission.colors_avoided,
-            color_feedback=submission.color_feedback
-        )
-        db.add(response)
-
-        # Save palette
-        palette = Palette(
-            user_id=user.id,
-            season=palette_result.season,
-            season_display_name=palette_result.season_display_name,
-            confidence=palette_result.confidence,
-            undertone=palette_result.undertone,
-            value=palette_result.value,
-            chroma=palette_result.chroma,
-            core_neutrals=[color.dict() for color in palette_result.core_neutrals],
-            accent_colors=[color.dict() for color in palette_result.accent_colors],
-            avoid_colors=palette_result.avoid_colors,
-            explanation=palette_result.explanation
-        )
-        db.add(palette)
-
-        db.commit()
+        with metrics.submit_stage_seconds.time(stage="db_transaction"):
+            user_id = await save_submission(db, submission, palette_result, idempotency_key, submission_key)
+            if user_id is None:
+                # A concurrent repeat committed first - answer with its result, write nothing
+                await db.rollback()
+                duplicate = await find_duplicate(db, submission, submission_key, idempotency_key)
+            else:
+                await db.commit()
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
+        metrics.db_rollbacks.inc()
         print(f"❌ Database error: {e}")
         raise HTTPException(status_code=500, detail="Failed to save results")
 
-    # Step 3: Send email with palette results
-    email_sent = email_service.send_palette_email(submission.email, palette_result)
-    if email_sent:
-        print(f"✅ Palette email sent to {submission.email}")
-    else:
-        print(f"⚠️  Email not sent to {submission.email}")
+    if user_id is None:
+        if duplicate is None:
+            raise HTTPException(status_code=409, detail="This submission was already saved")
+        metrics.duplicate_submissions.inc()
+        body = _with_recommendations(rules.palettes.encode_result(duplicate), duplicate.season)
+        return RawResponse(content=body, media_type="application/json")
+
+    # Step 3: Let the outbox worker pick up the new email immediately
+    outbox_worker.wake()
+    latest_palette_cache.invalidate(submission.email)
+
+    # Step 4: Return result - season palette JSON and product picks are pre-encoded, only per-user fields are spliced in
+    body = _with_recommendations(rules.palettes.encode_result(palette_result), palette_result.season)
+    return RawResponse(content=body, media_type="application/json")
+
+
+@app.post("/api/season-scores", response_model=SeasonScores)
+async def season_scores(submission: QuestionnaireSubmission, top: int = 3):
+    """
+    Score every season for a questionnaire (nothing is saved or emailed) - the
+    assigned season plus the top seasons with their margins, for "you might also be"
+    """
+    if not 1 <= top <= len(rules.season_table.seasons):
+        raise HTTPException(status_code=400, detail=f"top must be between 1 and {len(rules.season_table.seasons)}")
+    _require_known_answers(submission)
+    return analyzer.score_seasons(submission, top)
+
+
+async def _match_table(season: str) -> SeasonMatchTable:
+    """The season's match table - built off the event loop the first time it is asked for"""
+    if season not in rules.palettes:
+        raise HTTPException(status_code=404, detail=f"Unknown season: {season}")
+    table = match_index.cached(season)
+    if table is None:
+        table = await asyncio.get_running_loop().run_in_executor(None, match_index.table, season)
+    return table
+
+
+@app.get("/api/match", response_model=MatchResult)
+async def match_color(season: str, hex: str = Query(pattern=HEX_PATTERN)):
+    """
+    Does a color suit a season? The nearest palette color, its CIEDE2000 distance and a
+    verdict (suits, neutral or avoid), read from the season's precomputed table.
+    Pass the hex with or without "#" (URL-encoded as %23).
+    """
+    table = await _match_table(season)
+    return RawResponse(content=table.encode(hex), media_type="application/json")
+
+
+@app.post("/api/match/batch", response_model=MatchBatchResult)
+async def match_colors(batch: MatchBatch):
+    """GET /api/match for many colors (e.g. every variant of a product) against one season"""
+    table = await _match_table(batch.season)
+    matches = b",".join(table.encode(hex_value) for hex_value in batch.hexes)
+    body = b'{"season":' + json.dumps(batch.season).encode("utf-8") + b',"matches":[' + matches + b"]}"
+    return RawResponse(content=body, media_type="application/json")
+
+
+@app.post("/api/photo", response_model=PhotoAnalysisResult)
+async def analyze_photo_upload(
+    email: str = Form(...),
+    photo: UploadFile = File(...),
+    photo_consent: bool = Form(False),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Refine a user's season with a photo of their face:
+    1. Find skin, hair and eye colors in a worker process (app/photo.py, no external API)
+    2. Re-analyze their latest questionnaire answers with the photo findings as q9
+    3. Save the findings on those answers, the refined palette as the user's latest,
+       the photo and the analysis (photo_analyses)
+
+    The questionnaire must be submitted first, with the privacy policy accepted, and the
+    form must carry photo_consent=true - nothing is analyzed or kept without it.
+    503 when PHOTO_MAX_PENDING photos are already in progress or the pool just lost a worker.
+    """
+    if not photo_consent:
+        raise HTTPException(status_code=422, detail="Consent to analyze and keep the photo (photo_consent) is required")
+
+    data = await photo.read(settings.PHOTO_MAX_BYTES + 1)
+    if len(data) > settings.PHOTO_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Photo is larger than {settings.PHOTO_MAX_BYTES // (1024 * 1024)} MB")
+
+    answers = await latest_response(db, email)
+    if answers is None:
+        raise HTTPException(status_code=404, detail="No questionnaire found for this email")
+    user, response = answers
+    if not user.privacy_consent:
+        raise HTTPException(status_code=403, detail="The privacy policy must be accepted before uploading a photo")
+    if analyzer.unknown_answers(response_submission(user, response)):
+        raise HTTPException(status_code=409, detail="Saved answers are out of date - please retake the questionnaire")
+
+    try:
+        analysis = await photo_pool.analyze(data)
+    except PhotoError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except PhotoPoolBusyError:
+        raise HTTPException(status_code=503, detail="Too many photos in progress, try again shortly", headers={"Retry-After": "5"})
+    except BrokenProcessPool:
+        print("⚠️ Photo worker died - restarting the photo pool")
+        raise HTTPException(status_code=503, detail="Photo analysis restarting, try again shortly", headers={"Retry-After": "5"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Photo analysis timed out")
+
+    submission = response_submission(user, response)
+    questionnaire_result = analyzer.analyze(submission)
+    palette_result = analyzer.analyze(submission, analysis["findings"])
+
+    try:
+        photo_path = await asyncio.get_running_loop().run_in_executor(None, save_upload, data, user.id, analysis["image"]["format"])
+        await save_photo_analysis(db, user.id, response.id, analysis["findings"], palette_result, photo_path, {
+            **analysis, "questionnaire_season": questionnaire_result.season, "confidence": palette_result.confidence,
+        })
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        print(f"❌ Photo analysis save failed: {e}")
+        raise HTTPException(status_code=500, detail="Failed to save photo analysis")
+    latest_palette_cache.invalidate(user.email)
+
+    return PhotoAnalysisResult(
+        **palette_result.model_dump(),
+        questionnaire_season=questionnaire_result.season,
+        findings=analysis["findings"],
+        analysis=analysis,
+    )
+
+
+def _validation_messages(error: ValidationError) -> List[str]:
+    """Readable "field: problem" lines for a rejected batch item"""
+    return [f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors()]
+
+
+@app.post("/api/submit/batch", response_model=SubmissionBatchResult)
+async def submit_questionnaire_batch(batch: SubmissionBatch, db: AsyncSession = Depends(get_db)):
+    """
+    Process many questionnaires at once (kiosks replaying offline submissions, event imports):
+    1. Validate each item on its own (fields and answer ids) - invalid items are reported, not fatal
+    2. Analyze every valid item in one vectorized pass
+    3. Save users, responses, palettes and queued emails with bulk statements in one transaction
+    4. Return each item's palette or errors, in input order
+    """
 
-    # Step 4: Return result
-    return palette_result
+    # Step 1: Validate items separately, so one bad tablet entry doesn't reject the batch
+    submissions: List[QuestionnaireSubmission] = []
+    indexes: List[int] = []
+    errors = {}
+    for index, item in enumerate(batch.submissions):
+        try:
+            submission = QuestionnaireSubmission.model_validate(item)
+        except ValidationError as e:
+            errors[index] = _validation_messages(e)
+            continue
+        unknown = analyzer.unknown_answers(submission)
+        if unknown:
+            errors[index] = [f"{answer}: unknown answer id" for answer in unknown]
+            continue
+        submissions.append(submission)
+        indexes.append(index)
+
+    # Step 2: Analyze all valid submissions together
+    with metrics.submit_stage_seconds.time(stage="batch_analyze"):
+        palette_results = analyzer.analyze_batch(submissions)
+    for palette_result in palette_results:
+        metrics.seasons_assigned.inc(season=palette_result.season)
+
+    # Step 3: Save everything in one transaction (emails are delivered by the outbox worker)
+    if submissions:
+        try:
+            with metrics.submit_stage_seconds.time(stage="batch_db_transaction"):
+                await save_submissions(db, submissions, palette_results)
+                await db.commit()
+
+        except Exception as e:
+            await db.rollback()
+            metrics.db_rollbacks.inc()
+            print(f"❌ Database error: {e}")
+            raise HTTPException(status_code=500, detail="Failed to save results")
+
+        outbox_worker.wake()
+        for submission in submissions:
+            latest_palette_cache.invalidate(submission.email)
+
+    # Step 4: Per-item results, splicing in the pre-encoded palette JSON
+    encoded = {}
+    for index, submission, palette_result in zip(indexes, submissions, palette_results):
+        encoded[index] = (
+            b'{"index":%d,"email":%s,"result":' % (index, json.dumps(submission.email).encode("utf-8"))
+            + rules.palettes.encode_result(palette_result)
+            + b',"errors":null}'
+        )
+    for index, messages in errors.items():
+        item = batch.submissions[index]
+        email = item.get("email") if isinstance(item, dict) and isinstance(item.get("email"), str) else None
+        encoded[index] = json.dumps(
+            {"index": index, "email": email, "result": None, "errors": messages},
+            ensure_ascii=False, separators=(",", ":"),
+        ).encode("utf-8")
+
+    body = (
+        b'{"accepted":%d,"rejected":%d,"items":[' % (len(submissions), len(errors))
+        + b",".join(encoded[index] for index in range(len(batch.submissions)))
+        + b"]}"
+    )
+    return RawResponse(content=body, media_type="application/json")
 
 
 @app.get("/api/palette/{email}")
-async def get_user_palette(email: str, db: Session = Depends(get_db)):
-    """Get latest palette for a user by email"""
-
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    palette = db.query(Palette).filter(Palette.user_id == user.id).order_by(Palette.generated_at.desc()).first()
-    if not palette:
-        raise HTTPException(status_code=404, detail="No palette found for this user")
-
-    return {
-        "season": palette.season,
-        "season_display_name": palette.season_display_name,
-        "confidence": palette.confidence,
-        "undertone": palette.undertone,
-        "value": palette.value,
-        "chroma": palette.chroma,
-        "core_neutrals": palette.core_neutrals,
-        "accent_colors": palette.accent_colors,
-        "avoid_colors": palette.avoid_colors,
-        "generated_at": palette.generated_at
-    }
+async def get_user_palette(email: str, db: AsyncSession = Depends(get_db)):
+    """Get latest palette for a user by email (cached per email, invalidated on submit)"""
+
+    body = latest_palette_cache.get(email)
+    if body is None:
+        # One query: the user (if any) outer-joined to their latest palette (if any)
+        row = (await db.execute(
+            select(User.id, Palette)
+            .outerjoin(Palette, Palette.user_id == User.id)
+            .where(User.email == email)
+            .order_by(Palette.generated_at.desc(), Palette.id.desc())
+            .limit(1)
+        )).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        palette = row.Palette
+        if palette is None:
+            raise HTTPException(status_code=404, detail="No palette found for this user")
+
+        season_palette = await season_palettes.get(db, palette.season_palette_id)
+        body = JSONResponse(jsonable_encoder({
+            "season": palette.season,
+            "season_display_name": season_palette["season_display_name"],
+            "confidence": palette.confidence,
+            "undertone": palette.undertone,
+            "value": palette.value,
+            "chroma": palette.chroma,
+            "core_neutrals": season_palette["core_neutrals"],
+            "accent_colors": season_palette["accent_colors"],
+            "avoid_colors": season_palette["avoid_colors"],
+            "generated_at": palette.generated_at
+        })).body
+        latest_palette_cache.set(email, body)
+
+    return RawResponse(content=body, media_type="application/json")
 
 
 @app.get("/thank-you", response_class=HTMLResponse)
@@ -0,0 +1,166 @@
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .color import delta_e2000, hex_to_lab, rgb_to_lab
+from .config import settings
+from .palettes import PaletteStore
+from .rules_loader import rules
+
+VERDICTS = ("suits", "neutral", "avoid")
+SUITS, NEUTRAL, AVOID = range(len(VERDICTS))
+NO_AVOID = 255  # avoid index when no avoid color is involved
+
+
+def check_bits(bits: int) -> int:
+    """MATCH_LUT_BITS must split 8-bit channels into 2..256 levels"""
+    if not 1 <= bits <= 8:
+        raise ValueError(f"MATCH_LUT_BITS must be between 1 and 8, got {bits}")
+    return bits
+
+
+def _encode(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def normalize_hex(value: str) -> str:
+    """'ff7f50' or '#FF7F50' -> '#FF7F50'"""
+    return "#" + value.lstrip("#").upper()
+
+
+def avoid_colors(palettes: PaletteStore, season_key: str) -> Tuple[List[str], List[str]]:
+    """(name, hex) lists of a season's avoid colors that resolve to a hex - a name may give several"""
+    names, hexes = [], []
+    for name in palettes.get(season_key).avoid_colors:
+        for hex_value in palettes.colors.resolve(name):
+            names.append(name)
+            hexes.append(hex_value)
+    return names, hexes
+
+
+def classify(
+    lab: np.ndarray,
+    season_key: str,
+    palettes: PaletteStore,
+    suit_max_delta_e: float = settings.MATCH_SUIT_MAX_DELTA_E,
+    avoid_max_delta_e: float = settings.MATCH_AVOID_MAX_DELTA_E,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    For each CIELAB color: index of the nearest palette color (within the season),
+    CIEDE2000 to it, verdict code, and index of the avoid color that decided an
+    "avoid" verdict (NO_AVOID otherwise)
+    """
+    rows = palettes.colors.indices(season_key)
+    distances = delta_e2000(lab, palettes.colors.lab[rows])
+    nearest = distances.argmin(axis=1)
+    best = distances[np.arange(len(lab)), nearest]
+
+    _, hexes = avoid_colors(palettes, season_key)
+    if hexes:
+        avoid_distances = delta_e2000(lab, hex_to_lab(hexes))
+        avoid = avoid_distances.argmin(axis=1)
+        avoid_best = avoid_distances[np.arange(len(lab)), avoid]
+    else:
+        avoid = np.zeros(len(lab), dtype=np.intp)
+        avoid_best = np.full(len(lab), np.inf)
+
+    # An avoid color wins when it is close and closer than anything in the palette
+    avoided = (avoid_best <= avoid_max_delta_e) & (avoid_best < best)
+    verdict = np.where(avoided, AVOID, np.where(best <= suit_max_delta_e, SUITS, NEUTRAL))
+    return nearest, best, verdict, np.where(avoided, avoid, NO_AVOID)
+
+
+class SeasonMatchTable:
+    """
+    One season's answers for every cell of a quantized RGB cube (2**bits levels per
+    channel): the nearest palette color, its CIEDE2000 distance and a verdict.
+    Cells are measured at their center, so a lookup is an index computation and
+    a few array reads; the palette's own colors are answered exactly.
+    """
+
+    __slots__ = ("season", "bits", "nearest", "delta_e", "verdict", "avoid", "_exact", "_head", "_nearest_json", "_avoid_json")
+
+    def __init__(self, season_key: str, palettes: PaletteStore, bits: int = settings.MATCH_LUT_BITS):
+        if not len(palettes.colors.indices(season_key)):
+            raise ValueError(f"Season {season_key} has no core_neutrals or accent_colors in seasons.yaml - nothing to match against")
+        self.season = season_key
+        self.bits = check_bits(bits)
+
+        levels = 1 << bits
+        step = 256 // levels
+        centers = (np.arange(levels) * step + (step - 1) / 2) / 255
+        red, green, blue = np.meshgrid(centers, centers, centers, indexing="ij")
+        cells = rgb_to_lab(np.stack([red.ravel(), green.ravel(), blue.ravel()], axis=-1))
+        nearest, best, verdict, avoid = classify(cells, season_key, palettes)
+
+        # Compact storage: 1 + 2 + 1 + 1 bytes per cell
+        self.nearest = nearest.astype(np.uint8)
+        self.delta_e = best.astype(np.float16)
+        self.verdict = verdict.astype(np.uint8)
+        self.avoid = avoid.astype(np.uint8)
+        for array in (self.nearest, self.delta_e, self.verdict, self.avoid):
+            array.setflags(write=False)
+
+        colors = [palettes.colors.entries[row][2] for row in palettes.colors.indices(season_key)]
+        self._exact = {color.hex.upper(): index for index, color in enumerate(colors)}
+        self._head = b'{"season":' + _encode(season_key) + b',"hex":'
+        self._nearest_json = [b',"nearest_color":' + _encode(color.model_dump()) for color in colors]
+        self._avoid_json = [b',"avoid_color":' + _encode(name) + b"}" for name in avoid_colors(palettes, season_key)[0]]
+
+    @property
+    def nbytes(self) -> int:
+        return self.nearest.nbytes + self.delta_e.nbytes + self.verdict.nbytes + self.avoid.nbytes
+
+    def cell(self, hex_value: str) -> int:
+        """Index of the cube cell a '#RRGGBB' color falls in"""
+        value = int(hex_value.lstrip("#"), 16)
+        shift = 8 - self.bits
+        return (((value >> 16) >> shift) << (2 * self.bits)) | ((((value >> 8) & 0xFF) >> shift) << self.bits) | ((value & 0xFF) >> shift)
+
+    def lookup(self, hex_value: str) -> Tuple[int, float, int, int]:
+        """(nearest palette color index, ΔE00, verdict code, avoid color index or NO_AVOID)"""
+        exact = self._exact.get(normalize_hex(hex_value))
+        if exact is not None:
+            return exact, 0.0, SUITS, NO_AVOID
+        cell = self.cell(hex_value)
+        return int(self.nearest[cell]), float(self.delta_e[cell]), int(self.verdict[cell]), int(self.avoid[cell])
+
+    def encode(self, hex_value: str) -> bytes:
+        """MatchResult JSON for a color, from pre-encoded fragments"""
+        nearest, delta_e, verdict, avoid = self.lookup(hex_value)
+        return (
+            self._head + b'"' + normalize_hex(hex_value).encode("ascii")
+            + b'","verdict":"' + VERDICTS[verdict].encode("ascii")
+            + b'","delta_e":' + str(round(delta_e, 1)).encode("ascii")
+            + self._nearest_json[nearest]
+            + (b',"avoid_color":null}' if avoid == NO_AVOID else self._avoid_json[avoid])
+        )
+
+
+class MatchIndex:
+    """Match tables by season, each built on first use and kept for the life of the process"""
+
+    def __init__(self, bits: int = settings.MATCH_LUT_BITS):
+        self.bits = check_bits(bits)  # At startup, not on the first /api/match
+        self._tables: Dict[str, SeasonMatchTable] = {}
+        self._lock = threading.Lock()
+
+    def cached(self, season_key: str) -> Optional[SeasonMatchTable]:
+        return self._tables.get(season_key)
+
+    def table(self, season_key: str) -> SeasonMatchTable:
+        """The season's table, building it if needed (once, even with concurrent callers)"""
+        table = self._tables.get(season_key)
+        if table is None:
+            with self._lock:
+                table = self._tables.get(season_key)
+                if table is None:
+                    table = SeasonMatchTable(season_key, rules.palettes, self.bits)
+                    self._tables[season_key] = table
+        return table
+
+
+# Global instance
+match_index = MatchIndex()
@@ -0,0 +1,225 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+# Seconds - from sub-millisecond analyzer runs up to slow email sends
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], *extra: str) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    pairs.extend(label for label in extra if label)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class: a named metric with optional labels, safe to update from any thread"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(labels[name] for name in self.labelnames)
+
+    def render(self, worker: str = "") -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return lines + self._samples(worker)
+
+    def _samples(self, worker: str) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {} if self.labelnames else {(): 0}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self, worker: str) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key, worker)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(Metric):
+    """Value that goes up and down, usually set right before a scrape"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self, worker: str) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key, worker)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets, plus their sum and count"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last slot is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Observe how long the block takes"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self, worker: str) -> List[str]:
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+
+        lines = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le, worker)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key, worker)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key, worker)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    All metrics exposed on /metrics. Values live in the process that recorded them, so
+    under gunicorn every worker has its own: each sample carries a worker="<pid>" label
+    and a scrape only shows the worker that answered it.
+    """
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        worker = f'worker="{os.getpid()}"'  # At render time: the registry is created in the gunicorn master, before the fork
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(worker))
+        return "\n".join(lines) + "\n"
+
+
+class RequestTimingMiddleware:
+    """Stamp each request with its arrival time (request.state.received_at), so handlers can time parsing and validation"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["received_at"] = time.perf_counter()
+        await self.app(scope, receive, send)
+
+
+# Global instance
+registry = Registry()
+
+submit_stage_seconds = registry.register(Histogram(
+    "palette_submit_stage_seconds",
+    "Time spent in each stage of the submit pipeline",
+    ["stage"],  # validation, analyze, db_transaction, email_render, email_send, dedup_lookup, batch_analyze, batch_db_transaction
+))
+seasons_assigned = registry.register(Counter(
+    "palette_seasons_assigned_total",
+    "Submissions analyzed, by assigned season",
+    ["season"],
+))
+email_failures = registry.register(Counter(
+    "palette_email_failures_total",
+    "Failed email deliveries, by outcome (retry or dead)",
+    ["outcome"],
+))
+duplicate_submissions = registry.register(Counter(
+    "palette_duplicate_submissions_total",
+    "Repeat submissions (same Idempotency-Key or identical form) answered from the stored result",
+))
+unknown_answers = registry.register(Counter(
+    "palette_unknown_answers_total",
+    "Answer ids not defined in questionnaire.yaml, by question (such submissions are rejected)",
+    ["question"],
+))
+db_rollbacks = registry.register(Counter(
+    "palette_db_rollbacks_total",
+    "Submit transactions rolled back after a database error",
+))
+db_pool_checked_out = registry.register(Gauge(
+    "palette_db_pool_checked_out_connections",
+    "Database connections currently checked out of the pool",
+    ["engine"],
+))
+outbox_messages = registry.register(Gauge(
+    "palette_email_outbox_messages",
+    "Outbox emails that have not been sent, by status (pending, sending, dead)",
+    ["status"],
+))
+catalog_sync_lag_seconds = registry.register(Gauge(
+    "palette_catalog_sync_lag_seconds",
+    "Seconds since the products table was last synced from Medusa",
+))
+catalog_sync_rows_per_second = registry.register(Gauge(
+    "palette_catalog_sync_rows_per_second",
+    "Products upserted per second by the last catalog sync that found changes",
+))
+photo_analysis_seconds = registry.register(Histogram(
+    "palette_photo_analysis_seconds",
+    "Time per photo in each stage of the photo analysis",
+    ["stage"],  # queue, decode, segment, cluster, total
+))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Text, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -53,12 +53,19 @@ class Response(Base):
     # Feedback question
     color_feedback = Column(String(50))  # How people say they look in colors
 
+    # Photo question (q9) - findings of the latest photo analysis for these answers, NULL without one
+    photo_findings = Column(JSON, nullable=True)  # ["undertone_warm", "value_medium", ...]
+
     # Metadata
     submitted_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
     user = relationship("User", back_populates="responses")
 
+    __table_args__ = (
+        Index("ix_responses_user_id_submitted_at", user_id, submitted_at.desc()),
+    )
+
 
 class Palette(Base):
     """Generated color palette results"""
@@ -69,7 +76,7 @@ class Palette(Base):
 
     # Season determination
     season = Column(String(50), nullable=False)  # e.g., "bright_spring"
-    season_display_name = Column(String(100))  # e.g., "Bright Spring"
+    season_palette_id = Column(Integer, ForeignKey("season_palettes.id"), nullable=True)  # Colors for this season
     confidence = Column(Integer)  # 0-100
 
     # Characteristics determined
@@ -78,19 +85,73 @@ class Palette(Base):
     chroma = Column(String(20))  # bright/muted/soft/rich
     contrast = Column(String(20))  # high/medium/low
 
-    # Color palette (JSON with hex codes)
-    core_neutrals = Column(JSON)  # [{"name": "Camel", "hex": "#C19A6B"}, ...]
-    accent_colors = Column(JSON)  # [{"name": "Coral", "hex": "#FF6F61"}, ...]
-    avoid_colors = Column(JSON)  # ["Black", "Navy", ...]
-
     # Optional: AI-generated explanation
     explanation = Column(Text, nullable=True)
 
+    # Duplicate detection - repeats of the same submission return this palette instead of a new one
+    submission_hash = Column(String(64), nullable=True)  # sha256 of the canonical submission
+    idempotency_key = Column(String(255), nullable=True)  # Idempotency-Key header, if the client sent one
+
     # Metadata
     generated_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
     user = relationship("User", back_populates="palettes")
+    season_palette = relationship("SeasonPalette")
+
+    __table_args__ = (
+        Index("ix_palettes_user_id_generated_at", user_id, generated_at.desc()),  # Latest palette lookup
+        # One palette per Idempotency-Key and user, so concurrent repeats cannot both be saved
+        Index(
+            "uq_palettes_user_id_idempotency_key", user_id, idempotency_key, unique=True,
+            postgresql_where=idempotency_key.isnot(None), sqlite_where=idempotency_key.isnot(None),
+        ),
+    )
+
+
+class SeasonPalette(Base):
+    """Season colors as defined by one version of seasons.yaml - written once, never updated"""
+    __tablename__ = "season_palettes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    rules_version = Column(String(20), nullable=False)  # RulesLoader.version, or "legacy-..." for migrated rows
+    season = Column(String(50), nullable=False)
+    season_display_name = Column(String(100))
+
+    # Color palette (JSON with hex codes)
+    core_neutrals = Column(JSON)  # [{"name": "Camel", "hex": "#C19A6B"}, ...]
+    accent_colors = Column(JSON)  # [{"name": "Coral", "hex": "#FF6F61"}, ...]
+    avoid_colors = Column(JSON)  # ["Black", "Navy", ...]
+
+    # Metadata
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("rules_version", "season", name="uq_season_palettes_rules_version_season"),
+    )
+
+
+class Product(Base):
+    """Medusa catalog products, copied by app/catalog_sync.py with their variant colors extracted"""
+    __tablename__ = "products"
+
+    id = Column(Integer, primary_key=True, index=True)
+    medusa_id = Column(String(100), unique=True, nullable=False)  # e.g. "prod_01H..."
+
+    title = Column(String(255), nullable=False)
+    handle = Column(String(255))
+    thumbnail = Column(String(1000))
+
+    # One entry per colored variant
+    colors = Column(JSON)  # [{"variant_id": "variant_...", "hex": "#FF7F50", "lab": [67.3, 45.4, 47.5]}, ...]
+
+    # Sync state
+    medusa_updated_at = Column(DateTime(timezone=True))  # Watermark - newest value is where the next sync starts
+    synced_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_products_medusa_updated_at", medusa_updated_at),
+    )
 
 
 class PhotoAnalysis(Base):
@@ -104,3 +165,31 @@ class PhotoAnalysis(Base):
     refined_season = Column(String(50))
     ai_analysis = Column(JSON)  # Full AI response
     analyzed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class EmailOutbox(Base):
+    """Emails waiting to be delivered - written in the same transaction as the palette"""
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+
+    to_email = Column(String(255), nullable=False)
+    kind = Column(String(50), nullable=False, default="palette_result")
+    language = Column(String(2), nullable=False, default="en")  # Template language, 'en' or 'it'
+    payload = Column(JSON, nullable=False)  # Serialized PaletteResult
+
+    # Delivery state: pending -> sending -> sent, or dead after too many failures
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False)  # Also the lease expiry while sending
+    last_error = Column(Text, nullable=True)
+    provider_message_id = Column(String(100), nullable=True)
+
+    # Metadata
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
@@ -0,0 +1,201 @@
+import json
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from .color import NAMED_COLORS, delta_e2000, delta_e2000_matrix, hex_to_lab, lab_to_lch
+from .schemas import ColorInfo, PaletteResult
+
+DUPLICATE_DELTA_E = 2.0  # CIEDE2000 - colors this close in two seasons read as the same color
+AVOID_MIN_DELTA_E = 15.0  # An avoid color closer than this to one of the season's accents contradicts it
+
+
+def _encode(value: Any) -> bytes:
+    """Encode exactly like FastAPI's JSONResponse (compact separators, UTF-8)"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class SeasonPalette:
+    """Immutable palette for one season, with the season part of the JSON response pre-encoded"""
+
+    __slots__ = ("season", "display_name", "core_neutrals", "accent_colors", "avoid_colors", "_json_head", "_json_tail")
+
+    def __init__(self, season_key: str, season_data: Dict[str, Any]):
+        self.season = season_key
+        self.display_name = season_data.get("name", season_key.replace("_", " ").title())
+        self.core_neutrals: Tuple[ColorInfo, ...] = tuple(ColorInfo(**color) for color in season_data.get("core_neutrals", []))
+        self.accent_colors: Tuple[ColorInfo, ...] = tuple(ColorInfo(**color) for color in season_data.get("accent_colors", []))
+        self.avoid_colors: Tuple[str, ...] = tuple(season_data.get("avoid_colors", []))
+
+        # Response field order follows PaletteResult; confidence..chroma are spliced in per request
+        self._json_head = b'{"season":' + _encode(self.season) + b',"season_display_name":' + _encode(self.display_name) + b',"confidence":'
+        self._json_tail = (
+            b',"core_neutrals":' + _encode([color.model_dump() for color in self.core_neutrals])
+            + b',"accent_colors":' + _encode([color.model_dump() for color in self.accent_colors])
+            + b',"avoid_colors":' + _encode(list(self.avoid_colors))
+            + b',"explanation":null}'
+        )
+
+    def result(self, confidence: int, undertone: str, value: str, chroma: str) -> PaletteResult:
+        """Build a PaletteResult from the prebuilt colors without re-validating them"""
+        return PaletteResult.model_construct(
+            season=self.season,
+            season_display_name=self.display_name,
+            confidence=confidence,
+            undertone=undertone,
+            value=value,
+            chroma=chroma,
+            core_neutrals=list(self.core_neutrals),
+            accent_colors=list(self.accent_colors),
+            avoid_colors=list(self.avoid_colors),
+            explanation=None,  # TODO: Add AI explanation in Phase 5
+        )
+
+    def render_json(self, confidence: int, undertone: str, value: str, chroma: str) -> bytes:
+        """Splice the per-user fields into the pre-encoded response"""
+        return (
+            self._json_head + str(int(confidence)).encode("ascii")
+            + b',"undertone":' + _encode(undertone)
+            + b',"value":' + _encode(value)
+            + b',"chroma":' + _encode(chroma)
+            + self._json_tail
+        )
+
+
+class PaletteColors:
+    """
+    Every palette color of every season in one array - CIELAB, LCh and the CIEDE2000
+    ΔE between each pair, computed once when the rules load
+    """
+
+    def __init__(self, palettes: List[SeasonPalette]):
+        # (season, group, color) per row; rows of a season are contiguous, neutrals first
+        self.entries: Tuple[Tuple[str, str, ColorInfo], ...] = tuple(
+            (palette.season, group, color)
+            for palette in palettes
+            for group, colors in (("core_neutrals", palette.core_neutrals), ("accent_colors", palette.accent_colors))
+            for color in colors
+        )
+        self.seasons = np.array([season for season, _, _ in self.entries])
+        self.groups = np.array([group for _, group, _ in self.entries])
+        self.lab = hex_to_lab(color.hex for _, _, color in self.entries)
+        self.lch = lab_to_lch(self.lab)
+        self.delta_e = delta_e2000_matrix(self.lab)
+        for array in (self.seasons, self.groups, self.lab, self.lch, self.delta_e):
+            array.setflags(write=False)
+
+        self._avoid = {palette.season: palette.avoid_colors for palette in palettes}
+        self._by_name: Dict[str, List[str]] = {}
+        for _, _, color in self.entries:
+            hexes = self._by_name.setdefault(color.name.lower(), [])
+            if color.hex.upper() not in hexes:
+                hexes.append(color.hex.upper())
+
+    def indices(self, season_key: str, group: str = None) -> np.ndarray:
+        """Rows of a season's colors (only core_neutrals or accent_colors if group is given)"""
+        mask = self.seasons == season_key
+        if group is not None:
+            mask &= self.groups == group
+        return np.flatnonzero(mask)
+
+    def resolve(self, name: str) -> List[str]:
+        """Hexes a color name stands for: palette colors with that name, else NAMED_COLORS"""
+        key = name.lower()
+        if key in self._by_name:
+            return self._by_name[key]
+        return [NAMED_COLORS[key]] if key in NAMED_COLORS else []
+
+    def duplicates(self, max_delta_e: float = DUPLICATE_DELTA_E) -> List[Dict[str, Any]]:
+        """Pairs of colors from different seasons within max_delta_e of each other, closest first"""
+        rows, columns = np.triu_indices(len(self.entries), 1)
+        close = (self.seasons[rows] != self.seasons[columns]) & (self.delta_e[rows, columns] < max_delta_e)
+        pairs = sorted(zip(rows[close], columns[close]), key=lambda pair: self.delta_e[pair])
+        return [
+            {
+                "delta_e": round(float(self.delta_e[row, column]), 2),
+                "colors": [
+                    {"season": self.entries[index][0], "name": self.entries[index][2].name, "hex": self.entries[index][2].hex}
+                    for index in (row, column)
+                ],
+            }
+            for row, column in pairs
+        ]
+
+    def avoid_conflicts(self, min_delta_e: float = AVOID_MIN_DELTA_E) -> Tuple[List[Dict[str, Any]], List[Tuple[str, str]]]:
+        """
+        avoid_colors that sit within min_delta_e of one of their season's accents, and
+        the (season, name) pairs that could not be resolved to a hex
+        """
+        conflicts, unresolved = [], []
+        for season_key, avoid_colors in self._avoid.items():
+            accents = self.indices(season_key, "accent_colors")
+            for name in avoid_colors:
+                hexes = self.resolve(name)
+                if not hexes:
+                    unresolved.append((season_key, name))
+                    continue
+                if not len(accents):
+                    continue
+                distances = delta_e2000(hex_to_lab(hexes), self.lab[accents])
+                avoid_index, accent_index = np.unravel_index(distances.argmin(), distances.shape)
+                if distances[avoid_index, accent_index] < min_delta_e:
+                    accent = self.entries[accents[accent_index]][2]
+                    conflicts.append({
+                        "season": season_key,
+                        "avoid": name,
+                        "avoid_hex": hexes[avoid_index],
+                        "accent": accent.name,
+                        "accent_hex": accent.hex,
+                        "delta_e": round(float(distances[avoid_index, accent_index]), 2),
+                    })
+        return conflicts, unresolved
+
+    def audit(self) -> List[str]:
+        """Readable warnings: cross-season duplicates and avoid colors that contradict the accents"""
+        warnings = [
+            f"{first['season']}.{first['name']} and {second['season']}.{second['name']} are the same color "
+            f"({first['hex']} vs {second['hex']}, ΔE00 {duplicate['delta_e']})"
+            for duplicate in self.duplicates()
+            for first, second in [duplicate["colors"]]
+        ]
+        conflicts, unresolved = self.avoid_conflicts()
+        warnings += [
+            f"{conflict['season']} avoids {conflict['avoid']} ({conflict['avoid_hex']}) but its accent "
+            f"{conflict['accent']} ({conflict['accent_hex']}) is only ΔE00 {conflict['delta_e']} away"
+            for conflict in conflicts
+        ]
+        warnings += [f"{season_key} avoid color {name!r} has no hex to check (not a palette color or in NAMED_COLORS)"
+                     for season_key, name in unresolved]
+        return warnings
+
+
+class PaletteStore:
+    """All season palettes for one rules version, built once when the rules load"""
+
+    def __init__(self, seasons: Dict[str, Any], version: str):
+        self.version = version
+        self._palettes: Dict[str, SeasonPalette] = {
+            season_key: SeasonPalette(season_key, season_data)
+            for season_key, season_data in seasons.get("seasons", {}).items()
+        }
+        self.colors = PaletteColors(list(self._palettes.values()))
+
+    def get(self, season_key: str) -> SeasonPalette:
+        """Palette for a season (an empty palette if the season is not in seasons.yaml)"""
+        palette = self._palettes.get(season_key)
+        if palette is None:
+            palette = SeasonPalette(season_key, {})
+        return palette
+
+    def __contains__(self, season_key: str) -> bool:
+        return season_key in self._palettes
+
+    def all(self) -> List[SeasonPalette]:
+        """Every season defined in seasons.yaml"""
+        return list(self._palettes.values())
+
+    def encode_result(self, result: PaletteResult) -> bytes:
+        """Serialize a PaletteResult, using the pre-encoded fragments when possible"""
+        if result.explanation is not None:
+            return _encode(result.model_dump())
+        return self.get(result.season).render_json(result.confidence, result.undertone, result.value, result.chroma)
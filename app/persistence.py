@@ -0,0 +1,398 @@
+import hashlib
+import json
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, false, insert, literal, or_, select, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from .config import settings
+from .database import AsyncSessionLocal, dialect_insert
+from .email_outbox import palette_email_values, utcnow
+from .models import User, Response, Palette, EmailOutbox, SeasonPalette, PhotoAnalysis
+from .rules_loader import rules
+from .schemas import QuestionnaireSubmission, PaletteResult
+
+
+def response_values(user_id: int, submission: QuestionnaireSubmission) -> Dict[str, Any]:
+    """Row for the responses table"""
+    return {
+        "user_id": user_id,
+        "hair_color": submission.hair_color,
+        "skin_tone": submission.skin_tone,
+        "eye_color": submission.eye_color,
+        "vein_color": submission.vein_color,
+        "jewelry_preference": submission.jewelry_preference,
+        "colors_worn": submission.colors_worn,
+        "colors_avoided": submission.colors_avoided,
+        "color_feedback": submission.color_feedback,
+    }
+
+
+def palette_values(
+    user_id: int,
+    palette_result: PaletteResult,
+    season_palette_id: Optional[int],
+    submission_hash: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Row for the palettes table - per-user fields plus a reference to the season's colors"""
+    return {
+        "user_id": user_id,
+        "season": palette_result.season,
+        "season_palette_id": season_palette_id,
+        "confidence": palette_result.confidence,
+        "undertone": palette_result.undertone,
+        "value": palette_result.value,
+        "chroma": palette_result.chroma,
+        "explanation": palette_result.explanation,
+        "submission_hash": submission_hash,
+        "idempotency_key": idempotency_key,
+    }
+
+
+def submission_hash(submission: QuestionnaireSubmission) -> str:
+    """sha256 of the whole form, with multi-select answers in a canonical order"""
+    canonical = submission.model_dump()
+    canonical["colors_worn"] = sorted(canonical["colors_worn"])
+    canonical["colors_avoided"] = sorted(canonical["colors_avoided"])
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+async def _repeat_of(submission_key: str, idempotency_key: Optional[str], window_seconds: float):
+    """
+    Palette condition for a repeat of a submission (the caller adds the user): the same
+    Idempotency-Key, or the same submission hash under the loaded rules within window_seconds
+    """
+    if window_seconds > 0:
+        match = and_(
+            Palette.submission_hash == submission_key,
+            Palette.generated_at >= utcnow() - timedelta(seconds=window_seconds),
+            Palette.season_palette_id.in_(await season_palettes.current_ids()),
+        )
+    else:
+        match = false()
+    if idempotency_key:
+        match = or_(match, Palette.idempotency_key == idempotency_key)
+    return match
+
+
+async def find_duplicate(
+    db: AsyncSession,
+    submission: QuestionnaireSubmission,
+    submission_key: str,
+    idempotency_key: Optional[str] = None,
+    window_seconds: float = settings.SUBMIT_DEDUP_WINDOW_SECONDS,
+) -> Optional[PaletteResult]:
+    """
+    Stored result of a repeat submission, or None. A repeat is a palette for the same
+    email with the same Idempotency-Key, or with the same submission hash, generated
+    under the loaded rules within window_seconds. One query over the user's latest
+    palettes (ix_palettes_user_id_generated_at).
+    """
+    if window_seconds <= 0 and not idempotency_key:
+        return None
+
+    palette = (await db.execute(
+        select(Palette)
+        .join(User, User.id == Palette.user_id)
+        .where(User.email == submission.email, await _repeat_of(submission_key, idempotency_key, window_seconds))
+        .order_by(Palette.generated_at.desc(), Palette.id.desc())
+        .limit(1)
+    )).scalar_one_or_none()
+    if palette is None:
+        return None
+    return rules.palettes.get(palette.season).result(palette.confidence, palette.undertone, palette.value, palette.chroma)
+
+
+async def upsert_user(db: AsyncSession, submission: QuestionnaireSubmission) -> int:
+    """
+    Create the user, or update consent and submission tracking if the email exists.
+    A single atomic INSERT ... ON CONFLICT (email) DO UPDATE ... RETURNING id, so
+    concurrent submissions with the same email cannot race on the unique constraint.
+    """
+    stmt = dialect_insert(db)(User).values(
+        first_name=submission.first_name,
+        last_name=submission.last_name,
+        email=submission.email,
+        language=submission.language,
+        privacy_consent=submission.privacy_consent,
+        newsletter_consent=submission.newsletter_consent,
+        submission_count=1,
+        last_submission_at=func.now(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.email],
+        set_={
+            "privacy_consent": stmt.excluded.privacy_consent,
+            "newsletter_consent": stmt.excluded.newsletter_consent,
+            "submission_count": User.submission_count + 1,
+            "last_submission_at": func.now(),
+        },
+    ).returning(User.id)
+    return (await db.execute(stmt)).scalar_one()
+
+
+def insert_palette_unless_repeat(db: AsyncSession, palette_row: Dict[str, Any], repeat):
+    """
+    INSERT ... SELECT of a palette row that inserts nothing when the user already has a
+    palette matching `repeat`, or one with the same Idempotency-Key (ON CONFLICT on
+    uq_palettes_user_id_idempotency_key). RETURNING the new palette's ID.
+    """
+    columns = Palette.__table__.c
+    row = select(*(literal(value, columns[name].type) for name, value in palette_row.items())).where(
+        ~select(Palette.id).where(Palette.user_id == palette_row["user_id"], repeat).exists()
+    )
+    return (
+        dialect_insert(db)(Palette)
+        .from_select(list(palette_row), row)
+        .on_conflict_do_nothing(
+            index_elements=[Palette.user_id, Palette.idempotency_key],
+            index_where=Palette.idempotency_key.isnot(None),
+        )
+        .returning(Palette.id)
+    )
+
+
+async def save_submission(
+    db: AsyncSession,
+    submission: QuestionnaireSubmission,
+    palette_result: PaletteResult,
+    idempotency_key: Optional[str] = None,
+    submission_key: Optional[str] = None,
+    window_seconds: float = settings.SUBMIT_DEDUP_WINDOW_SECONDS,
+) -> Optional[int]:
+    """
+    Persist a submission: upsert the user, then insert the response, palette and
+    queued email. Returns the user ID; the caller commits.
+
+    Returns None when the palette turned out to be a repeat (see find_duplicate) that
+    committed after the caller's own check - a concurrent double submit. The caller
+    rolls back and answers with the stored result. The palette insert decides this
+    atomically: the upsert holds the user's row lock until commit, so a concurrent
+    repeat waits and then sees the committed palette, and the unique index catches
+    repeated Idempotency-Keys.
+
+    Round trips: one for the upsert, one for the three inserts on PostgreSQL
+    (data-modifying CTEs in a single statement). SQLite is in-process, so it
+    simply runs the inserts one after another.
+    """
+    season_palette_id = await season_palettes.id_for(palette_result.season)
+    submission_key = submission_key or submission_hash(submission)
+    user_id = await upsert_user(db, submission)
+
+    response_row = response_values(user_id, submission)
+    palette_row = palette_values(user_id, palette_result, season_palette_id, submission_key, idempotency_key)
+    email_row = palette_email_values(user_id, submission.email, palette_result, submission.language)
+    new_palette = insert_palette_unless_repeat(db, palette_row, await _repeat_of(submission_key, idempotency_key, window_seconds))
+
+    if db.bind.dialect.name == "postgresql":
+        new_palette = new_palette.cte("new_palette")
+        new_response = insert(Response).values(**response_row).returning(Response.id).cte("new_response")
+        new_email = insert(EmailOutbox).values(**email_row).returning(EmailOutbox.id).cte("new_email")
+        palette_id = (await db.execute(select(new_palette.c.id).add_cte(new_response, new_email))).scalar_one_or_none()
+    else:
+        palette_id = (await db.execute(new_palette)).scalar_one_or_none()
+        if palette_id is not None:
+            await db.execute(insert(Response).values(**response_row))
+            await db.execute(insert(EmailOutbox).values(**email_row))
+
+    return user_id if palette_id is not None else None
+
+
+async def upsert_users(db: AsyncSession, submissions: List[QuestionnaireSubmission]) -> Dict[str, int]:
+    """
+    Batch version of upsert_user: one multi-row INSERT ... ON CONFLICT for every
+    distinct email. An email that appears several times counts as that many
+    submissions, with consent taken from its last occurrence. Returns email -> user ID.
+    """
+    rows: Dict[str, Dict[str, Any]] = {}
+    for submission in submissions:
+        row = rows.get(submission.email)
+        if row is None:
+            rows[submission.email] = {
+                "first_name": submission.first_name,
+                "last_name": submission.last_name,
+                "email": submission.email,
+                "language": submission.language,
+                "privacy_consent": submission.privacy_consent,
+                "newsletter_consent": submission.newsletter_consent,
+                "submission_count": 1,
+                "last_submission_at": func.now(),
+            }
+        else:
+            row["privacy_consent"] = submission.privacy_consent
+            row["newsletter_consent"] = submission.newsletter_consent
+            row["submission_count"] += 1
+
+    stmt = dialect_insert(db)(User).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.email],
+        set_={
+            "privacy_consent": stmt.excluded.privacy_consent,
+            "newsletter_consent": stmt.excluded.newsletter_consent,
+            "submission_count": User.submission_count + stmt.excluded.submission_count,
+            "last_submission_at": func.now(),
+        },
+    ).returning(User.email, User.id)
+    return dict((await db.execute(stmt)).all())
+
+
+async def save_submissions(db: AsyncSession, submissions: List[QuestionnaireSubmission], palette_results: List[PaletteResult]) -> List[int]:
+    """
+    Persist a batch of analyzed submissions in the caller's transaction: one upsert
+    for the users, then one bulk insert each for responses, palettes and queued
+    emails. Returns the user ID of each submission; the caller commits.
+    """
+    await season_palettes.ensure_current()
+    user_ids = await upsert_users(db, submissions)
+    ids = [user_ids[submission.email] for submission in submissions]
+
+    pairs = list(zip(ids, submissions, palette_results))
+    await db.execute(insert(Response), [response_values(user_id, submission) for user_id, submission, _ in pairs])
+    await db.execute(insert(Palette), [
+        palette_values(user_id, palette_result, await season_palettes.id_for(palette_result.season), submission_hash(submission))
+        for user_id, submission, palette_result in pairs
+    ])
+    await db.execute(insert(EmailOutbox), [
+        palette_email_values(user_id, submission.email, palette_result, submission.language)
+        for user_id, submission, palette_result in pairs
+    ])
+    return ids
+
+
+async def latest_response(db: AsyncSession, email: str) -> Optional[Tuple[User, Response]]:
+    """A user and their latest questionnaire answers, or None (ix_responses_user_id_submitted_at)"""
+    row = (await db.execute(
+        select(User, Response)
+        .join(Response, Response.user_id == User.id)
+        .where(User.email == email)
+        .order_by(Response.submitted_at.desc(), Response.id.desc())
+        .limit(1)
+    )).first()
+    return (row.User, row.Response) if row is not None else None
+
+
+def response_submission(user: User, response: Response) -> QuestionnaireSubmission:
+    """The submission behind a stored response (its photo findings are response.photo_findings)"""
+    # Answers were validated when they were submitted
+    return QuestionnaireSubmission.model_construct(
+        first_name=user.first_name,
+        last_name=user.last_name,
+        email=user.email,
+        language=user.language or "en",
+        privacy_consent=user.privacy_consent,
+        newsletter_consent=user.newsletter_consent,
+        hair_color=response.hair_color,
+        skin_tone=response.skin_tone,
+        eye_color=response.eye_color,
+        vein_color=response.vein_color,
+        jewelry_preference=response.jewelry_preference,
+        colors_worn=response.colors_worn or [],
+        colors_avoided=response.colors_avoided or [],
+        color_feedback=response.color_feedback,
+    )
+
+
+async def save_photo_analysis(
+    db: AsyncSession,
+    user_id: int,
+    response_id: int,
+    photo_findings: List[str],
+    palette_result: PaletteResult,
+    photo_path: str,
+    analysis: Dict[str, Any],
+) -> int:
+    """
+    Store a photo refinement: the findings on the response they refined (so app.rescore
+    scores them too), the refined palette as the user's latest, and a photo_analyses
+    row. Returns the photo_analyses ID. The caller commits.
+    """
+    await db.execute(update(Response).where(Response.id == response_id).values(photo_findings=photo_findings))
+    await db.execute(insert(Palette).values(
+        palette_values(user_id, palette_result, await season_palettes.id_for(palette_result.season))
+    ))
+    return (await db.execute(
+        insert(PhotoAnalysis)
+        .values(user_id=user_id, photo_path=photo_path, refined_season=palette_result.season, ai_analysis=analysis)
+        .returning(PhotoAnalysis.id)
+    )).scalar_one()
+
+
+class SeasonPaletteRegistry:
+    """
+    season_palettes rows for the loaded rules version, plus an in-memory cache of
+    every row read so far. Rows are immutable, so cached entries never go stale.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self._version: Optional[str] = None
+        self._ids: Dict[str, int] = {}  # season -> id for the loaded rules version
+        self._by_id: Dict[int, Dict[str, Any]] = {}
+
+    async def ensure_current(self):
+        """Write this rules version's season palettes once (no-op if another worker already did)"""
+        if self._version == rules.version:
+            return
+
+        async with self.session_factory() as db:
+            rows = [
+                {
+                    "rules_version": rules.version,
+                    "season": season_palette.season,
+                    "season_display_name": season_palette.display_name,
+                    "core_neutrals": [color.model_dump() for color in season_palette.core_neutrals],
+                    "accent_colors": [color.model_dump() for color in season_palette.accent_colors],
+                    "avoid_colors": list(season_palette.avoid_colors),
+                }
+                for season_palette in rules.palettes.all()
+            ]
+            stmt = dialect_insert(db)(SeasonPalette).values(rows)
+            await db.execute(stmt.on_conflict_do_nothing(index_elements=["rules_version", "season"]))
+            await db.commit()
+
+            stored = (await db.execute(
+                select(SeasonPalette).where(SeasonPalette.rules_version == rules.version)
+            )).scalars().all()
+
+        self._ids = {row.season: row.id for row in stored}
+        for row in stored:
+            self._cache(row)
+        self._version = rules.version
+
+    async def id_for(self, season_key: str) -> Optional[int]:
+        """season_palettes ID for a season under the loaded rules"""
+        await self.ensure_current()
+        return self._ids.get(season_key)
+
+    async def current_ids(self) -> List[int]:
+        """season_palettes IDs of every season under the loaded rules"""
+        await self.ensure_current()
+        return list(self._ids.values())
+
+    async def get(self, db: AsyncSession, season_palette_id: Optional[int]) -> Dict[str, Any]:
+        """Season colors for a stored palette, from memory when possible"""
+        if season_palette_id is None:
+            return {"season_display_name": None, "core_neutrals": [], "accent_colors": [], "avoid_colors": []}
+
+        cached = self._by_id.get(season_palette_id)
+        if cached is None:
+            row = await db.get(SeasonPalette, season_palette_id)
+            cached = self._cache(row)
+        return cached
+
+    def _cache(self, row: SeasonPalette) -> Dict[str, Any]:
+        entry = {
+            "season_display_name": row.season_display_name,
+            "core_neutrals": row.core_neutrals,
+            "accent_colors": row.accent_colors,
+            "avoid_colors": row.avoid_colors,
+        }
+        self._by_id[row.id] = entry
+        return entry
+
+
+# Global instance
+season_palettes = SeasonPaletteRegistry()
@@ -0,0 +1,364 @@
+"""
+Local photo analysis (Pillow + NumPy, no external API).
+
+A portrait is downsampled, skin is found with a YCbCr rule, hair is looked for in
+a band above the face and eyes in a band across it, and each region is clustered
+with k-means in CIELAB. The dominant colors become findings - answer ids of the
+photo question (q9 in questionnaire.yaml) - which SeasonAnalyzer scores like any
+other answer.
+
+The work is CPU-bound, so it runs in PhotoPool's worker processes, never on an
+API worker's event loop or threads.
+"""
+
+import asyncio
+import io
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import metrics
+from .color import lab_to_lch, rgb_to_lab
+from .config import settings
+
+# Skin in YCbCr (Chai & Ngan): the chroma box holds across skin tones, the Y floor drops
+# shadows and the saturation floor (distance from gray in the CbCr plane) drops dark hair
+SKIN_CR = (133, 173)
+SKIN_CB = (77, 127)
+SKIN_MIN_Y = 20
+SKIN_MIN_SATURATION = 12
+# ...then skin is the candidates near the dominant candidate cluster. Lightness counts half, so
+# shading stays skin while red or blonde hair, which also passes the YCbCr box, drops out
+SKIN_MAX_DISTANCE = 10.0
+SKIN_LIGHTNESS_WEIGHT = 0.5
+
+# Face-relative search bands, as fractions of the face height (hairline to chin)
+HAIR_BAND = (-0.35, 0.05)
+EYE_BAND = (0.30, 0.50)
+FACE_ASPECT = 1.4  # Face height / width - caps the skin box height, which a bare neck or shoulders would stretch
+
+MIN_REGION_PIXELS = 40  # Fewer pixels than this and a region counts as not found
+MAX_CLUSTER_POINTS = 4096  # k-means runs on an even subsample of larger regions
+
+# Skin hue angle (h in LCh, degrees): golden skin sits higher, pink skin lower
+WARM_HUE = 58.0
+COOL_HUE = 50.0
+# Individual Typology Angle, atan((L* - 50) / b*): above LIGHT_ITA is light skin, below DEEP_ITA deep
+LIGHT_ITA = 41.0
+DEEP_ITA = 10.0
+# Hair (or eye) vs skin lightness difference
+HIGH_CONTRAST_L = 45.0
+LOW_CONTRAST_L = 20.0
+# Chroma: vivid eyes read as bright coloring, red hair as rich, grayed skin and eyes as muted
+BRIGHT_EYE_CHROMA = 22.0
+RICH_HAIR_CHROMA = 25.0
+MUTED_SKIN_CHROMA = 15.0
+
+
+class PhotoError(ValueError):
+    """Raised when a photo cannot be decoded or has no usable face region"""
+
+
+class PhotoPoolBusyError(RuntimeError):
+    """Raised when PHOTO_MAX_PENDING photos are already queued or being analyzed"""
+
+
+def _hex(rgb: np.ndarray) -> str:
+    return "#" + "".join(f"{int(round(channel * 255)):02X}" for channel in np.clip(rgb, 0, 1))
+
+
+def kmeans(points: np.ndarray, k: int, iterations: int = 12) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Lloyd's k-means over (n, 3) points as whole-array steps: (labels, centers, counts).
+    Deterministic - centers start at evenly spaced L* quantiles, so the same photo
+    always gives the same clusters.
+    """
+    k = min(k, len(points))
+    order = np.argsort(points[:, 0], kind="stable")
+    centers = points[order[((np.arange(k) + 0.5) * len(points) / k).astype(int)]]
+    squared = (points ** 2).sum(axis=1, keepdims=True)
+
+    for _ in range(iterations):
+        labels = (squared - 2 * points @ centers.T + (centers ** 2).sum(axis=1)).argmin(axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.stack([np.bincount(labels, weights=points[:, channel], minlength=k) for channel in range(3)], axis=1)
+        updated = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+        converged = np.abs(updated - centers).max() < 0.05
+        centers = updated
+        if converged:
+            break
+
+    labels = (squared - 2 * points @ centers.T + (centers ** 2).sum(axis=1)).argmin(axis=1)
+    return labels, centers, np.bincount(labels, minlength=k)
+
+
+def _subsample(mask: np.ndarray) -> np.ndarray:
+    """Flat indices of a region's pixels, thinned evenly to at most MAX_CLUSTER_POINTS"""
+    indices = np.flatnonzero(mask)
+    if len(indices) > MAX_CLUSTER_POINTS:
+        indices = indices[np.linspace(0, len(indices) - 1, MAX_CLUSTER_POINTS).astype(int)]
+    return indices
+
+
+def _region(rgb: np.ndarray, indices: np.ndarray, k: int) -> List[Dict[str, Any]]:
+    """Clusters of one region in CIELAB, largest first: Lab/LCh centers, mean sRGB hex and pixel share"""
+    labels, centers, counts = kmeans(rgb_to_lab(rgb[indices]), k)
+    lch = lab_to_lch(centers)
+    clusters = []
+    for cluster in np.argsort(-counts, kind="stable"):
+        if counts[cluster] == 0:
+            continue
+        clusters.append({
+            "hex": _hex(rgb[indices[labels == cluster]].mean(axis=0)),
+            "lab": centers[cluster].round(1).tolist(),
+            "chroma": round(float(lch[cluster, 1]), 1),
+            "hue": round(float(lch[cluster, 2]), 1),
+            "share": round(float(counts[cluster] / len(indices)), 3),
+        })
+    return clusters
+
+
+def decode(data: bytes, size: int, max_pixels: int = settings.PHOTO_MAX_PIXELS) -> Tuple[Image.Image, Dict[str, Any]]:
+    """
+    Upright RGB image no larger than size x size. JPEGs are decoded straight at a
+    reduced DCT scale (Image.draft), so a 12 MP photo never exists at full size.
+    Other formats decode at full size, so images above max_pixels are refused first.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        original = {"format": image.format, "width": image.width, "height": image.height}
+        image.draft("RGB", (size, size))
+        if image.width * image.height > max_pixels:
+            raise PhotoError(f"Photo is larger than {max_pixels // 1_000_000} megapixels - upload a smaller photo")
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise PhotoError("Unreadable image - upload a JPEG, PNG or WebP photo") from None
+    image.thumbnail((size, size), Image.Resampling.BILINEAR)
+    return image, original
+
+
+def findings_for(skin: Dict[str, Any], hair: Optional[Dict[str, Any]], eyes: Optional[Dict[str, Any]]) -> Tuple[List[str], Dict[str, float]]:
+    """Photo question answer ids (undertone, value, contrast, chroma) from the region colors, plus the measures behind them"""
+    lightness, _, b = skin["lab"]
+    ita = float(np.degrees(np.arctan2(lightness - 50, b)))
+    measures = {"skin_hue": skin["hue"], "skin_ita": round(ita, 1)}
+
+    findings = [
+        "undertone_warm" if skin["hue"] >= WARM_HUE else "undertone_cool" if skin["hue"] <= COOL_HUE else "undertone_neutral",
+        "value_light" if ita > LIGHT_ITA else "value_deep" if ita < DEEP_ITA else "value_medium",
+    ]
+
+    contrast_with = hair or eyes
+    if contrast_with is not None:
+        contrast = abs(lightness - contrast_with["lab"][0])
+        measures["contrast_l"] = round(contrast, 1)
+        findings.append("contrast_high" if contrast >= HIGH_CONTRAST_L else "contrast_low" if contrast <= LOW_CONTRAST_L else "contrast_medium")
+
+    if eyes is not None and eyes["chroma"] >= BRIGHT_EYE_CHROMA:
+        findings.append("chroma_bright")
+    elif hair is not None and hair["chroma"] >= RICH_HAIR_CHROMA:
+        findings.append("chroma_rich")
+    elif skin["chroma"] < MUTED_SKIN_CHROMA and (eyes is None or eyes["chroma"] < MUTED_SKIN_CHROMA):
+        findings.append("chroma_muted")
+
+    return findings, measures
+
+
+def analyze_photo(data: bytes, size: int = settings.PHOTO_ANALYSIS_SIZE) -> Dict[str, Any]:
+    """
+    Skin, hair and eye colors of a portrait and the photo question findings they
+    give, with per-stage timings in milliseconds. Runs in a PhotoPool worker process.
+    Raises PhotoError if the image is unreadable or shows too little skin.
+    """
+    start = time.perf_counter()
+    timings: Dict[str, float] = {}
+
+    def lap(stage: str, since: float) -> float:
+        now = time.perf_counter()
+        timings[stage] = round((now - since) * 1000, 2)
+        return now
+
+    image, original = decode(data, size)
+    ycbcr = np.asarray(image.convert("YCbCr"))
+    rgb = np.asarray(image, dtype=np.float64).reshape(-1, 3) / 255
+    height, width = ycbcr.shape[:2]
+    stage = lap("decode", start)
+
+    # Skin: YCbCr candidates, narrowed to those close to the dominant candidate color
+    y = ycbcr[..., 0]
+    cb, cr = ycbcr[..., 1].astype(np.int32), ycbcr[..., 2].astype(np.int32)
+    candidates = np.flatnonzero(
+        (cr >= SKIN_CR[0]) & (cr <= SKIN_CR[1]) & (cb >= SKIN_CB[0]) & (cb <= SKIN_CB[1]) & (y >= SKIN_MIN_Y)
+        & ((cb - 128) ** 2 + (cr - 128) ** 2 >= SKIN_MIN_SATURATION ** 2)
+    )
+    if len(candidates) < MIN_REGION_PIXELS:
+        raise PhotoError("No face found - use a well-lit photo of your face in daylight")
+    skin = _region(rgb, candidates[_subsample(np.ones(len(candidates), dtype=bool))], 3)[0]
+    offsets = (rgb_to_lab(rgb[candidates]) - skin["lab"]) * (SKIN_LIGHTNESS_WEIGHT, 1.0, 1.0)
+    skin_mask = np.zeros(height * width, dtype=bool)
+    skin_mask[candidates[(offsets ** 2).sum(axis=1) <= SKIN_MAX_DISTANCE ** 2]] = True
+    skin_mask = skin_mask.reshape(height, width)
+
+    # The face: the robust bounding box of the skin pixels
+    rows, columns = np.nonzero(skin_mask)
+    if len(rows) < MIN_REGION_PIXELS:
+        raise PhotoError("No face found - use a well-lit photo of your face in daylight")
+    top, bottom = np.percentile(rows, (5, 95)).astype(int)
+    left, right = np.percentile(columns, (5, 95)).astype(int)
+    face_width = max(right - left, 1)
+    face_height = max(min(bottom - top, int(FACE_ASPECT * face_width)), 1)
+    bottom = top + face_height
+
+    def band(fractions: Tuple[float, float], inset: float) -> np.ndarray:
+        """Non-skin pixels in a face-relative horizontal band"""
+        mask = np.zeros_like(skin_mask)
+        row_from, row_to = (int(np.clip(top + fraction * face_height, 0, height)) for fraction in fractions)
+        column_from = int(np.clip(left + inset * face_width, 0, width))
+        column_to = int(np.clip(right - inset * face_width, 0, width))
+        mask[row_from:row_to, column_from:column_to] = True
+        return mask & ~skin_mask
+
+    hair_mask = band(HAIR_BAND, -0.1)
+    eye_mask = band(EYE_BAND, 0.15)
+    stage = lap("segment", stage)
+
+    hair = None
+    hair_indices = _subsample(hair_mask)
+    if len(hair_indices) >= MIN_REGION_PIXELS:
+        # The band also catches background: hair is the big cluster least like the top corners
+        corners = np.zeros_like(skin_mask)
+        corner_rows, corner_columns = max(height // 10, 1), max(width // 8, 1)
+        corners[:corner_rows, :corner_columns] = corners[:corner_rows, -corner_columns:] = True
+        background = rgb_to_lab(rgb[corners.ravel()]).mean(axis=0)
+        hair_clusters = _region(rgb, hair_indices, 3)
+        candidates = [
+            (float(np.linalg.norm(np.array(cluster["lab"]) - background)), index)
+            for index, cluster in enumerate(hair_clusters) if cluster["share"] >= 0.15
+        ]
+        if candidates:
+            hair = hair_clusters[max(candidates)[1]]
+
+    eyes = None
+    eye_indices = _subsample(eye_mask)
+    if len(eye_indices) >= MIN_REGION_PIXELS:
+        # Irises are the most colorful non-skin cluster across the eye line (not sclera, not lashes)
+        eye_clusters = _region(rgb, eye_indices, 3)
+        irises = [cluster for cluster in eye_clusters if 15 <= cluster["lab"][0] <= 75]
+        if irises:
+            eyes = max(irises, key=lambda cluster: cluster["chroma"])
+    stage = lap("cluster", stage)
+
+    findings, measures = findings_for(skin, hair, eyes)
+    timings["total"] = round((time.perf_counter() - start) * 1000, 2)
+    return {
+        "findings": findings,
+        "measures": measures,
+        "skin": skin,
+        "hair": hair,
+        "eyes": eyes,
+        "image": {**original, "analyzed_width": width, "analyzed_height": height},
+        "timings_ms": timings,
+    }
+
+
+def save_upload(data: bytes, user_id: int, image_format: Optional[str], upload_dir: Path = settings.PHOTO_UPLOAD_DIR) -> str:
+    """Write an uploaded photo under upload_dir; returns its path for PhotoAnalysis.photo_path"""
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    path = upload_dir / f"{user_id}-{uuid.uuid4().hex}.{(image_format or 'img').lower()}"
+    path.write_bytes(data)
+    return str(path)
+
+
+class PhotoPool:
+    """
+    Runs analyze_photo in worker processes, so decoding and clustering never hold an
+    API worker's GIL. Bounded twice: `workers` processes, and at most `max_pending`
+    photos queued or running per API worker - past that, PhotoPoolBusyError (503)
+    instead of a queue that grows without limit. The pool starts on first use, in
+    the serving process: the gunicorn master (preload_app) must not fork with it.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.PHOTO_WORKERS,
+        max_pending: int = settings.PHOTO_MAX_PENDING,
+        timeout_seconds: float = settings.PHOTO_TIMEOUT_SECONDS,
+        analysis_size: int = settings.PHOTO_ANALYSIS_SIZE,
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout_seconds = timeout_seconds
+        self.analysis_size = analysis_size
+        self.pending = 0
+        self._pending_lock = threading.Lock()  # Slots are released from the executor's result thread
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, not fork: the API worker has threads (outbox, executor) that fork would copy mid-state
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _release(self, future: Optional[Future] = None):
+        with self._pending_lock:
+            self.pending -= 1
+
+    def _discard(self, executor: ProcessPoolExecutor):
+        """A worker died (e.g. out of memory) - drop the broken pool, the next photo starts a fresh one"""
+        if self._executor is executor:
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def analyze(self, data: bytes) -> Dict[str, Any]:
+        """
+        analyze_photo in a worker process. timings_ms gains "queue": time spent waiting
+        for a free worker plus moving the photo and result between processes.
+        Raises PhotoPoolBusyError when full, asyncio.TimeoutError after timeout_seconds
+        and BrokenProcessPool when a worker died. A photo that timed out while running
+        keeps its slot until the worker finishes it.
+        """
+        with self._pending_lock:
+            if self.pending >= self.max_pending:
+                raise PhotoPoolBusyError(f"{self.pending} photos already being analyzed")
+            self.pending += 1
+
+        executor = self.executor
+        submitted = time.perf_counter()
+        try:
+            future = executor.submit(analyze_photo, data, self.analysis_size)
+        except BrokenProcessPool:
+            self._release()
+            self._discard(executor)
+            raise
+        future.add_done_callback(self._release)
+
+        try:
+            # On timeout the future is cancelled: that frees a queued photo's slot at once, a running one's when it ends
+            result = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout_seconds)
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise
+
+        timings = result["timings_ms"]
+        timings["queue"] = round(max((time.perf_counter() - submitted) * 1000 - timings["total"], 0.0), 2)
+        for stage, milliseconds in timings.items():
+            metrics.photo_analysis_seconds.observe(milliseconds / 1000, stage=stage)
+        return result
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Global instance
+photo_pool = PhotoPool()
@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from .catalog_sync import CatalogSync, catalog_sync, describe
+from .color import delta_e2000
+from .config import settings
+from .database import AsyncSessionLocal, async_engine
+from .models import Product
+from .palettes import PaletteStore
+from .rules_loader import rules
+from .schemas import ProductRecommendation
+
+LEADER_LOCK_KEY = 0x70616C66  # pg advisory lock held by the one process that runs the background sync
+
+
+async def load_catalog_colors(session_factory=AsyncSessionLocal) -> List[Dict[str, Any]]:
+    """Every colored variant in the products table (kept up to date by app/catalog_sync.py)"""
+    async with session_factory() as db:
+        rows = (await db.execute(
+            select(Product.medusa_id, Product.title, Product.handle, Product.thumbnail, Product.colors)
+            .order_by(Product.medusa_id)
+        )).all()
+    return [
+        {
+            "product_id": row.medusa_id,
+            "variant_id": color["variant_id"],
+            "title": row.title,
+            "handle": row.handle,
+            "thumbnail": row.thumbnail,
+            "hex": color["hex"],
+            "lab": color["lab"],
+        }
+        for row in rows
+        for color in row.colors or []
+    ]
+
+
+def _encode(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class ProductIndex:
+    """
+    Top product matches per season, precomputed from the catalog's colors so a
+    submit or an email only does a dict lookup. Rebuilt off the request path by
+    CatalogRefresher when the catalog or the rules change.
+    """
+
+    def __init__(self, top_n: int = settings.PRODUCT_RECOMMENDATIONS, max_delta_e: float = settings.PRODUCT_MATCH_MAX_DELTA_E):
+        self.top_n = top_n
+        self.max_delta_e = max_delta_e
+        self.version: Optional[str] = None  # Fingerprint of the catalog and rules it was built from
+        self._matches: Dict[str, List[ProductRecommendation]] = {}
+        self._encoded: Dict[str, bytes] = {}
+
+    @staticmethod
+    def fingerprint(colors: List[Dict[str, Any]], rules_version: str) -> str:
+        digest = hashlib.sha256(rules_version.encode("utf-8"))
+        for color in colors:
+            digest.update(_encode(color))
+        return digest.hexdigest()[:12]
+
+    def build(self, colors: List[Dict[str, Any]], palettes: PaletteStore, version: str) -> Dict[str, List[ProductRecommendation]]:
+        """
+        Rank every catalog color against every season at once: CIEDE2000 from each product
+        color to each palette color, the closest palette color per season, then the
+        top_n distinct products within max_delta_e. Swaps the new tables in atomically.
+        """
+        palette_colors = palettes.colors
+        matches: Dict[str, List[ProductRecommendation]] = {season_palette.season: [] for season_palette in palettes.all()}
+        if colors and palette_colors.entries:
+            distances = delta_e2000(np.array([color["lab"] for color in colors]), palette_colors.lab)
+
+            for season in matches:
+                columns = palette_colors.indices(season)
+                if not len(columns):
+                    continue
+                season_distances = distances[:, columns]
+                nearest = season_distances.argmin(axis=1)
+                best = season_distances[np.arange(len(colors)), nearest]
+
+                seen = set()
+                for row in np.argsort(best, kind="stable"):
+                    if best[row] > self.max_delta_e or len(matches[season]) >= self.top_n:
+                        break
+                    color = colors[row]
+                    if color["product_id"] in seen:
+                        continue
+                    seen.add(color["product_id"])
+                    matched = palette_colors.entries[columns[nearest[row]]][2]
+                    matches[season].append(ProductRecommendation(
+                        product_id=color["product_id"],
+                        variant_id=color["variant_id"],
+                        title=color["title"],
+                        url=f"{settings.STORE_URL}/products/{color['handle']}" if color["handle"] else settings.STORE_URL,
+                        thumbnail=color["thumbnail"],
+                        hex=color["hex"],
+                        matched_color=matched.name,
+                        delta_e=round(float(best[row]), 1),
+                    ))
+
+        encoded = {season: _encode([match.model_dump() for match in season_matches]) for season, season_matches in matches.items()}
+        self._matches, self._encoded, self.version = matches, encoded, version
+        return matches
+
+    def for_season(self, season_key: str) -> List[ProductRecommendation]:
+        """Recommended products for a season (empty until the first build)"""
+        return self._matches.get(season_key, [])
+
+    def encoded(self, season_key: str) -> bytes:
+        """for_season as a JSON array, pre-encoded for splicing into responses"""
+        return self._encoded.get(season_key, b"[]")
+
+
+class CatalogRefresher:
+    """
+    Syncs the catalog from Medusa in the background and rebuilds the index from the
+    products table when the catalog or the rules changed. With several workers on
+    PostgreSQL, only the one holding the leader lock syncs; every worker rebuilds.
+    """
+
+    def __init__(
+        self,
+        index: ProductIndex,
+        sync: CatalogSync,
+        interval_seconds: float = settings.PRODUCT_REFRESH_SECONDS,
+        full_sync_seconds: float = settings.MEDUSA_FULL_SYNC_SECONDS,
+        engine: AsyncEngine = async_engine,
+    ):
+        self.index = index
+        self.sync = sync
+        self.interval_seconds = interval_seconds
+        self.full_sync_seconds = full_sync_seconds
+        self.engine = engine
+        self._task: Optional[asyncio.Task] = None
+        self._leader: Optional[AsyncConnection] = None  # Holds the leader lock while this process is the leader
+
+    async def start(self):
+        """Start refreshing (call from the app startup hook) - the first build runs right away"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._release_leader()
+
+    async def _is_leader(self) -> bool:
+        """
+        Whether this process runs the sync: on PostgreSQL, the one holding the leader lock on
+        a dedicated connection, so the lock passes to another worker if this one dies
+        """
+        if self.engine.dialect.name != "postgresql":
+            return True  # SQLite is local development, a single process
+        if self._leader is not None:
+            try:
+                await self._leader.execute(text("SELECT 1"))
+                await self._leader.commit()
+                return True
+            except Exception:
+                await self._release_leader()  # Connection lost, and the lock with it
+
+        connection = await self.engine.connect()
+        try:
+            acquired = (await connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": LEADER_LOCK_KEY})).scalar_one()
+            await connection.commit()
+        except BaseException:
+            await connection.close()
+            raise
+        if not acquired:
+            await connection.close()
+            return False
+        self._leader = connection
+        print("🔄 This worker runs the Medusa catalog sync")
+        return True
+
+    async def _release_leader(self):
+        """Drop the leader connection - invalidated, so the lock is not returned to the pool with it"""
+        if self._leader is None:
+            return
+        connection, self._leader = self._leader, None
+        try:
+            await connection.invalidate()
+            await connection.close()
+        except Exception:
+            pass
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"❌ Product catalog refresh failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def refresh(self) -> bool:
+        """
+        Sync from Medusa (if configured and this process is the leader), then rebuild if
+        needed; returns whether the index was rebuilt. The sync is a full one, which also
+        drops products deleted in Medusa, every full_sync_seconds (and first thing after
+        startup). A failed sync still rebuilds from what the table has.
+        """
+        if self.sync.configured:
+            try:
+                if await self._is_leader():
+                    last_full = self.sync.last_full_sync_at
+                    full = last_full is None or time.time() - last_full >= self.full_sync_seconds
+                    stats = await self.sync.sync(full=full)
+                    if not stats["not_modified"]:
+                        print(describe(stats))
+            except Exception as e:
+                print(f"❌ Medusa catalog sync failed: {e}")
+
+        colors = await load_catalog_colors(self.sync.session_factory)
+        version = ProductIndex.fingerprint(colors, rules.version)
+        if version == self.index.version:
+            return False
+
+        start = time.perf_counter()
+        matches = await asyncio.get_running_loop().run_in_executor(None, self.index.build, colors, rules.palettes, version)
+        print(f"🛍️  Product index rebuilt: {len(colors)} product colors, "
+              f"{sum(len(season_matches) for season_matches in matches.values())} season matches "
+              f"in {(time.perf_counter() - start) * 1000:.0f}ms")
+        return True
+
+
+# Global instance
+product_index = ProductIndex()
+catalog_refresher = CatalogRefresher(product_index, catalog_sync)
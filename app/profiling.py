@@ -0,0 +1,215 @@
+import asyncio
+import cProfile
+import marshal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from .config import settings
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a profile or trace is requested while another one is running"""
+
+
+class CProfileCollector:
+    """
+    Deterministic profile of the event loop thread, returned in pstats format
+    (readable by pstats, snakeviz, gprof2dot or flameprof)
+    """
+
+    media_type = "application/octet-stream"
+    extension = "pstats"
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        try:
+            self._profile.enable()
+        except ValueError as e:  # Another profiler is already attached to this thread
+            raise ProfilerBusyError(str(e)) from None
+
+    def stop(self):
+        self._profile.disable()
+
+    def result(self) -> bytes:
+        self._profile.create_stats()
+        return marshal.dumps(self._profile.stats)  # Same bytes as Stats.dump_stats
+
+
+class StackSampler:
+    """
+    Sampling profile of every thread (event loop, outbox and executor workers),
+    returned as folded stacks for flamegraph.pl / speedscope
+    """
+
+    media_type = "text/plain; charset=utf-8"
+    extension = "folded"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack.append(names.get(thread_id, str(thread_id)))
+                self._stacks[";".join(reversed(stack))] += 1
+
+    def result(self) -> bytes:
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common()).encode("utf-8")
+
+
+class RequestProfiler:
+    """Profiles the process for the next N requests or T seconds, one profile at a time"""
+
+    def __init__(self, max_seconds: float = settings.PROFILE_MAX_SECONDS, sample_interval: float = settings.PROFILE_SAMPLE_INTERVAL_SECONDS):
+        self.max_seconds = max_seconds
+        self.sample_interval = sample_interval
+        self._busy = False
+        self._remaining = 0
+        self._done: Optional[asyncio.Event] = None
+
+    async def profile(self, mode: str = "cprofile", seconds: Optional[float] = None, requests: Optional[int] = None):
+        """Run a profile and return its collector (call .result() for the file contents)"""
+        if self._busy:
+            raise ProfilerBusyError("A profile is already running")
+        collector = CProfileCollector() if mode == "cprofile" else StackSampler(self.sample_interval)
+        seconds = min(seconds or (self.max_seconds if requests else 10.0), self.max_seconds)
+
+        self._busy = True
+        try:
+            collector.start()
+            try:
+                if requests:
+                    self._remaining = requests
+                    self._done = asyncio.Event()
+                    try:
+                        await asyncio.wait_for(self._done.wait(), seconds)
+                    except asyncio.TimeoutError:
+                        pass  # Fewer than N requests arrived - return what was captured
+                else:
+                    await asyncio.sleep(seconds)
+            finally:
+                collector.stop()
+        finally:
+            self._busy = False
+            self._remaining = 0
+            self._done = None
+        return collector
+
+    def request_finished(self):
+        """Count a completed request towards a running "next N requests" profile"""
+        if self._remaining:
+            self._remaining -= 1
+            if self._remaining == 0:
+                self._done.set()
+
+
+class ProfilingMiddleware:
+    """Reports finished requests (other than /admin ones) to the profiler"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if scope["type"] == "http" and not scope["path"].startswith("/admin"):
+                profiler.request_finished()
+
+
+class MemoryTracer:
+    """tracemalloc snapshots, diffed against the previous snapshot to show growth per allocation site"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last: Optional[tracemalloc.Snapshot] = None
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+
+    def start(self, frames: int = 1) -> Dict[str, Any]:
+        """Start tracing and take the baseline snapshot"""
+        with self._lock:
+            if tracemalloc.is_tracing():
+                raise ProfilerBusyError("tracemalloc is already tracing")
+            tracemalloc.start(frames)
+            self._last = self._snapshot()
+            return self._status()
+
+    def diff(self, top: int = 25, key: str = "lineno", path: Optional[str] = None) -> Dict[str, Any]:
+        """Allocation sites that grew the most since the previous snapshot (which this one replaces)"""
+        with self._lock:
+            if not tracemalloc.is_tracing() or self._last is None:
+                raise ProfilerBusyError("tracemalloc is not tracing - start it first")
+            snapshot = self._snapshot()
+            stats = snapshot.compare_to(self._last, key)
+            self._last = snapshot
+
+            if path:
+                stats = [stat for stat in stats if any(path in frame.filename for frame in stat.traceback)]
+            return {
+                **self._status(),
+                "top": [
+                    {
+                        "site": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                        "size_kb": round(stat.size / 1024, 1),
+                        "size_diff_kb": round(stat.size_diff / 1024, 1),
+                        "count": stat.count,
+                        "count_diff": stat.count_diff,
+                    }
+                    for stat in stats[:top]
+                ],
+            }
+
+    def stop(self) -> Dict[str, Any]:
+        with self._lock:
+            status = {**self._status(), "tracing": False}
+            tracemalloc.stop()
+            self._last = None
+            return status
+
+    def _status(self) -> Dict[str, Any]:
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "traced_current_kb": round(current / 1024, 1),
+            "traced_peak_kb": round(peak / 1024, 1),
+            "timestamp": time.time(),
+        }
+
+
+# Global instance
+profiler = RequestProfiler()
+memory_tracer = MemoryTracer()
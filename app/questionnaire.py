@@ -1,7 +1,9 @@
-from typing import Dict, Any, Tuple
-from collections import defaultdict
-from .rules_loader import rules
-from .schemas import QuestionnaireSubmission, PaletteResult, ColorInfo
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+import numpy as np
+from .rules_loader import rules, UnknownAnswerError
+from . import metrics
+from .season_table import UNDERTONES, VALUES, CHROMAS
+from .schemas import QuestionnaireSubmission, PaletteResult, SeasonScore, SeasonScores
 
 
 class SeasonAnalyzer:
@@ -10,18 +12,21 @@ class SeasonAnalyzer:
     def __init__(self):
         self.rules = rules
 
-    def analyze(self, submission: QuestionnaireSubmission) -> PaletteResult:
+    def analyze(self, submission: QuestionnaireSubmission, photo_findings: Sequence[str] = ()) -> PaletteResult:
         """
+        photo_findings are the photo question's answers (q9), from POST /api/photo's analysis
+        or stored on the response - never from the submitted form.
+
         Main analysis pipeline:
         1. Accumulate signals from responses
         2. Determine characteristics (undertone, value, chroma)
         3. Map to specific season
         4. Calculate confidence
-        5. Return palette
+        5. Return prebuilt palette
         """
 
         # Step 1: Accumulate signals
-        signals = self._accumulate_signals(submission)
+        signals = self._accumulate_signals(submission, photo_findings)
 
         # Step 2: Determine characteristics
         undertone = self._determine_undertone(signals)
@@ -34,29 +39,177 @@ class SeasonAnalyzer:
         # Step 4: Calculate confidence
         confidence = self._calculate_confidence(season_key, undertone, value, chroma, signals, submission)
 
-        # Step 5: Get palette
-        season_data = self.rules.get_season_palette(season_key)
-
-        # Step 6: Build result
-        return PaletteResult(
-            season=season_key,
-            season_display_name=season_data.get("name", season_key.replace("_", " ").title()),
-            confidence=confidence,
-            undertone=undertone,
-            value=value,
-            chroma=chroma,
-            core_neutrals=[ColorInfo(**color) for color in season_data.get("core_neutrals", [])],
-            accent_colors=[ColorInfo(**color) for color in season_data.get("accent_colors", [])],
-            avoid_colors=season_data.get("avoid_colors", []),
-            explanation=None  # TODO: Add AI explanation in Phase 5
+        # Step 5: Build result from the prebuilt season palette
+        return self.rules.palettes.get(season_key).result(confidence, undertone, value, chroma)
+
+    def analyze_batch(
+        self, submissions: List[QuestionnaireSubmission], photo_findings: Optional[List[Sequence[str]]] = None,
+    ) -> List[PaletteResult]:
+        """
+        Analyze many submissions at once (rescoring, imports, simulations).
+        Same pipeline as analyze, with signals, characteristics and season lookup
+        computed as array operations over all submissions. Results are in input
+        order and identical to calling analyze on each submission (with the
+        matching entry of photo_findings).
+        """
+        if not submissions:
+            return []
+
+        signals = self._accumulate_signals_batch(submissions, photo_findings)
+        undertones = self._determine_undertone_batch(signals)
+        values = self._determine_value_batch(signals)
+        chromas = self._determine_chroma_batch(signals)
+        season_keys = self.rules.season_table.lookup_many(undertones, values, chromas)
+
+        results = []
+        rows = zip(submissions, undertones.tolist(), values.tolist(), chromas.tolist(), season_keys.tolist(), signals)
+        for submission, undertone_i, value_i, chroma_i, season_key, submission_signals in rows:
+            undertone, value, chroma = UNDERTONES[undertone_i], VALUES[value_i], CHROMAS[chroma_i]
+            confidence = self._calculate_confidence(season_key, undertone, value, chroma, submission_signals, submission)
+            results.append(self.rules.palettes.get(season_key).result(confidence, undertone, value, chroma))
+        return results
+
+    def unknown_answers(self, submission: QuestionnaireSubmission, photo_findings: Sequence[str] = ()) -> List[str]:
+        """
+        Answers not defined in questionnaire.yaml, as "q4=green_olive" (empty when all are valid).
+        Counted on /metrics; the API rejects such submissions, since scoring would treat them as unanswered.
+        """
+        compiled = self.rules.compiled
+        unknown = []
+        for question_id, answer in self._question_map(submission, photo_findings).items():
+            for answer_id in (answer if isinstance(answer, list) else [answer]):
+                if compiled.answer_row(question_id, answer_id) == compiled.unknown_row:
+                    unknown.append(f"{question_id}={answer_id}")
+                    metrics.unknown_answers.inc(question=question_id)
+        return unknown
+
+    def score_seasons(self, submission: QuestionnaireSubmission, top: int = 3) -> SeasonScores:
+        """Score every season for one submission (see score_seasons_batch)"""
+        return self.score_seasons_batch([submission], top)[0]
+
+    def score_seasons_batch(self, submissions: List[QuestionnaireSubmission], top: int = 3) -> List[SeasonScores]:
+        """
+        Score all seasons in one array pass, for "you might also be" suggestions.
+
+        Each characteristic gets a probability per option (_characteristic_probabilities),
+        every undertone x value x chroma cell gets the product of its options' probabilities,
+        and a season's score is the total probability of the cells the season table assigns
+        to it. Scores therefore sum to 1 and follow the same first-match and fallback rules
+        as analyze. The assigned season is the one analyze returns.
+        """
+        if not submissions:
+            return []
+
+        season_table = self.rules.season_table
+        signals = self._accumulate_signals_batch(submissions)
+        undertone, value, chroma = self._characteristic_probabilities(signals)
+        cells = (undertone[:, :, None, None] * value[:, None, :, None] * chroma[:, None, None, :]).reshape(len(submissions), -1)
+        scores = cells @ season_table.membership
+
+        assigned = season_table.lookup_many(
+            self._determine_undertone_batch(signals),
+            self._determine_value_batch(signals),
+            self._determine_chroma_batch(signals),
         )
+        ranked = np.argsort(-scores, axis=1, kind="stable")[:, :top]
+
+        results = []
+        for row_scores, row_ranked, season_key in zip(scores.tolist(), ranked.tolist(), assigned.tolist()):
+            best = row_scores[row_ranked[0]]
+            results.append(SeasonScores(
+                season=season_key,
+                scores={key: round(score, 4) for key, score in zip(season_table.seasons, row_scores)},
+                top=[
+                    SeasonScore(
+                        season=season_table.seasons[i],
+                        season_display_name=self.rules.palettes.get(season_table.seasons[i]).display_name,
+                        score=round(row_scores[i], 4),
+                        margin=round(best - row_scores[i], 4),
+                    )
+                    for i in row_ranked
+                ],
+            ))
+        return results
+
+    def _characteristic_probabilities(self, signals: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Probabilities over UNDERTONES, VALUES and CHROMAS for each row of signals.
+        Each option scores its signal relative to the threshold analyze uses for it
+        (1.0 = exactly at the threshold). The options analyze falls back to (neutral,
+        medium, clear) score 1.0, so they win when nothing else is strong. A softmax
+        with mapping_logic.score_rules.sharpness turns the scores into probabilities.
+        """
+        index = self.rules.compiled.index
+        signal = {name: signals[:, i] for name, i in index.items()}
+        warm_threshold, cool_threshold = self._undertone_thresholds()
+        light_threshold, deep_threshold = self._value_thresholds()
+        bright_threshold, muted_threshold = self._chroma_thresholds()
+        fallback = np.ones(len(signals))
+
+        undertone = {
+            "warm": signal["undertone_warm"] / warm_threshold,
+            "cool": signal["undertone_cool"] / cool_threshold,
+            # Neutral when warm and cool are within 2 of each other, or on a strong neutral signal
+            "neutral": np.maximum(signal["undertone_neutral"] / 3, 1 - np.abs(signal["undertone_warm"] - signal["undertone_cool"]) / 2),
+        }
+        value = {
+            "light": signal["value_light"] / light_threshold,
+            "medium": fallback,
+            "deep": signal["value_deep"] / deep_threshold,
+        }
+        chroma = {
+            "bright": signal["chroma_bright"] / bright_threshold,
+            "rich": signal["chroma_rich"] / 1.0,
+            "muted": signal["chroma_muted"] / muted_threshold,
+            "soft": signal["chroma_soft"] / 1.0,
+            "clear": fallback,
+        }
 
-    def _accumulate_signals(self, submission: QuestionnaireSubmission) -> Dict[str, int]:
-        """Sum up all signals from questionnaire responses"""
-        signals = defaultdict(int)
+        sharpness = self._mapping_logic("score_rules").get("sharpness", 4.0)
+        return tuple(
+            self._softmax(sharpness * np.stack([scores[name] for name in names], axis=1))
+            for scores, names in ((undertone, UNDERTONES), (value, VALUES), (chroma, CHROMAS))
+        )
 
-        # Map submission fields to question IDs
-        question_map = {
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def _accumulate_signals(self, submission: QuestionnaireSubmission, photo_findings: Sequence[str] = ()) -> List[float]:
+        """Sum up all signals from questionnaire responses into a dense signal vector"""
+        compiled = self.rules.compiled
+        signals = compiled.zero_vector()
+
+        for question_id, answer in self._question_map(submission, photo_findings).items():
+            if isinstance(answer, list):
+                # Multi-select questions - normalize by number of selections to prevent inflation
+                # (photo findings are one per characteristic, so each counts in full)
+                if len(answer) > 0:
+                    normalization_factor = 1.0 if compiled.question_types.get(question_id) == "photo" else 1.0 / len(answer)
+                    for answer_id in answer:
+                        self._add_signals(signals, question_id, answer_id, normalization_factor)
+            else:
+                # Single-select questions - no normalization needed
+                self._add_signals(signals, question_id, answer, 1.0)
+
+        return signals
+
+    @staticmethod
+    def _photo_answers(photo_findings: Sequence[str]) -> List[str]:
+        """
+        Photo findings as q9 answers. Each counts in full, so more than one per
+        characteristic (undertone_warm + undertone_cool) would double its weight.
+        """
+        characteristics = [finding.split("_", 1)[0] for finding in photo_findings]
+        if len(set(characteristics)) != len(characteristics):
+            raise ValueError(f"More than one photo finding per characteristic: {list(photo_findings)}")
+        return list(photo_findings)
+
+    @classmethod
+    def _question_map(cls, submission: QuestionnaireSubmission, photo_findings: Sequence[str] = ()) -> Dict[str, Any]:
+        """Map submission fields (and photo findings) to question IDs"""
+        return {
             "q1": submission.hair_color,
             "q2": submission.skin_tone,
             "q3": submission.eye_color,
@@ -65,41 +218,88 @@ class SeasonAnalyzer:
             "q6": submission.colors_worn,  # Multi-select
             "q7": submission.colors_avoided,  # Multi-select
             "q8": submission.color_feedback,
+            "q9": cls._photo_answers(photo_findings),  # Empty without a photo
         }
 
-        for question_id, answer in question_map.items():
-            if isinstance(answer, list):
-                # Multi-select questions - normalize by number of selections to prevent inflation
-                if len(answer) > 0:
-                    normalization_factor = 1.0 / len(answer)
-                    for answer_id in answer:
-                        self._add_signals(signals, question_id, answer_id, normalization_factor)
+    def _add_signals(self, signals: List[float], question_id: str, answer_id: str, normalization_factor: float = 1.0) -> bool:
+        """
+        Add the signal vector of a specific answer to the accumulator, applying normalization factor.
+        Returns False if the answer id is not defined in questionnaire.yaml (see unknown_answers).
+        """
+        try:
+            answer_signals = self.rules.compiled.signal_vector(question_id, answer_id)
+        except UnknownAnswerError:
+            return False
+
+        for i, weight in enumerate(answer_signals):
+            # Apply normalization (for multi-select questions)
+            signals[i] += weight * normalization_factor
+        return True
+
+    def _accumulate_signals_batch(
+        self, submissions: List[QuestionnaireSubmission], photo_findings: Optional[List[Sequence[str]]] = None,
+    ) -> np.ndarray:
+        """
+        Signal vectors for many submissions as an (n, dimensions) array.
+
+        Each answer is a one-hot row selecting its vector from the compiled
+        answer x signal weight matrix. Answers are added in the same order as
+        _accumulate_signals, one answer slot at a time across all submissions,
+        so every float sum is bit-for-bit identical to the scalar path.
+        """
+        compiled = self.rules.compiled
+        weights = compiled.weight_matrix
+        signals = np.zeros((len(submissions), len(compiled.dimensions)))
+        photo_findings = photo_findings if photo_findings is not None else [()] * len(submissions)
+        question_maps = [self._question_map(submission, findings) for submission, findings in zip(submissions, photo_findings)]
+
+        for question_id in question_maps[0]:
+            answers = [question_map[question_id] for question_map in question_maps]
+
+            if isinstance(answers[0], list):
+                # Multi-select: slot j holds every submission's j-th selection,
+                # weighted by 1/len so larger selections don't inflate the signals
+                counts = np.array([len(answer) for answer in answers])
+                factors = np.ones(len(answers)) if compiled.question_types.get(question_id) == "photo" else 1.0 / np.maximum(counts, 1)
+                for slot in range(counts.max(initial=0)):
+                    members = np.flatnonzero(counts > slot)
+                    rows = np.array([compiled.answer_row(question_id, answers[i][slot]) for i in members])
+                    signals[members] += weights[rows] * factors[members, None]
             else:
-                # Single-select questions - no normalization needed
-                self._add_signals(signals, question_id, answer, 1.0)
+                # Single-select: one weight row per submission, no normalization
+                rows = np.array([compiled.answer_row(question_id, answer) for answer in answers])
+                signals += weights[rows]
 
         return signals
 
-    def _add_signals(self, signals: Dict[str, int], question_id: str, answer_id: str, normalization_factor: float = 1.0):
-        """Add signals from a specific answer to the accumulator, applying normalization factor"""
-        answer_signals = self.rules.get_question_signals(question_id, answer_id)
+    def _signal(self, signals: List[float], name: str) -> float:
+        """Read a single named dimension from the signal vector"""
+        return signals[self.rules.compiled.index[name]]
+
+    def _mapping_logic(self, section: str) -> Dict[str, Any]:
+        return self.rules.mapping_rules.get("mapping_logic", {}).get(section, {})
 
-        for signal_type, values in answer_signals.items():
-            if isinstance(values, dict):
-                for key, weight in values.items():
-                    signal_key = f"{signal_type}_{key}"
-                    # Apply normalization (for multi-select questions)
-                    signals[signal_key] += weight * normalization_factor
+    def _undertone_thresholds(self) -> Tuple[float, float]:
+        mapping = self._mapping_logic("undertone_rules")
+        return mapping.get("warm_threshold", 8), mapping.get("cool_threshold", 8)
 
-    def _determine_undertone(self, signals: Dict[str, int]) -> str:
+    def _value_thresholds(self) -> Tuple[float, float]:
+        mapping = self._mapping_logic("value_rules")
+        # Lower thresholds after normalization fix
+        return mapping.get("light_threshold", 3), mapping.get("deep_threshold", 3)  # Were 6
+
+    def _chroma_thresholds(self) -> Tuple[float, float]:
+        mapping = self._mapping_logic("chroma_rules")
+        # Lower thresholds after normalization fix
+        return mapping.get("bright_threshold", 2.5), mapping.get("muted_threshold", 2.5)  # Were 5
+
+    def _determine_undertone(self, signals: List[float]) -> str:
         """Determine dominant undertone: warm, cool, or neutral"""
-        warm = signals.get("undertone_warm", 0)
-        cool = signals.get("undertone_cool", 0)
-        neutral = signals.get("undertone_neutral", 0)
+        warm = self._signal(signals, "undertone_warm")
+        cool = self._signal(signals, "undertone_cool")
+        neutral = self._signal(signals, "undertone_neutral")
 
-        mapping = self.rules.mapping_rules.get("mapping_logic", {}).get("undertone_rules", {})
-        warm_threshold = mapping.get("warm_threshold", 8)
-        cool_threshold = mapping.get("cool_threshold", 8)
+        warm_threshold, cool_threshold = self._undertone_thresholds()
 
         # Strong signals
         if warm >= warm_threshold and warm > cool:
@@ -114,16 +314,12 @@ class SeasonAnalyzer:
         # Default to whichever is higher
         return "warm" if warm > cool else "cool"
 
-    def _determine_value(self, signals: Dict[str, int]) -> str:
+    def _determine_value(self, signals: List[float]) -> str:
         """Determine dominant value: light, medium, or deep"""
-        light = signals.get("value_light", 0)
-        medium = signals.get("value_medium", 0)
-        deep = signals.get("value_deep", 0)
+        light = self._signal(signals, "value_light")
+        deep = self._signal(signals, "value_deep")
 
-        mapping = self.rules.mapping_rules.get("mapping_logic", {}).get("value_rules", {})
-        # Lower thresholds after normalization fix
-        light_threshold = mapping.get("light_threshold", 3)  # Was 6
-        deep_threshold = mapping.get("deep_threshold", 3)   # Was 6
+        light_threshold, deep_threshold = self._value_thresholds()
 
         # Check which signals hit their thresholds
         light_strong = light >= light_threshold
@@ -142,17 +338,14 @@ class SeasonAnalyzer:
 
         return "medium"
 
-    def _determine_chroma(self, signals: Dict[str, int]) -> str:
+    def _determine_chroma(self, signals: List[float]) -> str:
         """Determine dominant chroma: bright, muted, soft, rich"""
-        bright = signals.get("chroma_bright", 0)
-        muted = signals.get("chroma_muted", 0)
-        soft = signals.get("chroma_soft", 0)
-        rich = signals.get("chroma_rich", 0)
+        bright = self._signal(signals, "chroma_bright")
+        muted = self._signal(signals, "chroma_muted")
+        soft = self._signal(signals, "chroma_soft")
+        rich = self._signal(signals, "chroma_rich")
 
-        mapping = self.rules.mapping_rules.get("mapping_logic", {}).get("chroma_rules", {})
-        # Lower thresholds after normalization fix
-        bright_threshold = mapping.get("bright_threshold", 2.5)  # Was 5
-        muted_threshold = mapping.get("muted_threshold", 2.5)   # Was 5
+        bright_threshold, muted_threshold = self._chroma_thresholds()
 
         # Priority: bright > rich > muted > soft
         if bright >= bright_threshold:
@@ -167,83 +360,68 @@ class SeasonAnalyzer:
         # Default: clear (moderate brightness)
         return "clear"
 
-    def _map_to_season(self, undertone: str, value: str, chroma: str, signals: Dict[str, int]) -> str:
-        """Map characteristics to specific season using decision tree"""
+    def _determine_undertone_batch(self, signals: np.ndarray) -> np.ndarray:
+        """_determine_undertone over an (n, dimensions) array; returns indices into UNDERTONES"""
+        index = self.rules.compiled.index
+        warm = signals[:, index["undertone_warm"]]
+        cool = signals[:, index["undertone_cool"]]
+        neutral = signals[:, index["undertone_neutral"]]
+        warm_threshold, cool_threshold = self._undertone_thresholds()
+        warm_i, cool_i, neutral_i = (UNDERTONES.index(name) for name in ("warm", "cool", "neutral"))
+
+        return np.select(
+            [
+                (warm >= warm_threshold) & (warm > cool),
+                (cool >= cool_threshold) & (cool > warm),
+                (np.abs(warm - cool) <= 2) | (neutral >= 3),
+            ],
+            [warm_i, cool_i, neutral_i],
+            default=np.where(warm > cool, warm_i, cool_i),
+        )
+
+    def _determine_value_batch(self, signals: np.ndarray) -> np.ndarray:
+        """_determine_value over an (n, dimensions) array; returns indices into VALUES"""
+        index = self.rules.compiled.index
+        light = signals[:, index["value_light"]]
+        deep = signals[:, index["value_deep"]]
+        light_threshold, deep_threshold = self._value_thresholds()
+        light_i, medium_i, deep_i = (VALUES.index(name) for name in ("light", "medium", "deep"))
 
-        season_mappings = self.rules.mapping_rules.get("season_mappings", {})
+        light_strong = light >= light_threshold
+        deep_strong = deep >= deep_threshold
+        both_strong = light_strong & deep_strong
+
+        return np.select(
+            [
+                both_strong & (deep >= light),
+                both_strong,
+                light_strong & (light > deep),
+                deep_strong & (deep > light),
+            ],
+            [deep_i, light_i, light_i, deep_i],
+            default=medium_i,
+        )
+
+    def _determine_chroma_batch(self, signals: np.ndarray) -> np.ndarray:
+        """_determine_chroma over an (n, dimensions) array; returns indices into CHROMAS"""
+        index = self.rules.compiled.index
+        bright_threshold, muted_threshold = self._chroma_thresholds()
+
+        # Priority: bright > rich > muted > soft, otherwise clear
+        return np.select(
+            [
+                signals[:, index["chroma_bright"]] >= bright_threshold,
+                signals[:, index["chroma_rich"]] >= 1.0,
+                signals[:, index["chroma_muted"]] >= muted_threshold,
+                signals[:, index["chroma_soft"]] >= 1.0,
+            ],
+            [CHROMAS.index(name) for name in ("bright", "rich", "muted", "soft")],
+            default=CHROMAS.index("clear"),
+        )
 
-        # Find matching season
-        for season_key, season_rules in season_mappings.items():
-            conditions = season_rules.get("conditions", {})
-
-            # Check undertone match
-            undertone_match = self._check_condition(undertone, conditions.get("undertone"))
-            if not undertone_match:
-                continue
-
-            # Check value match
-            value_match = self._check_condition(value, conditions.get("value"))
-            if not value_match:
-                continue
-
-            # Check chroma match
-            chroma_match = self._check_condition(chroma, conditions.get("chroma"))
-            if not chroma_match:
-                continue
-
-            # All conditions match!
-            return season_key
-
-        # Fallback to simple mapping
-        return self._simple_season_map(undertone, value, chroma)
-
-    def _check_condition(self, actual_value: str, expected_value: Any) -> bool:
-        """Check if actual value matches expected (can be string or list)"""
-        if expected_value is None:
-            return True  # No condition specified
-
-        if isinstance(expected_value, list):
-            return actual_value in expected_value
-
-        return actual_value == expected_value
-
-    def _simple_season_map(self, undertone: str, value: str, chroma: str) -> str:
-        """Simple fallback mapping if complex rules don't match"""
-
-        # Spring family (warm + bright/light)
-        if undertone == "warm" and chroma == "bright":
-            return "bright_spring"
-        if undertone == "warm" and value == "light":
-            return "light_spring"
-        if undertone == "warm" and chroma == "clear":
-            return "true_spring"
-
-        # Summer family (cool + soft/light)
-        if undertone == "cool" and value == "light":
-            return "light_summer"
-        if undertone == "cool" and chroma == "muted":
-            return "true_summer"
-        if undertone in ["cool", "neutral"] and chroma in ["muted", "soft"]:
-            return "soft_summer"
-
-        # Autumn family (warm + muted/deep)
-        if undertone == "warm" and chroma == "muted":
-            return "soft_autumn"
-        if undertone == "warm" and chroma == "rich":
-            return "true_autumn"
-        if undertone == "warm" and value == "deep":
-            return "dark_autumn"
-
-        # Winter family (cool + bright/deep)
-        if undertone == "cool" and value == "deep":
-            return "dark_winter"
-        if undertone == "cool" and chroma == "bright":
-            return "true_winter"
-        if undertone == "cool" and chroma == "very_bright":
-            return "bright_winter"
-
-        # Ultimate fallback
-        return "true_spring" if undertone == "warm" else "true_summer"
+    def _map_to_season(self, undertone: str, value: str, chroma: str, signals: List[float]) -> str:
+        """Map characteristics to specific season using the precomputed decision table"""
+        return self.rules.season_table.lookup(undertone, value, chroma)
 
     def _calculate_confidence(
         self,
@@ -251,7 +429,7 @@ class SeasonAnalyzer:
         undertone: str,
         value: str,
         chroma: str,
-        signals: Dict[str, int],
+        signals: List[float],
         submission: QuestionnaireSubmission
     ) -> int:
         """Calculate confidence score 0-100"""
@@ -0,0 +1,266 @@
+"""
+Re-score stored questionnaire responses under the current rules.
+
+Each user's latest response is analyzed again and, if their latest palette was
+computed under older rules, a new palette is written that references the current
+rules version's season_palettes rows. The API always reads the latest palette,
+so users see the new season without re-submitting.
+
+Usage:
+    python -m app.rescore --dry-run          # Only count users whose season would change
+    python -m app.rescore --workers 4 --chunk-size 1000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select
+
+from .database import SessionLocal, async_engine
+from .models import Response, Palette, SeasonPalette
+from .persistence import season_palettes
+from .questionnaire import analyzer
+from .rules_loader import rules
+from .schemas import QuestionnaireSubmission
+
+ANSWER_FIELDS = (
+    "hair_color",
+    "skin_tone",
+    "eye_color",
+    "vein_color",
+    "jewelry_preference",
+    "colors_worn",
+    "colors_avoided",
+    "color_feedback",
+    "photo_findings",  # q9, set by POST /api/photo - passed to the analyzer, not part of the submission
+)
+
+DEFAULT_CHECKPOINT = "rescore-checkpoint.json"
+
+
+def rescore_answers(answers: List[Tuple[Any, ...]]) -> List[Optional[Tuple[str, int, str, str, str]]]:
+    """
+    Analyze one chunk of stored answers (runs in a worker process).
+    Takes and returns plain tuples so chunks are cheap to pickle. Answers that the
+    current rules no longer define give None - they are not scored as unanswered.
+    """
+    submissions, photo_findings = [], []
+    for values in answers:
+        fields = dict(zip(ANSWER_FIELDS, values))
+        fields["colors_worn"] = fields["colors_worn"] or []
+        fields["colors_avoided"] = fields["colors_avoided"] or []
+        photo_findings.append(fields.pop("photo_findings") or [])
+        # Answers were validated when they were submitted
+        submissions.append(QuestionnaireSubmission.model_construct(**fields))
+
+    valid = [
+        i for i, (submission, findings) in enumerate(zip(submissions, photo_findings))
+        if not analyzer.unknown_answers(submission, findings)
+    ]
+    scores: List[Optional[Tuple[str, int, str, str, str]]] = [None] * len(submissions)
+    results = analyzer.analyze_batch([submissions[i] for i in valid], [photo_findings[i] for i in valid])
+    for i, result in zip(valid, results):
+        scores[i] = (result.season, result.confidence, result.undertone, result.value, result.chroma)
+    return scores
+
+
+def latest_responses_query(after_response_id: int):
+    """Every user's latest response with the season of their latest palette, in response ID order"""
+    latest_response = (
+        select(func.max(Response.id).label("id"))
+        .group_by(Response.user_id)
+        .subquery()
+    )
+    latest_palette = (
+        select(func.max(Palette.id).label("id"))
+        .group_by(Palette.user_id)
+        .subquery()
+    )
+    current_palette = (
+        select(Palette.user_id, Palette.season, Palette.season_palette_id)
+        .join(latest_palette, Palette.id == latest_palette.c.id)
+        .subquery()
+    )
+    return (
+        select(
+            Response.id,
+            Response.user_id,
+            *(getattr(Response, field) for field in ANSWER_FIELDS),
+            current_palette.c.season,
+            current_palette.c.season_palette_id,
+        )
+        .join(latest_response, Response.id == latest_response.c.id)
+        .outerjoin(current_palette, current_palette.c.user_id == Response.user_id)
+        .where(Response.id > after_response_id)
+        .order_by(Response.id)
+    )
+
+
+def load_checkpoint(path: Path) -> int:
+    """Last response ID finished under the current rules (0 to start from the beginning)"""
+    if not path.exists():
+        return 0
+    checkpoint = json.loads(path.read_text())
+    if checkpoint.get("rules_version") != rules.version:
+        print(f"⚠️  Checkpoint {path} is for rules {checkpoint.get('rules_version')} - starting over")
+        return 0
+    return checkpoint["last_response_id"]
+
+
+def save_checkpoint(path: Path, last_response_id: int):
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps({"rules_version": rules.version, "last_response_id": last_response_id}))
+    os.replace(tmp_path, path)  # Atomic, so a crash never leaves a half-written checkpoint
+
+
+async def _current_season_palette_ids() -> Dict[str, int]:
+    """season_palettes IDs for the loaded rules, writing the rows if this version is new"""
+    try:
+        await season_palettes.ensure_current()
+        return {
+            season_palette.season: await season_palettes.id_for(season_palette.season)
+            for season_palette in rules.palettes.all()
+        }
+    finally:
+        await async_engine.dispose()
+
+
+def _stored_season_palette_ids() -> Dict[str, int]:
+    """season_palettes IDs already written for the loaded rules - read-only, for --dry-run"""
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(SeasonPalette.season, SeasonPalette.id).where(SeasonPalette.rules_version == rules.version)
+        ).all()
+    return {row.season: row.id for row in rows}
+
+
+def _completed(value) -> Future:
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def rescore(
+    chunk_size: int = 1000,
+    workers: int = os.cpu_count() or 1,
+    dry_run: bool = False,
+    checkpoint_path: Path = Path(DEFAULT_CHECKPOINT),
+) -> Dict[str, Any]:
+    """
+    Stream users' latest responses through a server-side cursor, score the chunks on a
+    process pool and bulk-insert the new palettes. The checkpoint records the last response
+    ID whose chunk was committed; users whose latest palette already uses the current rules
+    are skipped, so a rerun after an interrupted job never writes a palette twice.
+    """
+    # A dry run reads the same IDs and checkpoint, so its counts match the real run; it only never writes
+    current_ids = _stored_season_palette_ids() if dry_run else asyncio.run(_current_season_palette_ids())
+    after_response_id = load_checkpoint(checkpoint_path)
+    current_id_set = set(current_ids.values())
+
+    stats = {"rules_version": rules.version, "dry_run": dry_run, "scanned": 0, "rescored": 0,
+             "already_current": 0, "unknown_answers": 0, "changed_season": 0, "palettes_written": 0}
+
+    reader = SessionLocal()
+    writer = SessionLocal()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    pending = deque()  # (last response id in chunk, rows to score, future), in cursor order
+    start = time.perf_counter()
+
+    def finish_oldest():
+        last_response_id, rows, future = pending.popleft()
+        scores = future.result()
+
+        palette_rows = []
+        for row, score in zip(rows, scores):
+            if score is None:
+                # Answers the current rules don't define - the user keeps their palette
+                stats["unknown_answers"] += 1
+                continue
+            season, confidence, undertone, value, chroma = score
+            if season != row.season:
+                stats["changed_season"] += 1
+            palette_rows.append({
+                "user_id": row.user_id,
+                "season": season,
+                "season_palette_id": current_ids.get(season),
+                "confidence": confidence,
+                "undertone": undertone,
+                "value": value,
+                "chroma": chroma,
+            })
+        stats["rescored"] += len(palette_rows)
+
+        if not dry_run:
+            if palette_rows:
+                writer.execute(insert(Palette), palette_rows)
+                writer.commit()
+                stats["palettes_written"] += len(palette_rows)
+            save_checkpoint(checkpoint_path, last_response_id)
+
+        elapsed = time.perf_counter() - start
+        print(
+            f"⏳ {stats['scanned']}/{total} scanned, {stats['rescored']} rescored, "
+            f"{stats['changed_season']} changed season ({stats['scanned'] / elapsed:.0f} rows/s)"
+        )
+
+    try:
+        total = reader.execute(
+            select(func.count()).select_from(latest_responses_query(after_response_id).subquery())
+        ).scalar_one()
+        print(f"🔁 Rescoring {total} users under rules {rules.version}"
+              + (f" (resuming after response {after_response_id})" if after_response_id else "")
+              + (" - dry run, nothing will be written" if dry_run else ""))
+
+        # yield_per streams rows with a server-side cursor instead of loading the whole table
+        result = reader.execute(latest_responses_query(after_response_id).execution_options(yield_per=chunk_size))
+        for chunk in result.partitions():
+            stats["scanned"] += len(chunk)
+            rows = [row for row in chunk if row.season_palette_id is None or row.season_palette_id not in current_id_set]
+            stats["already_current"] += len(chunk) - len(rows)
+
+            answers = [tuple(getattr(row, field) for field in ANSWER_FIELDS) for row in rows]
+            future = pool.submit(rescore_answers, answers) if pool else _completed(rescore_answers(answers))
+            pending.append((chunk[-1].id, rows, future))
+
+            # Keep every worker busy while the cursor fetches the next chunk
+            if len(pending) > workers:
+                finish_oldest()
+
+        while pending:
+            finish_oldest()
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+        reader.close()
+        writer.close()
+
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored responses under the current rules")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many users would change season")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Rows fetched and scored per chunk")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Scoring processes (1 = in-process)")
+    parser.add_argument("--checkpoint", type=Path, default=Path(DEFAULT_CHECKPOINT), help="Resume checkpoint file")
+    args = parser.parse_args()
+
+    stats = rescore(args.chunk_size, args.workers, args.dry_run, args.checkpoint)
+
+    if args.dry_run:
+        print(f"✅ Dry run: {stats['changed_season']} of {stats['rescored']} users would change season")
+    else:
+        print(f"✅ Wrote {stats['palettes_written']} palettes, {stats['changed_season']} users changed season")
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,141 @@
+import numpy as np
 import yaml
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
+from .season_table import SeasonTable
+from .palettes import PaletteStore
+from .rules_snapshot import RULE_FILES, RULES_DIR, RulesValidationError, load_snapshot, rules_version, validate_rules
+
+
+# Canonical signal dimensions, in vector order. Any extra signal found in
+# questionnaire.yaml is appended after these when the rules are compiled.
+SIGNAL_DIMENSIONS: Tuple[str, ...] = (
+    "undertone_warm",
+    "undertone_cool",
+    "undertone_neutral",
+    "value_light",
+    "value_medium",
+    "value_deep",
+    "chroma_bright",
+    "chroma_muted",
+    "chroma_soft",
+    "chroma_rich",
+    "contrast_high",
+    "contrast_medium",
+    "contrast_low",
+)
+
+
+class UnknownAnswerError(KeyError):
+    """Raised when an answer id is not defined for a question in questionnaire.yaml"""
+
+    def __init__(self, question_id: str, answer_id: Any):
+        super().__init__(f"{question_id}={answer_id}")
+        self.question_id = question_id
+        self.answer_id = answer_id
+
+
+class CompiledRules:
+    """Questionnaire rules compiled into dense signal vectors, built once per load"""
+
+    def __init__(self, questionnaire: Dict[str, Any]):
+        dimensions = list(SIGNAL_DIMENSIONS)
+        options: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        question_types: Dict[str, str] = {}
+
+        for q_data in questionnaire.get("questions", {}).values():
+            question_id = q_data.get("id")
+            question_types[question_id] = q_data.get("type", "single_choice")
+            for option in q_data.get("options", []):
+                signals = option.get("signals") or {}
+                options[(question_id, option.get("id"))] = signals
+                for signal_type, values in signals.items():
+                    if isinstance(values, dict):
+                        for key in values:
+                            name = f"{signal_type}_{key}"
+                            if name not in dimensions:
+                                dimensions.append(name)
+
+        self.dimensions: Tuple[str, ...] = tuple(dimensions)
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.dimensions)}
+        self.question_types = question_types
+        self.options = options
+        self.vectors: Dict[Tuple[str, str], Tuple[float, ...]] = {
+            answer: self._to_vector(signals) for answer, signals in options.items()
+        }
+
+        # Answer x signal weight matrix for batch scoring: row answer_rows[(qid, aid)] is that
+        # answer's vector, and the extra last row (unknown_row) is all zeros for unknown answers
+        self.answer_rows: Dict[Tuple[str, str], int] = {answer: i for i, answer in enumerate(self.vectors)}
+        self.unknown_row = len(self.answer_rows)
+        self.weight_matrix = np.zeros((len(self.answer_rows) + 1, len(self.dimensions)))
+        for answer, row in self.answer_rows.items():
+            self.weight_matrix[row] = self.vectors[answer]
+        self.weight_matrix.setflags(write=False)
+
+    def _to_vector(self, signals: Dict[str, Any]) -> Tuple[float, ...]:
+        """Flatten nested {type: {key: weight}} signals into a dense vector"""
+        vector = [0.0] * len(self.dimensions)
+        for signal_type, values in signals.items():
+            if isinstance(values, dict):
+                for key, weight in values.items():
+                    vector[self.index[f"{signal_type}_{key}"]] += weight
+        return tuple(vector)
+
+    def signal_vector(self, question_id: str, answer_id: str) -> Tuple[float, ...]:
+        """Get the dense signal vector for an answer, raising UnknownAnswerError if undefined"""
+        try:
+            return self.vectors[(question_id, answer_id)]
+        except (KeyError, TypeError):
+            raise UnknownAnswerError(question_id, answer_id) from None
+
+    def answer_row(self, question_id: str, answer_id: Any) -> int:
+        """Row of weight_matrix for an answer (unknown_row if the answer is not defined)"""
+        try:
+            return self.answer_rows.get((question_id, answer_id), self.unknown_row)
+        except TypeError:
+            return self.unknown_row
+
+    def zero_vector(self) -> list:
+        """Fresh accumulator with one slot per signal dimension"""
+        return [0.0] * len(self.dimensions)
 
 
 class RulesLoader:
     """Loads and provides access to YAML rule files"""
 
-    def __init__(self):
-        self.rules_dir = Path(__file__).parent.parent / "rules"
+    def __init__(self, rules_dir: Path = RULES_DIR):
+        self.rules_dir = rules_dir
+        self.source = None  # "snapshot" or "yaml" once loaded
         self._questionnaire = None
         self._seasons = None
         self._mapping_rules = None
+        self._compiled = None
+        self._season_table = None
+        self._palettes = None
+        self._version = None
+
+    def load(self) -> "RulesLoader":
+        """
+        Load everything up front: from the precompiled snapshot when it matches the
+        YAML files (python -m app.rules_snapshot), otherwise by parsing the YAML.
+        Raises RulesValidationError if the YAML is inconsistent (a snapshot was
+        validated when it was built).
+        """
+        snapshot = load_snapshot(self.rules_dir, self.version)
+        if snapshot is not None:
+            self._questionnaire = snapshot["questionnaire"]
+            self._seasons = snapshot["seasons"]
+            self._mapping_rules = snapshot["mapping_rules"]
+            self.source = "snapshot"
+        else:
+            errors = validate_rules(self.questionnaire, self.seasons, self.mapping_rules)
+            if errors:
+                raise RulesValidationError(errors)
+            self.source = "yaml"
+
+        self.compiled, self.season_table, self.palettes
+        return self
 
     @property
     def questionnaire(self) -> Dict[str, Any]:
@@ -36,17 +161,40 @@ class RulesLoader:
                 self._mapping_rules = yaml.safe_load(f)
         return self._mapping_rules
 
-    def get_question_signals(self, question_id: str, answer_id: str) -> Dict[str, Any]:
-        """Get signals for a specific answer"""
-        questions = self.questionnaire.get("questions", {})
+    @property
+    def compiled(self) -> CompiledRules:
+        """Answer -> signal vector index, compiled once from the questionnaire"""
+        if self._compiled is None:
+            self._compiled = CompiledRules(self.questionnaire)
+        return self._compiled
 
-        for q_key, q_data in questions.items():
-            if q_data.get("id") == question_id:
-                for option in q_data.get("options", []):
-                    if option.get("id") == answer_id:
-                        return option.get("signals", {})
+    @property
+    def season_table(self) -> SeasonTable:
+        """Characteristics -> season decision table, built once from the mapping rules"""
+        if self._season_table is None:
+            self._season_table = SeasonTable(self.mapping_rules)
+        return self._season_table
+
+    @property
+    def palettes(self) -> PaletteStore:
+        """Prebuilt per-season palettes and response fragments"""
+        if self._palettes is None:
+            self._palettes = PaletteStore(self.seasons, self.version)
+        return self._palettes
 
-        return {}
+    @property
+    def version(self) -> str:
+        """Short content hash of the rule files, identifying which rules produced a result"""
+        if self._version is None:
+            self._version = rules_version(self.rules_dir)
+        return self._version
+
+    def get_question_signals(self, question_id: str, answer_id: str) -> Dict[str, Any]:
+        """Get signals for a specific answer, raising UnknownAnswerError if undefined"""
+        try:
+            return self.compiled.options[(question_id, answer_id)]
+        except (KeyError, TypeError):
+            raise UnknownAnswerError(question_id, answer_id) from None
 
     def get_season_palette(self, season_key: str) -> Dict[str, Any]:
         """Get palette for a specific season"""
@@ -54,5 +202,5 @@ class RulesLoader:
         return seasons.get(season_key, {})
 
 
-# Global instance
-rules = RulesLoader()
+# Global instance - loaded at import so no request pays the parse cost
+rules = RulesLoader().load()
@@ -0,0 +1,194 @@
+"""
+Precompiled rules snapshot.
+
+Parsing the three YAML files is the slowest part of loading the rules, so a build
+step validates them once and pickles the parsed result next to them. RulesLoader
+loads the snapshot at import when it matches the YAML files byte for byte (same
+content hash), and falls back to parsing the YAML otherwise.
+
+Usage:
+    python -m app.rules_snapshot           # Validate and write rules/rules.snapshot
+    python -m app.rules_snapshot --check   # Validate only
+
+Both also print advisory color checks (CIEDE2000 across every season palette):
+colors repeated between seasons, and avoid_colors close to the season's accents.
+"""
+
+import argparse
+import hashlib
+import pickle
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+from .palettes import PaletteStore
+from .season_table import UNDERTONES, VALUES, CHROMAS
+
+RULE_FILES = ("questionnaire.yaml", "seasons.yaml", "mapping-rules.yaml")
+RULES_DIR = Path(__file__).parent.parent / "rules"
+SNAPSHOT_NAME = "rules.snapshot"
+SNAPSHOT_FORMAT = 1  # Bump when the snapshot layout changes
+
+HEX_COLOR = re.compile(r"^#[0-9A-Fa-f]{6}$")
+CONDITION_VALUES = {"undertone": set(UNDERTONES), "value": set(VALUES), "chroma": set(CHROMAS)}
+
+
+class RulesValidationError(ValueError):
+    """Raised when the rule files are inconsistent; .errors lists every problem found"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__(f"{len(errors)} problem(s) in rules: " + "; ".join(errors))
+        self.errors = errors
+
+
+def rules_version(rules_dir: Path = RULES_DIR) -> str:
+    """Short content hash of the rule files, identifying which rules produced a result"""
+    digest = hashlib.sha256()
+    for name in RULE_FILES:
+        digest.update((rules_dir / name).read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def parse_rules(rules_dir: Path = RULES_DIR) -> Dict[str, Any]:
+    """Parse the three YAML files"""
+    parsed = {}
+    for key, name in (("questionnaire", "questionnaire.yaml"), ("seasons", "seasons.yaml"), ("mapping_rules", "mapping-rules.yaml")):
+        with open(rules_dir / name, "r") as f:
+            parsed[key] = yaml.safe_load(f)
+    return parsed
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_rules(questionnaire: Dict[str, Any], seasons: Dict[str, Any], mapping_rules: Dict[str, Any]) -> List[str]:
+    """Every problem that would make the analyzer misbehave, as readable messages"""
+    errors = []
+
+    # questionnaire.yaml: ids, types and numeric signal weights
+    questions = (questionnaire or {}).get("questions") or {}
+    if not questions:
+        errors.append("questionnaire.yaml: no questions")
+    question_ids = set()
+    for key, q_data in questions.items():
+        question_id = q_data.get("id")
+        if not question_id:
+            errors.append(f"questionnaire.yaml: {key} has no id")
+        elif question_id in question_ids:
+            errors.append(f"questionnaire.yaml: duplicate question id {question_id}")
+        question_ids.add(question_id)
+        if q_data.get("type", "single_choice") not in ("single_choice", "multi_choice", "photo"):
+            errors.append(f"questionnaire.yaml: {key} has unknown type {q_data.get('type')!r}")
+
+        option_ids = set()
+        for option in q_data.get("options") or []:
+            option_id = option.get("id")
+            if not option_id:
+                errors.append(f"questionnaire.yaml: {key} has an option without an id")
+            elif option_id in option_ids:
+                errors.append(f"questionnaire.yaml: {key} has duplicate option {option_id}")
+            option_ids.add(option_id)
+            for signal_type, values in (option.get("signals") or {}).items():
+                if not isinstance(values, dict) or not all(_is_number(weight) for weight in values.values()):
+                    errors.append(f"questionnaire.yaml: {key}.{option_id} signal {signal_type} must map names to numbers")
+
+    # seasons.yaml: every color has a name and a #RRGGBB hex
+    season_defs = (seasons or {}).get("seasons") or {}
+    if not season_defs:
+        errors.append("seasons.yaml: no seasons")
+    for season_key, season_data in season_defs.items():
+        if not (season_data.get("core_neutrals") or season_data.get("accent_colors")):
+            errors.append(f"seasons.yaml: {season_key} has no core_neutrals or accent_colors")
+        for group in ("core_neutrals", "accent_colors"):
+            for color in season_data.get(group) or []:
+                if not color.get("name") or not HEX_COLOR.match(str(color.get("hex", ""))):
+                    errors.append(f"seasons.yaml: {season_key}.{group} has an invalid color {color}")
+        if not all(isinstance(name, str) for name in season_data.get("avoid_colors") or []):
+            errors.append(f"seasons.yaml: {season_key}.avoid_colors must be color names")
+
+    # mapping-rules.yaml: numeric thresholds, known seasons and characteristic values
+    for section, rules_section in ((mapping_rules or {}).get("mapping_logic") or {}).items():
+        for name, value in (rules_section or {}).items():
+            if name.endswith("_threshold") and not _is_number(value):
+                errors.append(f"mapping-rules.yaml: mapping_logic.{section}.{name} must be a number")
+
+    for season_key, season_rules in ((mapping_rules or {}).get("season_mappings") or {}).items():
+        if season_key not in season_defs:
+            errors.append(f"mapping-rules.yaml: season_mappings.{season_key} is not defined in seasons.yaml")
+        for characteristic, expected in (season_rules.get("conditions") or {}).items():
+            allowed = CONDITION_VALUES.get(characteristic)
+            if allowed is None:
+                errors.append(f"mapping-rules.yaml: {season_key} has unknown condition {characteristic}")
+                continue
+            for value in expected if isinstance(expected, list) else [expected]:
+                if value not in allowed:
+                    errors.append(f"mapping-rules.yaml: {season_key} {characteristic} {value!r} can never match")
+        for modifier in season_rules.get("confidence_modifiers") or []:
+            if not _is_number(modifier.get("boost", 0)):
+                errors.append(f"mapping-rules.yaml: {season_key} confidence modifier boost must be a number")
+
+    return errors
+
+
+def build_snapshot(rules_dir: Path = RULES_DIR) -> bytes:
+    """Parse and validate the rule files, raising RulesValidationError if they are inconsistent"""
+    parsed = parse_rules(rules_dir)
+    errors = validate_rules(parsed["questionnaire"], parsed["seasons"], parsed["mapping_rules"])
+    if errors:
+        raise RulesValidationError(errors)
+    return pickle.dumps(
+        {"format": SNAPSHOT_FORMAT, "version": rules_version(rules_dir), **parsed},
+        protocol=pickle.HIGHEST_PROTOCOL,
+    )
+
+
+def load_snapshot(rules_dir: Path, version: str) -> Optional[Dict[str, Any]]:
+    """Parsed rules from the snapshot, or None if there is none or it is stale"""
+    path = rules_dir / SNAPSHOT_NAME
+    if not path.exists():
+        return None
+    try:
+        snapshot = pickle.loads(path.read_bytes())
+    except Exception as e:
+        print(f"⚠️  Ignoring unreadable rules snapshot {path}: {e}")
+        return None
+    if snapshot.get("format") != SNAPSHOT_FORMAT or snapshot.get("version") != version:
+        print("⚠️  Rules snapshot is stale (rules changed since it was built) - parsing YAML. Rebuild with: python -m app.rules_snapshot")
+        return None
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate the rules and write the precompiled snapshot")
+    parser.add_argument("--check", action="store_true", help="Validate only, don't write the snapshot")
+    parser.add_argument("--rules-dir", type=Path, default=RULES_DIR, help="Directory with the YAML rule files")
+    args = parser.parse_args()
+
+    try:
+        snapshot = build_snapshot(args.rules_dir)
+    except RulesValidationError as e:
+        print("❌ Rules are invalid:")
+        for error in e.errors:
+            print(f"   {error}")
+        sys.exit(1)
+
+    # Color checks are advisory: shared colors and close avoid colors can be deliberate
+    version = rules_version(args.rules_dir)
+    for warning in PaletteStore(parse_rules(args.rules_dir)["seasons"], version).colors.audit():
+        print(f"⚠️  {warning}")
+
+    if args.check:
+        print(f"✅ Rules are valid (version {rules_version(args.rules_dir)})")
+        return
+
+    path = args.rules_dir / SNAPSHOT_NAME
+    path.write_bytes(snapshot)
+    print(f"✅ Rules snapshot written to {path} (version {rules_version(args.rules_dir)}, {len(snapshot) / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from typing import Annotated, Any, Dict, List, Optional
 from datetime import datetime
+from .config import settings
 
 
 class QuestionnaireSubmission(BaseModel):
@@ -39,9 +40,18 @@ class QuestionnaireSubmission(BaseModel):
     # Q8: Feedback
     color_feedback: str
 
+    # Q9 (photo findings) is not part of the form: POST /api/photo passes it to the analyzer
+
+
+class SubmissionBatch(BaseModel):
+    """Batch of questionnaires (kiosks, event imports) - each item is validated separately"""
+    submissions: List[Any] = Field(min_length=1, max_length=settings.SUBMIT_BATCH_MAX_ITEMS)
+
 
 class ColorInfo(BaseModel):
     """Individual color with name and hex code"""
+    model_config = ConfigDict(frozen=True)  # Shared between results of the same season
+
     name: str
     hex: str
 
@@ -66,6 +76,85 @@ class PaletteResult(BaseModel):
     explanation: Optional[str] = None
 
 
+class ProductRecommendation(BaseModel):
+    """Catalog product whose color sits close to the season's palette"""
+    product_id: str
+    variant_id: Optional[str] = None
+    title: str
+    url: str
+    thumbnail: Optional[str] = None
+    hex: str
+    matched_color: str  # Nearest palette color
+    delta_e: float  # CIEDE2000 to it
+
+
+class SubmitResult(PaletteResult):
+    """PaletteResult plus product picks for the season"""
+    recommendations: List[ProductRecommendation] = []
+
+
+HEX_PATTERN = r"^#?[0-9A-Fa-f]{6}$"
+
+
+class MatchResult(BaseModel):
+    """How a color (e.g. a product's) sits against a season's palette"""
+    season: str
+    hex: str
+    verdict: str  # "suits", "neutral" or "avoid"
+    delta_e: float  # CIEDE2000 to the nearest palette color
+    nearest_color: ColorInfo
+    avoid_color: Optional[str] = None  # The avoid color it is closest to, when verdict is "avoid"
+
+
+class MatchBatch(BaseModel):
+    """Colors to check against one season"""
+    season: str
+    hexes: List[Annotated[str, Field(pattern=HEX_PATTERN)]] = Field(min_length=1, max_length=settings.MATCH_BATCH_MAX_ITEMS)
+
+
+class MatchBatchResult(BaseModel):
+    """One MatchResult per color, in the order they were sent"""
+    season: str
+    matches: List[MatchResult]
+
+
+class PhotoAnalysisResult(PaletteResult):
+    """Season refined with the findings of a photo (POST /api/photo)"""
+    questionnaire_season: str  # Season from the questionnaire answers alone
+    findings: List[str]  # Photo question answer ids (q9 in questionnaire.yaml)
+    analysis: Dict[str, Any]  # Skin, hair and eye colors, measures and per-stage timings (timings_ms)
+
+
+class SeasonScore(BaseModel):
+    """One season's share of the score distribution"""
+    season: str
+    season_display_name: str
+    score: float  # 0-1, scores of all seasons sum to 1
+    margin: float  # How far behind the top season
+
+
+class SeasonScores(BaseModel):
+    """Score of every season, plus the top few for "you might also be" suggestions"""
+    season: str  # The season analyze assigns
+    scores: Dict[str, float]
+    top: List[SeasonScore]
+
+
+class BatchItemResult(BaseModel):
+    """Outcome of one batch item: its palette, or why it was rejected"""
+    index: int
+    email: Optional[str] = None
+    result: Optional[PaletteResult] = None
+    errors: Optional[List[str]] = None
+
+
+class SubmissionBatchResult(BaseModel):
+    """Per-item outcomes, in the order the items were sent"""
+    accepted: int
+    rejected: int
+    items: List[BatchItemResult]
+
+
 class UserResponse(BaseModel):
     """User data for API responses"""
     id: int
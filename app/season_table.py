@@ -0,0 +1,135 @@
+import json
+import numpy as np
+from typing import Dict, Any, List, Tuple
+
+
+# Every value the analyzer can produce for each characteristic
+UNDERTONES: Tuple[str, ...] = ("warm", "cool", "neutral")
+VALUES: Tuple[str, ...] = ("light", "medium", "deep")
+CHROMAS: Tuple[str, ...] = ("bright", "rich", "muted", "soft", "clear")
+
+# Fallback used when no season in mapping-rules.yaml matches, checked in order.
+# Conditions use the same format as season_mappings conditions.
+FALLBACK_RULES: Tuple[Tuple[str, Dict[str, Any]], ...] = (
+    # Spring family (warm + bright/light)
+    ("bright_spring", {"undertone": "warm", "chroma": "bright"}),
+    ("light_spring", {"undertone": "warm", "value": "light"}),
+    ("true_spring", {"undertone": "warm", "chroma": "clear"}),
+    # Summer family (cool + soft/light)
+    ("light_summer", {"undertone": "cool", "value": "light"}),
+    ("true_summer", {"undertone": "cool", "chroma": "muted"}),
+    ("soft_summer", {"undertone": ["cool", "neutral"], "chroma": ["muted", "soft"]}),
+    # Autumn family (warm + muted/deep)
+    ("soft_autumn", {"undertone": "warm", "chroma": "muted"}),
+    ("true_autumn", {"undertone": "warm", "chroma": "rich"}),
+    ("dark_autumn", {"undertone": "warm", "value": "deep"}),
+    # Winter family (cool + bright/deep)
+    ("dark_winter", {"undertone": "cool", "value": "deep"}),
+    ("true_winter", {"undertone": "cool", "chroma": "bright"}),
+    ("bright_winter", {"undertone": "cool", "chroma": "very_bright"}),
+    # Ultimate fallback
+    ("true_spring", {"undertone": "warm"}),
+    ("true_summer", {}),
+)
+
+
+def check_condition(actual_value: str, expected_value: Any) -> bool:
+    """Check if actual value matches expected (can be string or list)"""
+    if expected_value is None:
+        return True  # No condition specified
+
+    if isinstance(expected_value, list):
+        return actual_value in expected_value
+
+    return actual_value == expected_value
+
+
+def matches(conditions: Dict[str, Any], undertone: str, value: str, chroma: str) -> bool:
+    """Check all three characteristic conditions"""
+    return (
+        check_condition(undertone, conditions.get("undertone"))
+        and check_condition(value, conditions.get("value"))
+        and check_condition(chroma, conditions.get("chroma"))
+    )
+
+
+class SeasonTable:
+    """Exhaustive undertone x value x chroma -> season table, built once from mapping-rules.yaml"""
+
+    def __init__(self, mapping_rules: Dict[str, Any]):
+        season_mappings = mapping_rules.get("season_mappings", {})
+
+        self._undertone_index = {name: i for i, name in enumerate(UNDERTONES)}
+        self._value_index = {name: i for i, name in enumerate(VALUES)}
+        self._chroma_index = {name: i for i, name in enumerate(CHROMAS)}
+
+        cells: List[str] = []
+        overlaps: List[Dict[str, Any]] = []
+        fallback_cells: List[Dict[str, Any]] = []
+        fallback_hits = [0] * len(FALLBACK_RULES)
+
+        for undertone in UNDERTONES:
+            for value in VALUES:
+                for chroma in CHROMAS:
+                    cell = {"undertone": undertone, "value": value, "chroma": chroma}
+                    claimed = [
+                        season_key
+                        for season_key, season_rules in season_mappings.items()
+                        if matches(season_rules.get("conditions", {}), undertone, value, chroma)
+                    ]
+
+                    if claimed:
+                        # First match in mapping-rules.yaml order wins
+                        cells.append(claimed[0])
+                        if len(claimed) > 1:
+                            overlaps.append({**cell, "seasons": claimed, "winner": claimed[0]})
+                        continue
+
+                    for branch, (season_key, conditions) in enumerate(FALLBACK_RULES):
+                        if matches(conditions, undertone, value, chroma):
+                            cells.append(season_key)
+                            fallback_hits[branch] += 1
+                            fallback_cells.append({**cell, "season": season_key, "fallback_branch": branch})
+                            break
+
+        self.cells: Tuple[str, ...] = tuple(cells)
+        self._cell_array = np.array(self.cells, dtype=object)
+
+        # Every season a cell can be assigned to (mapping-rules.yaml order, then fallback-only
+        # seasons), and a cells x seasons 0/1 matrix: a distribution over cells times this
+        # matrix is a distribution over seasons
+        self.seasons: Tuple[str, ...] = tuple(dict.fromkeys([*season_mappings, *self.cells]))
+        season_index = {season_key: i for i, season_key in enumerate(self.seasons)}
+        self.membership = np.zeros((len(self.cells), len(self.seasons)))
+        self.membership[np.arange(len(self.cells)), [season_index[key] for key in self.cells]] = 1.0
+        self.membership.setflags(write=False)
+
+        assigned = set(self.cells)
+        self.coverage: Dict[str, Any] = {
+            "cells": len(self.cells),
+            "overlaps": overlaps,
+            "fallback_cells": fallback_cells,
+            "unreachable_fallback_branches": [
+                {"fallback_branch": branch, "season": season_key, "conditions": conditions}
+                for branch, (season_key, conditions) in enumerate(FALLBACK_RULES)
+                if not fallback_hits[branch]
+            ],
+            "unassigned_seasons": [key for key in season_mappings if key not in assigned],
+        }
+
+    def lookup(self, undertone: str, value: str, chroma: str) -> str:
+        """Season for a characteristic combination - a single table index"""
+        return self.cells[
+            (self._undertone_index[undertone] * len(VALUES) + self._value_index[value]) * len(CHROMAS)
+            + self._chroma_index[chroma]
+        ]
+
+    def lookup_many(self, undertones: np.ndarray, values: np.ndarray, chromas: np.ndarray) -> np.ndarray:
+        """Vectorized lookup - arguments are index arrays into UNDERTONES, VALUES and CHROMAS"""
+        return self._cell_array[(undertones * len(VALUES) + values) * len(CHROMAS) + chromas]
+
+
+if __name__ == "__main__":
+    from .rules_loader import rules
+
+    print(json.dumps(rules.season_table.coverage, indent=2))
@@ -0,0 +1,29 @@
+"""
+Production server: gunicorn managing uvicorn workers
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+The app (rules, palettes, email templates) is loaded once in the master and
+shared copy-on-write by every worker, so adding workers mostly adds their own
+request-time memory. Measure it with: python testing/worker_memory.py
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('APP_PORT', '8001')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import the app in the master before forking (set GUNICORN_PRELOAD=false to load it in every worker)
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() != "false"
+
+timeout = 60
+graceful_timeout = 30  # Time for the email outbox to drain on shutdown
+
+
+def when_ready(server):
+    """Master is up, right before the first fork"""
+    if preload_app:
+        from app.main import prepare_workers
+
+        prepare_workers()
@@ -0,0 +1,103 @@
+"""Create the initial users, responses, palettes and photo_analyses tables
+
+Revision ID: 0c7a3f9e2d15
+Revises:
+Create Date: 2025-11-20 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c7a3f9e2d15'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The schema as it was before migrations were introduced. Databases created back then (by
+    # Base.metadata.create_all) already have these tables, so only missing ones are created.
+    existing = set() if context.is_offline_mode() else set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('email', sa.String(length=255), nullable=False),
+            sa.Column('newsletter_consent', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.current_timestamp(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+        op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+
+    if 'responses' not in existing:
+        op.create_table(
+            'responses',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('hair_color', sa.String(length=50), nullable=True),
+            sa.Column('skin_tone', sa.String(length=50), nullable=True),
+            sa.Column('eye_color', sa.String(length=50), nullable=True),
+            sa.Column('vein_color', sa.String(length=50), nullable=True),
+            sa.Column('jewelry_preference', sa.String(length=50), nullable=True),
+            sa.Column('colors_worn', sa.JSON(), nullable=True),
+            sa.Column('colors_avoided', sa.JSON(), nullable=True),
+            sa.Column('color_feedback', sa.String(length=50), nullable=True),
+            sa.Column('submitted_at', sa.DateTime(timezone=True), server_default=sa.func.current_timestamp(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_responses_id'), 'responses', ['id'], unique=False)
+
+    if 'palettes' not in existing:
+        op.create_table(
+            'palettes',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('season', sa.String(length=50), nullable=False),
+            sa.Column('season_display_name', sa.String(length=100), nullable=True),
+            sa.Column('confidence', sa.Integer(), nullable=True),
+            sa.Column('undertone', sa.String(length=20), nullable=True),
+            sa.Column('value', sa.String(length=20), nullable=True),
+            sa.Column('chroma', sa.String(length=20), nullable=True),
+            sa.Column('contrast', sa.String(length=20), nullable=True),
+            sa.Column('core_neutrals', sa.JSON(), nullable=True),
+            sa.Column('accent_colors', sa.JSON(), nullable=True),
+            sa.Column('avoid_colors', sa.JSON(), nullable=True),
+            sa.Column('explanation', sa.Text(), nullable=True),
+            sa.Column('generated_at', sa.DateTime(timezone=True), server_default=sa.func.current_timestamp(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_palettes_id'), 'palettes', ['id'], unique=False)
+
+    if 'photo_analyses' not in existing:
+        op.create_table(
+            'photo_analyses',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('photo_path', sa.String(length=500), nullable=True),
+            sa.Column('refined_season', sa.String(length=50), nullable=True),
+            sa.Column('ai_analysis', sa.JSON(), nullable=True),
+            sa.Column('analyzed_at', sa.DateTime(timezone=True), server_default=sa.func.current_timestamp(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_photo_analyses_id'), 'photo_analyses', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_photo_analyses_id'), table_name='photo_analyses')
+    op.drop_table('photo_analyses')
+    op.drop_index(op.f('ix_palettes_id'), table_name='palettes')
+    op.drop_table('palettes')
+    op.drop_index(op.f('ix_responses_id'), table_name='responses')
+    op.drop_table('responses')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_table('users')
@@ -1,7 +1,7 @@
 """Add GDPR fields to User model
 
 Revision ID: 1111eac261bd
-Revises: 
+Revises: 0c7a3f9e2d15
 Create Date: 2025-11-23 14:16:29.169074
 
 """
@@ -13,7 +13,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision: str = '1111eac261bd'
-down_revision: Union[str, None] = None
+down_revision: Union[str, None] = '0c7a3f9e2d15'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
@@ -35,10 +35,11 @@ def upgrade() -> None:
     op.execute("UPDATE users SET privacy_consent = TRUE WHERE privacy_consent IS NULL")
     op.execute("UPDATE users SET submission_count = 1 WHERE submission_count IS NULL")
 
-    # Now make required columns NOT NULL
-    op.alter_column('users', 'first_name', nullable=False)
-    op.alter_column('users', 'last_name', nullable=False)
-    op.alter_column('users', 'privacy_consent', nullable=False)
+    # Now make required columns NOT NULL (batch mode so SQLite, which has no ALTER COLUMN, works too)
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column('first_name', existing_type=sa.String(length=100), nullable=False)
+        batch_op.alter_column('last_name', existing_type=sa.String(length=100), nullable=False)
+        batch_op.alter_column('privacy_consent', existing_type=sa.Boolean(), nullable=False)
     # ### end Alembic commands ###
 
 
@@ -0,0 +1,28 @@
+"""Add submission hash and idempotency key to palettes
+
+Revision ID: 3e8c5f1a9b24
+Revises: d9b4e27f8a60
+Create Date: 2026-10-18 16:12:44.381205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e8c5f1a9b24'
+down_revision: Union[str, None] = 'd9b4e27f8a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('palettes', sa.Column('submission_hash', sa.String(length=64), nullable=True))
+    op.add_column('palettes', sa.Column('idempotency_key', sa.String(length=255), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('palettes', 'idempotency_key')
+    op.drop_column('palettes', 'submission_hash')
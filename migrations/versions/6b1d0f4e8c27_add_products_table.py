@@ -0,0 +1,42 @@
+"""Add products table for the Medusa catalog sync
+
+Revision ID: 6b1d0f4e8c27
+Revises: 3e8c5f1a9b24
+Create Date: 2026-10-18 18:40:12.904317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b1d0f4e8c27'
+down_revision: Union[str, None] = '3e8c5f1a9b24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'products',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('medusa_id', sa.String(length=100), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('handle', sa.String(length=255), nullable=True),
+        sa.Column('thumbnail', sa.String(length=1000), nullable=True),
+        sa.Column('colors', sa.JSON(), nullable=True),
+        sa.Column('medusa_updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('synced_at', sa.DateTime(timezone=True), server_default=sa.func.current_timestamp(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('medusa_id'),
+    )
+    op.create_index(op.f('ix_products_id'), 'products', ['id'], unique=False)
+    op.create_index('ix_products_medusa_updated_at', 'products', ['medusa_updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_medusa_updated_at', table_name='products')
+    op.drop_index(op.f('ix_products_id'), table_name='products')
+    op.drop_table('products')
@@ -0,0 +1,29 @@
+"""Add language to email outbox
+
+Revision ID: 8f31b6c0d2e7
+Revises: 5c2e9a7d41b3
+Create Date: 2026-10-18 11:40:02.915274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f31b6c0d2e7'
+down_revision: Union[str, None] = '5c2e9a7d41b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('email_outbox', sa.Column('language', sa.String(length=2), nullable=True))
+    op.execute("UPDATE email_outbox SET language = 'en' WHERE language IS NULL")
+    with op.batch_alter_table('email_outbox') as batch_op:
+        batch_op.alter_column('language', existing_type=sa.String(length=2), nullable=False)
+
+
+def downgrade() -> None:
+    op.drop_column('email_outbox', 'language')
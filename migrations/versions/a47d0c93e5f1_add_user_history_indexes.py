@@ -0,0 +1,28 @@
+"""Add (user_id, timestamp DESC) indexes for palette and response history
+
+Revision ID: a47d0c93e5f1
+Revises: 8f31b6c0d2e7
+Create Date: 2026-10-18 13:05:27.640118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a47d0c93e5f1'
+down_revision: Union[str, None] = '8f31b6c0d2e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_palettes_user_id_generated_at', 'palettes', ['user_id', sa.text('generated_at DESC')], unique=False)
+    op.create_index('ix_responses_user_id_submitted_at', 'responses', ['user_id', sa.text('submitted_at DESC')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_responses_user_id_submitted_at', table_name='responses')
+    op.drop_index('ix_palettes_user_id_generated_at', table_name='palettes')
@@ -0,0 +1,36 @@
+"""Make (user_id, idempotency_key) unique on palettes
+
+Revision ID: b52d7e19c4a6
+Revises: 6b1d0f4e8c27
+Create Date: 2026-10-19 09:14:52.117734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b52d7e19c4a6'
+down_revision: Union[str, None] = '6b1d0f4e8c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keep the key only on the first palette of any pair that raced in before the index existed
+    op.execute(
+        "UPDATE palettes SET idempotency_key = NULL "
+        "WHERE idempotency_key IS NOT NULL AND id NOT IN ("
+        "SELECT MIN(id) FROM palettes WHERE idempotency_key IS NOT NULL GROUP BY user_id, idempotency_key)"
+    )
+    op.create_index(
+        'uq_palettes_user_id_idempotency_key', 'palettes', ['user_id', 'idempotency_key'], unique=True,
+        postgresql_where=sa.text('idempotency_key IS NOT NULL'),
+        sqlite_where=sa.text('idempotency_key IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_palettes_user_id_idempotency_key', table_name='palettes')
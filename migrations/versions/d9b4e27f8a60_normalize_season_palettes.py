@@ -0,0 +1,153 @@
+"""Store season colors once per rules version in season_palettes
+
+Revision ID: d9b4e27f8a60
+Revises: a47d0c93e5f1
+Create Date: 2026-10-18 14:31:50.207834
+
+"""
+import hashlib
+import json
+from collections import defaultdict
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9b4e27f8a60'
+down_revision: Union[str, None] = 'a47d0c93e5f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+palettes = sa.table(
+    'palettes',
+    sa.column('id', sa.Integer),
+    sa.column('season', sa.String),
+    sa.column('season_display_name', sa.String),
+    sa.column('core_neutrals', sa.JSON),
+    sa.column('accent_colors', sa.JSON),
+    sa.column('avoid_colors', sa.JSON),
+    sa.column('season_palette_id', sa.Integer),
+)
+
+season_palettes = sa.table(
+    'season_palettes',
+    sa.column('id', sa.Integer),
+    sa.column('rules_version', sa.String),
+    sa.column('season', sa.String),
+    sa.column('season_display_name', sa.String),
+    sa.column('core_neutrals', sa.JSON),
+    sa.column('accent_colors', sa.JSON),
+    sa.column('avoid_colors', sa.JSON),
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        'season_palettes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('rules_version', sa.String(length=20), nullable=False),
+        sa.Column('season', sa.String(length=50), nullable=False),
+        sa.Column('season_display_name', sa.String(length=100), nullable=True),
+        sa.Column('core_neutrals', sa.JSON(), nullable=True),
+        sa.Column('accent_colors', sa.JSON(), nullable=True),
+        sa.Column('avoid_colors', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('rules_version', 'season', name='uq_season_palettes_rules_version_season')
+    )
+    op.create_index(op.f('ix_season_palettes_id'), 'season_palettes', ['id'], unique=False)
+
+    with op.batch_alter_table('palettes') as batch_op:
+        batch_op.add_column(sa.Column('season_palette_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_palettes_season_palette_id', 'season_palettes', ['season_palette_id'], ['id'])
+
+    # Compact existing rows: one season_palettes row per distinct set of colors,
+    # tagged with a "legacy-<content hash>" rules version
+    bind = op.get_bind()
+    season_palette_ids = {}
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(
+                palettes.c.id,
+                palettes.c.season,
+                palettes.c.season_display_name,
+                palettes.c.core_neutrals,
+                palettes.c.accent_colors,
+                palettes.c.avoid_colors,
+            )
+            .where(palettes.c.id > last_id)
+            .order_by(palettes.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+
+        assignments = defaultdict(list)
+        for row in rows:
+            content = json.dumps(
+                [row.season_display_name, row.core_neutrals, row.accent_colors, row.avoid_colors],
+                sort_keys=True,
+            )
+            key = (row.season, content)
+            if key not in season_palette_ids:
+                season_palette_ids[key] = bind.execute(
+                    season_palettes.insert()
+                    .values(
+                        rules_version="legacy-" + hashlib.sha256(content.encode("utf-8")).hexdigest()[:12],
+                        season=row.season,
+                        season_display_name=row.season_display_name,
+                        core_neutrals=row.core_neutrals,
+                        accent_colors=row.accent_colors,
+                        avoid_colors=row.avoid_colors,
+                    )
+                    .returning(season_palettes.c.id)
+                ).scalar_one()
+            assignments[season_palette_ids[key]].append(row.id)
+
+        for season_palette_id, palette_ids in assignments.items():
+            bind.execute(
+                palettes.update()
+                .where(palettes.c.id.in_(palette_ids))
+                .values(season_palette_id=season_palette_id)
+            )
+        last_id = rows[-1].id
+
+    with op.batch_alter_table('palettes') as batch_op:
+        batch_op.drop_column('avoid_colors')
+        batch_op.drop_column('accent_colors')
+        batch_op.drop_column('core_neutrals')
+        batch_op.drop_column('season_display_name')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('palettes') as batch_op:
+        batch_op.add_column(sa.Column('season_display_name', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('core_neutrals', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('accent_colors', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('avoid_colors', sa.JSON(), nullable=True))
+
+    # Copy the colors back onto every palette row
+    bind = op.get_bind()
+    for row in bind.execute(sa.select(season_palettes)).fetchall():
+        bind.execute(
+            palettes.update()
+            .where(palettes.c.season_palette_id == row.id)
+            .values(
+                season_display_name=row.season_display_name,
+                core_neutrals=row.core_neutrals,
+                accent_colors=row.accent_colors,
+                avoid_colors=row.avoid_colors,
+            )
+        )
+
+    with op.batch_alter_table('palettes') as batch_op:
+        batch_op.drop_constraint('fk_palettes_season_palette_id', type_='foreignkey')
+        batch_op.drop_column('season_palette_id')
+
+    op.drop_index(op.f('ix_season_palettes_id'), table_name='season_palettes')
+    op.drop_table('season_palettes')
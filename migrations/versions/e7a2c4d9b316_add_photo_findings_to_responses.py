@@ -0,0 +1,26 @@
+"""Add photo findings (q9) to responses
+
+Revision ID: e7a2c4d9b316
+Revises: b52d7e19c4a6
+Create Date: 2026-10-18 16:02:37.480215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a2c4d9b316'
+down_revision: Union[str, None] = 'b52d7e19c4a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('responses', sa.Column('photo_findings', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('responses', 'photo_findings')
@@ -1,5 +1,8 @@
 // PALETTE-AI Questionnaire Form Handler
 
+// One key per page load: double clicks and retries of this form get the same stored result
+const idempotencyKey = crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
 document.getElementById('questionnaire-form').addEventListener('submit', async (e) => {
     e.preventDefault();
 
@@ -45,6 +48,7 @@ document.getElementById('questionnaire-form').addEventListener('submit', async (
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'Idempotency-Key': idempotencyKey,
             },
             body: JSON.stringify(submission)
         });
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Batch Analyzer Equivalence Test for PALETTE-AI
+Checks that SeasonAnalyzer.analyze_batch matches analyze bit for bit
+
+Random submissions cover the whole answer space, including empty and large
+multi-selects, photo findings (q9) and unknown answer ids. Signal vectors must
+be identical floats and every PaletteResult must be identical.
+
+Usage:
+    python testing/batch_equivalence.py --samples 20000 --seed 42
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.questionnaire import analyzer
+from app.rules_loader import rules
+from app.schemas import QuestionnaireSubmission
+from test_personas import PERSONAS
+
+FIELDS = {
+    "q1": "hair_color",
+    "q2": "skin_tone",
+    "q3": "eye_color",
+    "q4": "vein_color",
+    "q5": "jewelry_preference",
+    "q6": "colors_worn",
+    "q7": "colors_avoided",
+    "q8": "color_feedback",
+}
+
+
+def random_submissions(count: int, seed: int):
+    """
+    Personas plus random answers drawn from questionnaire.yaml (5% unknown ids), each with
+    random photo findings: none or one per characteristic, as the photo analysis reports them
+    """
+    rng = random.Random(seed)
+    options = {
+        q_data["id"]: [option["id"] for option in q_data.get("options", [])]
+        for q_data in rules.questionnaire.get("questions", {}).values()
+    }
+
+    photo_options = {}
+    for finding in options["q9"]:
+        photo_options.setdefault(finding.split("_", 1)[0], []).append(finding)
+
+    def photo_findings():
+        findings = [rng.choice(choices) for choices in photo_options.values() if rng.random() < 0.5]
+        return findings + (["not_an_option"] if rng.random() < 0.05 else [])
+
+    submissions = [QuestionnaireSubmission(**persona["input"]) for persona in PERSONAS]
+    while len(submissions) < count:
+        answers = {}
+        for question_id, field in FIELDS.items():
+            choices = options[question_id] + (["not_an_option"] if rng.random() < 0.05 else [])
+            if rules.compiled.question_types.get(question_id) == "multi_choice":
+                answers[field] = rng.sample(choices, rng.randint(0, len(choices)))
+            else:
+                answers[field] = rng.choice(choices)
+        submissions.append(QuestionnaireSubmission(
+            first_name="Test", last_name="User", email="test@test.com", privacy_consent=True, **answers
+        ))
+    return submissions, [photo_findings() for _ in submissions]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check analyze_batch against analyze")
+    parser.add_argument("--samples", type=int, default=20000, help="Number of submissions")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    submissions, photo_findings = random_submissions(args.samples, args.seed)
+
+    start = time.perf_counter()
+    scalar_signals = [analyzer._accumulate_signals(submission, findings) for submission, findings in zip(submissions, photo_findings)]
+    scalar_results = [analyzer.analyze(submission, findings) for submission, findings in zip(submissions, photo_findings)]
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_signals = analyzer._accumulate_signals_batch(submissions, photo_findings)
+    batch_results = analyzer.analyze_batch(submissions, photo_findings)
+    batch_seconds = time.perf_counter() - start
+
+    signal_mismatches = [
+        i for i, signals in enumerate(scalar_signals) if signals != batch_signals[i].tolist()
+    ]
+    result_mismatches = [
+        i for i, (scalar, batch) in enumerate(zip(scalar_results, batch_results))
+        if scalar.model_dump() != batch.model_dump()
+    ]
+
+    print("\n" + "="*60)
+    print("PALETTE-AI Batch Analyzer Equivalence")
+    print("="*60)
+    print(json.dumps({
+        "samples": len(submissions),
+        "signal_mismatches": len(signal_mismatches),
+        "result_mismatches": len(result_mismatches),
+        "scalar_seconds": round(scalar_seconds, 3),
+        "batch_seconds": round(batch_seconds, 3),
+    }, indent=2))
+
+    for i in (signal_mismatches + result_mismatches)[:5]:
+        print(f"\n❌ Mismatch for submission {i}: {submissions[i].model_dump(include=set(FIELDS.values()))}, q9 {photo_findings[i]}")
+        print(f"   analyze:       {scalar_results[i].model_dump(exclude={'core_neutrals', 'accent_colors', 'avoid_colors'})}")
+        print(f"   analyze_batch: {batch_results[i].model_dump(exclude={'core_neutrals', 'accent_colors', 'avoid_colors'})}")
+
+    if signal_mismatches or result_mismatches:
+        sys.exit(1)
+    print("\n✅ analyze_batch matches analyze bit for bit")
+
+
+if __name__ == "__main__":
+    main()
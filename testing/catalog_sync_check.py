@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Catalog Sync Check for PALETTE-AI
+Runs the Medusa catalog sync (app/catalog_sync.py) against the fake Medusa
+server (testing/fake_medusa.py) and a throwaway SQLite database:
+
+    1. full sync           every product stored, colors extracted
+    2. unchanged catalog   answered by a single 304, nothing written
+    3. edits               touched/recolored products are the only ones refetched
+    4. deletion            the refresher's periodic full sync drops products Medusa no longer has
+    5. edit during sync    a product edited mid-sync moves to the end of the updated_at
+                           order without pushing any other product past a page boundary
+
+Reports rows/sec and the lag since the previous sync for every step.
+
+Usage:
+    python testing/catalog_sync_check.py
+    python testing/catalog_sync_check.py --scale 50 --latency-ms 20 --output sync.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+PROJECT_DIR = Path(__file__).parent.parent
+PUBLISHABLE_KEY = "pk_fake_catalog_sync"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_medusa(port: int, scale: int, latency_ms: float) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "testing/fake_medusa.py", "--port", str(port), "--scale", str(scale),
+         "--latency-ms", str(latency_ms), "--publishable-key", PUBLISHABLE_KEY],
+        cwd=PROJECT_DIR, stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/_fake/stats").raise_for_status()
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("fake Medusa did not start within 30s")
+
+
+async def run_checks(base_url: str, page_size: int) -> dict:
+    from sqlalchemy import func, select
+
+    from app.catalog_sync import CatalogSync
+    from app.database import AsyncSessionLocal
+    from app.models import Product
+    from app.products import CatalogRefresher, ProductIndex
+
+    async def stored() -> dict:
+        async with AsyncSessionLocal() as db:
+            return {row.medusa_id: row.colors for row in (await db.execute(select(Product.medusa_id, Product.colors))).all()}
+
+    async def count() -> int:
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(select(func.count()).select_from(Product))).scalar_one()
+
+    fake = httpx.AsyncClient(base_url=base_url)
+    catalog_size = (await fake.get("/_fake/stats")).json()["products"]
+    sync = CatalogSync(base_url=base_url, publishable_key=PUBLISHABLE_KEY, page_size=page_size)
+    steps, failures = {}, []
+
+    def check(condition: bool, message: str):
+        if not condition:
+            failures.append(message)
+
+    # 1. Full sync
+    steps["full"] = await sync.sync(full=True)
+    rows = await stored()
+    check(len(rows) == catalog_size, f"full sync stored {len(rows)} of {catalog_size} products")
+    check(all(colors and all(len(color["lab"]) == 3 for color in colors) for colors in rows.values()),
+          "a stored product is missing its extracted colors")
+
+    # 2. Unchanged: one conditional request, answered 304
+    await sync.sync()  # First incremental sync learns the ETag for the new watermark
+    before = (await fake.get("/_fake/stats")).json()
+    steps["unchanged"] = await sync.sync()
+    after = (await fake.get("/_fake/stats")).json()
+    check(steps["unchanged"]["not_modified"], "unchanged catalog was not answered with 304")
+    check(after["requests"] - before["requests"] == 1, f"unchanged catalog took {after['requests'] - before['requests']} requests")
+
+    # 3. Edits: only the touched products (plus any sharing the old watermark) are refetched
+    product_ids = sorted(rows)
+    boundary = (await fake.get("/store/products", params={"limit": 1, "updated_at[$gte]": steps["unchanged"]["watermark"]},
+                               headers={"x-publishable-api-key": PUBLISHABLE_KEY})).json()["count"]
+    touched = product_ids[:3]
+    await fake.post(f"/_fake/products/{touched[0]}/touch", json={"primary_color": "#123456"})
+    for product_id in touched[1:]:
+        await fake.post(f"/_fake/products/{product_id}/touch")
+    steps["edits"] = await sync.sync()
+    rows = await stored()
+    check(steps["edits"]["products"] <= len(touched) + boundary,
+          f"incremental sync refetched {steps['edits']['products']} products for {len(touched)} edits")
+    check(all(color["hex"] == "#123456" for color in rows[touched[0]]), "recolored product was not updated")
+
+    # 4. Deletion: picked up by the background refresher once its full sync is due
+    await fake.delete(f"/_fake/products/{product_ids[-1]}")
+    refresher = CatalogRefresher(ProductIndex(), sync, full_sync_seconds=3600)
+    await refresher.refresh()
+    check(await count() == catalog_size, "refresher ran a full sync before it was due")
+    sync.last_full_sync_at -= 3600
+    await refresher.refresh()
+    steps["deletion"] = sync.last_stats
+    check(steps["deletion"]["full"] and steps["deletion"]["deleted"] == 1,
+          f"refresher's full sync deleted {steps['deletion']['deleted']} products, expected 1")
+    check(await count() == catalog_size - 1, "deleted product is still stored")
+
+    # 5. Edit during a full sync: the first product fetched is touched right away, moving it to the
+    # end of the order - with offset paging every later page would shift and one product be dropped
+    class EditDuringSync(CatalogSync):
+        async def _fetch_page(self, *args, **kwargs):
+            page = await super()._fetch_page(*args, **kwargs)
+            if kwargs.get("first"):
+                await fake.post(f"/_fake/products/{page['products'][0]['id']}/touch")
+            return page
+
+    editing = EditDuringSync(base_url=base_url, publishable_key=PUBLISHABLE_KEY, page_size=page_size)
+    steps["edit_during_sync"] = await editing.sync(full=True)
+    await editing.close()
+    check(steps["edit_during_sync"]["deleted"] == 0,
+          f"full sync during an edit deleted {steps['edit_during_sync']['deleted']} products, expected 0")
+    check(await count() == catalog_size - 1, "a product was dropped by the full sync during an edit")
+
+    await sync.close()
+    await fake.aclose()
+    return {"catalog_products": catalog_size, "steps": steps, "failures": failures}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the Medusa catalog sync against the fake Medusa server")
+    parser.add_argument("--scale", type=int, default=20, help="Fake catalog size, in copies of the 36-product fixture")
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="Fake Medusa delay per request")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--output", type=Path, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Settings are read at import, so point the app at a throwaway database first
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/catalog_sync.db"
+    os.environ["DEBUG"] = "false"
+    sys.path.insert(0, str(PROJECT_DIR))
+    import app.models  # noqa: F401 - registers the tables
+    from app.database import Base, engine
+    Base.metadata.create_all(bind=engine)
+
+    port = free_port()
+    server = start_fake_medusa(port, args.scale, args.latency_ms)
+    try:
+        report = asyncio.run(run_checks(f"http://127.0.0.1:{port}", args.page_size))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    print("\n" + "="*60)
+    print("PALETTE-AI Catalog Sync")
+    print("="*60)
+    print(json.dumps(report, indent=2, default=str))
+
+    steps = report["steps"]
+    print(f"\n📊 {report['catalog_products']} products: full sync {steps['full']['rows_per_second']:.0f} rows/s, "
+          f"unchanged {steps['unchanged']['seconds'] * 1000:.0f}ms (304), "
+          f"{steps['edits']['products']} refetched after 3 edits")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, default=str))
+        print(f"\n💾 Report saved to {args.output}")
+
+    if report["failures"]:
+        print("\n❌ " + "\n❌ ".join(report["failures"]))
+        sys.exit(1)
+    print("\n✅ Catalog sync checks passed")
+
+
+if __name__ == "__main__":
+    main()
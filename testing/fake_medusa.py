@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Fake Medusa Store API for PALETTE-AI
+Serves the sample catalog (testing/fixtures/medusa_products.json) the way the
+Medusa v2 store API does, for the catalog sync (app/catalog_sync.py) without a
+real Medusa instance:
+
+    GET /store/products   limit, offset, order=updated_at, updated_at[$gte]/[$gt],
+                          x-publishable-api-key required, ETag / If-None-Match (304)
+
+plus test-only endpoints to change the catalog while it runs:
+
+    POST   /_fake/products/{id}/touch   bump updated_at (body {"primary_color": "#RRGGBB"} recolors it)
+    DELETE /_fake/products/{id}
+    GET    /_fake/stats                 requests served, 304s, products served
+
+Usage:
+    python testing/fake_medusa.py                       # http://localhost:9000, 36 products
+    python testing/fake_medusa.py --scale 100 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import copy
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import Body, FastAPI, HTTPException, Request
+from fastapi.responses import Response
+
+FIXTURE = Path(__file__).parent / "fixtures" / "medusa_products.json"
+
+
+def _timestamp(value: datetime) -> str:
+    return value.astimezone(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _parse(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def load_products(fixture: Path = FIXTURE, scale: int = 1) -> List[Dict[str, Any]]:
+    """The fixture's products, repeated `scale` times with distinct ids and handles"""
+    data = json.loads(fixture.read_text())
+    base = data["products"] if isinstance(data, dict) else data
+    products = []
+    for copy_index in range(scale):
+        for product in base:
+            product = copy.deepcopy(product)
+            if copy_index:
+                product["id"] = f"{product['id']}_{copy_index}"
+                product["handle"] = f"{product['handle']}-{copy_index}"
+                for variant in product.get("variants") or []:
+                    variant["id"] = f"{variant['id']}_{copy_index}"
+            products.append(product)
+    return products
+
+
+def create_app(products: List[Dict[str, Any]], publishable_key: Optional[str] = None, latency_ms: float = 0.0) -> FastAPI:
+    """Store API over an in-memory product list (changed in place by the /_fake endpoints)"""
+    app = FastAPI(title="Fake Medusa")
+    catalog = {product["id"]: product for product in products}
+    stats = {"requests": 0, "not_modified": 0, "products_served": 0}
+
+    @app.get("/store/products")
+    async def list_products(request: Request, limit: int = 50, offset: int = 0, order: Optional[str] = None):
+        stats["requests"] += 1
+        key = request.headers.get("x-publishable-api-key")
+        if not key or (publishable_key and key != publishable_key):
+            raise HTTPException(status_code=400, detail="Publishable API key required in the request header")
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+
+        selected = list(catalog.values())
+        since = request.query_params.get("updated_at[$gte]")
+        after = request.query_params.get("updated_at[$gt]")
+        if since:
+            selected = [product for product in selected if _parse(product["updated_at"]) >= _parse(since)]
+        if after:
+            selected = [product for product in selected if _parse(product["updated_at"]) > _parse(after)]
+        if order:
+            field = order.lstrip("-")
+            selected.sort(key=lambda product: (product.get(field) or "", product["id"]), reverse=order.startswith("-"))
+
+        page = selected[offset:offset + limit]
+        body = json.dumps({"products": page, "count": len(selected), "offset": offset, "limit": limit}).encode("utf-8")
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if request.headers.get("if-none-match") == etag:
+            stats["not_modified"] += 1
+            return Response(status_code=304, headers={"ETag": etag})
+        stats["products_served"] += len(page)
+        return Response(body, media_type="application/json", headers={"ETag": etag})
+
+    @app.post("/_fake/products/{product_id}/touch")
+    async def touch(product_id: str, change: Dict[str, Any] = Body(default={})):
+        product = catalog.get(product_id)
+        if product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        # Strictly newer than anything in the catalog, even within the same millisecond
+        newest = max(_parse(other["updated_at"]) for other in catalog.values())
+        product["updated_at"] = _timestamp(max(datetime.now(timezone.utc), newest + timedelta(milliseconds=1)))
+        if change.get("primary_color"):
+            for variant in product.get("variants") or []:
+                variant.setdefault("metadata", {})["primary_color"] = change["primary_color"]
+        return {"product": product}
+
+    @app.delete("/_fake/products/{product_id}")
+    async def remove(product_id: str):
+        if catalog.pop(product_id, None) is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return {"id": product_id, "deleted": True}
+
+    @app.get("/_fake/stats")
+    async def get_stats():
+        return {**stats, "products": len(catalog)}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Medusa store API serving the sample catalog")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--fixture", type=Path, default=FIXTURE, help="Medusa products JSON")
+    parser.add_argument("--scale", type=int, default=1, help="Serve the fixture this many times over (distinct ids)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every store request")
+    parser.add_argument("--publishable-key", help="Only accept this key (default: any non-empty key)")
+    args = parser.parse_args()
+
+    products = load_products(args.fixture, args.scale)
+    print(f"🛒 Fake Medusa serving {len(products)} products on http://localhost:{args.port}")
+    uvicorn.run(create_app(products, args.publishable_key, args.latency_ms), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Load Testing for PALETTE-AI
+Concurrent virtual users against the API, with per-endpoint latency percentiles
+
+By default the app runs in-process (ASGI transport) against a throwaway SQLite
+database with the fake email transport, including its startup/shutdown hooks so
+the email outbox is drained like in production. Pass --base-url to load a
+running server instead (e.g. uvicorn on port 8001 with EMAIL_TRANSPORT=fake).
+
+Usage:
+    python testing/load_test.py --users 32 --seconds 20 --output load.json
+    python testing/load_test.py --compare load.json   # Flag regressions against an earlier run
+    python testing/load_test.py --base-url http://localhost:8001
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Default to a throwaway SQLite database and no real emails
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/load_test.db")
+os.environ.setdefault("TESTING_MODE", "true")
+os.environ.setdefault("EMAIL_TRANSPORT", "fake")
+os.environ.setdefault("DEBUG", "false")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import httpx
+
+from test_personas import PERSONAS
+
+ENDPOINTS = ("/api/submit", "/api/palette/{email}", "/")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    """Latencies and errors per endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def report(self, elapsed: float) -> Dict[str, Dict[str, float]]:
+        report = {}
+        for endpoint in ENDPOINTS:
+            latencies = sorted(self.latencies[endpoint])
+            count = len(latencies)
+            report[endpoint] = {
+                "requests": count,
+                "requests_per_second": round(count / elapsed, 1),
+                "error_rate": round(self.errors[endpoint] / count, 4) if count else 0.0,
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            }
+        return report
+
+
+async def virtual_user(client: httpx.AsyncClient, user_id: int, deadline: float, recorder: Recorder):
+    """One user: load the form, submit it, then look up the palette"""
+    i = 0
+    while time.perf_counter() < deadline:
+        persona = PERSONAS[(user_id + i) % len(PERSONAS)]
+        email = f"load{user_id}-{i % 10}@test.com"
+
+        await recorder.request(client, "/", "GET", "/")
+        await recorder.request(client, "/api/submit", "POST", "/api/submit", json={**persona["input"], "email": email})
+        await recorder.request(client, "/api/palette/{email}", "GET", f"/api/palette/{email}")
+        i += 1
+
+
+async def run(users: int, seconds: float, base_url: Optional[str]) -> dict:
+    recorder = Recorder()
+
+    if base_url:
+        transport = None
+        target = base_url
+    else:
+        from app.database import init_db
+        from app.main import app
+
+        init_db()
+        await app.router.startup()
+        transport = httpx.ASGITransport(app=app)
+        target = "in-process"
+
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url=base_url or "http://load-test", limits=limits, timeout=30.0) as client:
+            # Warm up (rules, templates, connection pool) outside the measured run
+            await client.post("/api/submit", json=PERSONAS[0]["input"])
+
+            start = time.perf_counter()
+            deadline = start + seconds
+            await asyncio.gather(*(virtual_user(client, n, deadline, recorder) for n in range(users)))
+            elapsed = time.perf_counter() - start
+    finally:
+        if not base_url:
+            await app.router.shutdown()
+
+    endpoints = recorder.report(elapsed)
+    total = sum(stats["requests"] for stats in endpoints.values())
+    return {
+        "target": target,
+        "database": os.environ["DATABASE_URL"].split("@")[-1] if not base_url else None,
+        "users": users,
+        "seconds": round(elapsed, 2),
+        "requests": total,
+        "requests_per_second": round(total / elapsed, 1),
+        "endpoints": endpoints,
+    }
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> List[str]:
+    """Endpoints whose p95 latency or error rate got worse than the baseline by more than threshold"""
+    regressions = []
+    for endpoint, stats in result["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(endpoint)
+        if not before:
+            continue
+        if before["p95_ms"] and stats["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{endpoint}: p95 {before['p95_ms']}ms -> {stats['p95_ms']}ms")
+        if stats["error_rate"] > before["error_rate"]:
+            regressions.append(f"{endpoint}: error rate {before['error_rate']} -> {stats['error_rate']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test with latency percentiles")
+    parser.add_argument("--users", type=int, default=32, help="Concurrent virtual users")
+    parser.add_argument("--seconds", type=float, default=20.0, help="Duration of the measured run")
+    parser.add_argument("--base-url", help="Load a running server instead of the in-process app")
+    parser.add_argument("--output", type=Path, help="Write the JSON report to this file")
+    parser.add_argument("--compare", type=Path, help="Earlier JSON report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed p95 slowdown vs --compare (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.users, args.seconds, args.base_url))
+
+    print("\n" + "="*60)
+    print("PALETTE-AI Load Test")
+    print("="*60)
+    print(json.dumps(result, indent=2))
+
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2))
+        print(f"\n💾 Report saved to {args.output}")
+
+    if args.compare:
+        regressions = compare(result, json.loads(args.compare.read_text()), args.threshold)
+        if regressions:
+            print("\n❌ Regressions vs " + str(args.compare))
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"\n✅ No regressions vs {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
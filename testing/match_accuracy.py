@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Match Table Accuracy for PALETTE-AI
+Compares /api/match answers from the quantized RGB tables (app/match.py) against
+exact CIEDE2000 for random colors, per season and LUT size:
+
+    verdict agreement      table verdict == verdict computed from the exact color
+    nearest agreement      same nearest palette color
+    delta_e error          |table ΔE00 - exact ΔE00| (p50 / p99 / max)
+
+plus build time, memory and lookup time per table, so the --bits trade-off
+(32³ cells by default, 64³ with MATCH_LUT_BITS=6) can be read off one report.
+
+Usage:
+    python testing/match_accuracy.py
+    python testing/match_accuracy.py --bits 5 6 --samples 20000 --output match.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+os.environ.setdefault("DEBUG", "false")
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.color import hex_to_lab
+from app.match import SeasonMatchTable, classify
+from app.rules_loader import rules
+
+
+def check_table(table: SeasonMatchTable, hexes: list, exact: tuple) -> dict:
+    nearest, best, verdict, _ = exact
+    start = time.perf_counter()
+    answers = [table.lookup(hex_value) for hex_value in hexes]
+    lookup_us = (time.perf_counter() - start) / len(hexes) * 1e6
+
+    table_nearest = np.array([answer[0] for answer in answers])
+    table_delta_e = np.array([answer[1] for answer in answers])
+    table_verdict = np.array([answer[2] for answer in answers])
+    error = np.abs(table_delta_e - best)
+    return {
+        "verdict_agreement": round(float((table_verdict == verdict).mean()), 4),
+        "nearest_agreement": round(float((table_nearest == nearest).mean()), 4),
+        "delta_e_error_p50": round(float(np.percentile(error, 50)), 2),
+        "delta_e_error_p99": round(float(np.percentile(error, 99)), 2),
+        "delta_e_error_max": round(float(error.max()), 2),
+        "lookup_us": round(lookup_us, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the /api/match lookup tables against exact CIEDE2000")
+    parser.add_argument("--bits", type=int, nargs="+", default=[5, 6], help="LUT bits per channel to compare")
+    parser.add_argument("--samples", type=int, default=10000, help="Random colors per season")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--season", action="append", help="Only these seasons (default: all)")
+    parser.add_argument("--output", type=Path, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    palettes = rules.palettes
+    seasons = args.season or [season_palette.season for season_palette in palettes.all()]
+    rng = np.random.default_rng(args.seed)
+
+    print("\n" + "="*60)
+    print("PALETTE-AI Match Table Accuracy")
+    print("="*60)
+
+    report = {"samples": args.samples, "seed": args.seed, "bits": {}}
+    for bits in args.bits:
+        per_season = {}
+        for season in seasons:
+            hexes = [f"#{value:06X}" for value in rng.integers(0, 1 << 24, args.samples)]
+            exact = classify(hex_to_lab(hexes), season, palettes)
+
+            start = time.perf_counter()
+            table = SeasonMatchTable(season, palettes, bits)
+            build_seconds = time.perf_counter() - start
+
+            per_season[season] = {
+                "build_seconds": round(build_seconds, 3),
+                "kilobytes": round(table.nbytes / 1024, 1),
+                **check_table(table, hexes, exact),
+            }
+
+        summary = {
+            "cells": (1 << bits) ** 3,
+            "kilobytes_per_season": next(iter(per_season.values()))["kilobytes"],
+            "build_seconds_total": round(sum(result["build_seconds"] for result in per_season.values()), 2),
+            "verdict_agreement_min": min(result["verdict_agreement"] for result in per_season.values()),
+            "nearest_agreement_min": min(result["nearest_agreement"] for result in per_season.values()),
+            "delta_e_error_p99_max": max(result["delta_e_error_p99"] for result in per_season.values()),
+            "lookup_us_mean": round(float(np.mean([result["lookup_us"] for result in per_season.values()])), 2),
+        }
+        report["bits"][bits] = {"summary": summary, "seasons": per_season}
+
+        print(f"\n📊 {bits} bits ({summary['cells']} cells, {summary['kilobytes_per_season']:.0f} KB/season, "
+              f"{summary['build_seconds_total']:.1f}s to build {len(per_season)} seasons)")
+        print(f"   verdicts agree   ≥ {summary['verdict_agreement_min']:.2%}")
+        print(f"   nearest agrees   ≥ {summary['nearest_agreement_min']:.2%}")
+        print(f"   ΔE00 error p99   ≤ {summary['delta_e_error_p99_max']:.2f}")
+        print(f"   lookup           {summary['lookup_us_mean']:.1f}µs")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\n💾 Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for PALETTE-AI
+Times the hot code paths and compares them against committed baseline numbers
+
+Benchmarks:
+    rules_cold_load         RulesLoader.load without a snapshot: parsing, validating and compiling the YAML
+    rules_snapshot_load     RulesLoader.load from the precompiled snapshot (python -m app.rules_snapshot)
+    palette_colors_build    PaletteColors: CIELAB/LCh and the CIEDE2000 matrix over every season color
+    analyze_personas        SeasonAnalyzer.analyze on the test personas
+    analyze_random          SeasonAnalyzer.analyze over the randomized answer space
+    analyze_batch           SeasonAnalyzer.analyze_batch, per submission (batches of 1000)
+    score_seasons_batch     SeasonAnalyzer.score_seasons_batch, per submission (batches of 1000)
+    email_render_cold       _render_template with an empty cache (Jinja + premailer inlining)
+    email_render_cached     _render_template from the CSS-inlined template cache
+    email_text_version      _generate_text_version
+    result_serialize        PaletteResult through FastAPI's encoder (jsonable_encoder + json)
+    result_serialize_fast   PaletteStore.encode_result (pre-encoded season fragments)
+    match_table_build       SeasonMatchTable for one season (CIEDE2000 over every RGB cell)
+    match_lookup            SeasonMatchTable.encode, per color (/api/match on a built table)
+    photo_analyze           analyze_photo on a synthetic 900x1200 JPEG portrait (in-process, no pool)
+    app_import              Fresh interpreter importing app.main (rules load included)
+    app_startup             Fresh interpreter importing app.main and running its startup hooks
+                            (season palettes, outbox worker, warm-up) against a new SQLite database
+
+Times are per operation in microseconds (best of --repeat runs). A calibration loop
+of plain Python is timed alongside, and baselines are scaled by it, so a slower or
+faster machine does not read as a regression.
+
+Usage:
+    python testing/microbench.py                    # Compare against the baseline
+    python testing/microbench.py --only analyze     # Benchmarks whose name contains "analyze"
+    python testing/microbench.py --update-baseline  # After an intentional change
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+os.environ.setdefault("TESTING_MODE", "true")
+os.environ.setdefault("DEBUG", "false")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fastapi.encoders import jsonable_encoder
+
+from app.email_service import EmailService, FakeTransport
+from app.match import SeasonMatchTable
+from app.palettes import PaletteColors
+from app.photo import analyze_photo
+from app.questionnaire import analyzer
+from app.rules_loader import RulesLoader, rules
+from app.rules_snapshot import RULE_FILES, RULES_DIR, SNAPSHOT_NAME, build_snapshot
+from app.schemas import QuestionnaireSubmission
+from batch_equivalence import random_submissions
+from photo_check import PORTRAITS, portrait
+from test_personas import PERSONAS
+
+BASELINE_PATH = Path(__file__).parent / "microbench_baseline.json"
+PROJECT_DIR = Path(__file__).parent.parent
+STARTUP_BENCHMARKS = ("app_import", "app_startup")
+
+# Run in a fresh interpreter by the startup benchmarks; prints the seconds until import (or startup) finished
+STARTUP_SCRIPT = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import app.main
+ready = time.perf_counter()
+
+async def startup():
+    await app.main.app.router.startup()
+    ready = time.perf_counter()
+    await app.main.app.router.shutdown()
+    return ready
+
+if sys.argv[1] == "startup":
+    ready = asyncio.run(startup())
+print(json.dumps({"seconds": ready - start}))
+"""
+
+
+def calibration():
+    """Fixed pure-Python workload used to normalize for machine speed"""
+    total = 0
+    for i in range(100000):
+        total += i % 7
+    return total
+
+
+def time_per_op(fn: Callable[[], object], ops_per_call: int, repeat: int, min_seconds: float = 0.2) -> float:
+    """Best-of-repeat time per operation in microseconds"""
+    # Find a call count that runs for at least min_seconds
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+        calls *= 2
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best / (calls * ops_per_call) * 1e6
+
+
+def build_benchmarks() -> Dict[str, Tuple[Callable[[], object], int]]:
+    """name -> (function, operations per call)"""
+    personas = [QuestionnaireSubmission(**persona["input"]) for persona in PERSONAS]
+    randomized, photo_findings = random_submissions(1000, seed=42)
+    rng = random.Random(42)
+
+    # Private copies of the rules, one with a fresh snapshot and one without, whatever state rules/ is in
+    yaml_dir, snapshot_dir = Path(tempfile.mkdtemp()), Path(tempfile.mkdtemp())
+    for name in RULE_FILES:
+        shutil.copy(RULES_DIR / name, yaml_dir / name)
+        shutil.copy(RULES_DIR / name, snapshot_dir / name)
+    (snapshot_dir / SNAPSHOT_NAME).write_bytes(build_snapshot(snapshot_dir))
+
+    def rules_cold_load():
+        RulesLoader(yaml_dir).load()  # Parse and validate the YAML
+
+    def rules_snapshot_load():
+        RulesLoader(snapshot_dir).load()
+
+    def palette_colors_build():
+        PaletteColors(rules.palettes.all())
+
+    def analyze_personas():
+        for submission in personas:
+            analyzer.analyze(submission)
+
+    def analyze_random():
+        i = rng.randrange(len(randomized))
+        analyzer.analyze(randomized[i], photo_findings[i])
+
+    def analyze_batch():
+        analyzer.analyze_batch(randomized, photo_findings)
+
+    def score_seasons_batch():
+        analyzer.score_seasons_batch(randomized)
+
+    service = EmailService(transport=FakeTransport())
+    results = [analyzer.analyze(submission) for submission in personas]
+
+    def email_render_cold():
+        service._inlined.clear()
+        service._season_templates.clear()
+        service._render_template(results[0], "en")
+
+    def email_render_cached():
+        for result in results:
+            service._render_template(result, "en")
+
+    def email_text_version():
+        for result in results:
+            service._generate_text_version(result, "en")
+
+    def result_serialize():
+        for result in results:
+            json.dumps(jsonable_encoder(result), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def result_serialize_fast():
+        for result in results:
+            rules.palettes.encode_result(result)
+
+    match_table = SeasonMatchTable("true_autumn", rules.palettes)
+    match_hexes = [f"#{rng.randrange(1 << 24):06X}" for _ in range(1000)]
+
+    def match_table_build():
+        SeasonMatchTable("true_autumn", rules.palettes)
+
+    def match_lookup():
+        for hex_value in match_hexes:
+            match_table.encode(hex_value)
+
+    portrait_spec = PORTRAITS[0]
+    portrait_jpeg = portrait(portrait_spec["skin"], portrait_spec["hair"], portrait_spec["iris"], portrait_spec["background"])
+
+    def photo_analyze():
+        analyze_photo(portrait_jpeg)
+
+    return {
+        "rules_cold_load": (rules_cold_load, 1),
+        "rules_snapshot_load": (rules_snapshot_load, 1),
+        "palette_colors_build": (palette_colors_build, 1),
+        "analyze_personas": (analyze_personas, len(personas)),
+        "analyze_random": (analyze_random, 1),
+        "analyze_batch": (analyze_batch, len(randomized)),
+        "score_seasons_batch": (score_seasons_batch, len(randomized)),
+        "email_render_cold": (email_render_cold, 1),
+        "email_render_cached": (email_render_cached, len(results)),
+        "email_text_version": (email_text_version, len(results)),
+        "result_serialize": (result_serialize, len(results)),
+        "result_serialize_fast": (result_serialize_fast, len(results)),
+        "match_table_build": (match_table_build, 1),
+        "match_lookup": (match_lookup, len(match_hexes)),
+        "photo_analyze": (photo_analyze, 1),
+    }
+
+
+def time_startup(repeat: int) -> Dict[str, float]:
+    """Best-of-repeat app_import and app_startup times in microseconds, each in a fresh interpreter"""
+    database_dir = Path(tempfile.mkdtemp())
+    database_url = f"sqlite:///{database_dir}/microbench.db"
+    env = {**os.environ, "DATABASE_URL": database_url, "EMAIL_TRANSPORT": "fake"}
+    # Startup expects a migrated schema (alembic upgrade head) - create the tables directly
+    subprocess.run(
+        [sys.executable, "-c", "import app.models; from app.database import init_db; init_db()"],
+        cwd=PROJECT_DIR, env=env, check=True, capture_output=True,
+    )
+
+    best = {name: float("inf") for name in STARTUP_BENCHMARKS}
+    for _ in range(repeat):
+        for name, mode in (("app_import", "import"), ("app_startup", "startup")):
+            output = subprocess.run(
+                [sys.executable, "-c", STARTUP_SCRIPT, mode],
+                cwd=PROJECT_DIR, env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            seconds = json.loads(output.strip().splitlines()[-1])["seconds"]
+            best[name] = min(best[name], seconds * 1e6)
+    return {name: round(us, 2) for name, us in best.items()}
+
+
+def compare(results: Dict[str, float], baseline: dict, scale: float, threshold: float) -> List[str]:
+    """Benchmarks slower than their machine-scaled baseline by more than threshold"""
+    regressions = []
+    for name, us in results.items():
+        before = baseline["benchmarks"].get(name)
+        if before is None:
+            continue
+        allowed = before * scale * (1 + threshold)
+        if us > allowed:
+            regressions.append(f"{name}: {us:.1f}us vs baseline {before * scale:.1f}us (+{us / (before * scale) - 1:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks with stored baselines")
+    parser.add_argument("--only", help="Run only benchmarks whose name contains this string")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark (best is kept)")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Baseline file")
+    parser.add_argument("--update-baseline", action="store_true", help="Save these results as the new baseline")
+    args = parser.parse_args()
+
+    calibration_us = time_per_op(calibration, 1, args.repeat)
+
+    results = {}
+    benchmarks = build_benchmarks()
+    for name, (fn, ops) in benchmarks.items():
+        if args.only and args.only not in name:
+            continue
+        results[name] = round(time_per_op(fn, ops, args.repeat), 2)
+    if not args.only or any(args.only in name for name in STARTUP_BENCHMARKS):
+        results.update({name: us for name, us in time_startup(args.repeat).items() if not args.only or args.only in name})
+
+    report = {"calibration_us": round(calibration_us, 2), "benchmarks": results}
+
+    print("\n" + "="*60)
+    print("PALETTE-AI Microbenchmarks (microseconds per operation)")
+    print("="*60)
+    print(json.dumps(report, indent=2))
+
+    if args.update_baseline:
+        if args.baseline.exists() and args.only:
+            # Keep the baselines of benchmarks that were not run
+            saved = json.loads(args.baseline.read_text())
+            report = {"calibration_us": saved["calibration_us"], "benchmarks": {**saved["benchmarks"], **{
+                name: round(us * saved["calibration_us"] / calibration_us, 2) for name, us in results.items()
+            }}}
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"\n⚠️  No baseline at {args.baseline} - run with --update-baseline to create one")
+        return
+
+    baseline = json.loads(args.baseline.read_text())
+    scale = calibration_us / baseline["calibration_us"]
+    regressions = compare(results, baseline, scale, args.threshold)
+    if regressions:
+        print(f"\n❌ Slower than baseline (machine speed factor {scale:.2f}):")
+        for line in regressions:
+            print(f"   {line}")
+        sys.exit(1)
+    print(f"\n✅ Within {args.threshold:.0%} of baseline (machine speed factor {scale:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Photo Analysis Check for PALETTE-AI
+Runs the local photo pipeline (app/photo.py) on synthetic portraits with known
+skin, hair and eye colors and checks the findings it reports:
+
+    1. findings        each portrait gives its expected undertone/value/contrast/chroma
+    2. season          the season of an undecided questionnaire, without and with the findings as q9,
+                       which must fall in the portrait's expected season family
+    3. timings         per-stage milliseconds per image (decode, segment, cluster, total)
+    4. pool            photos/sec through PhotoPool with 1 worker vs --workers,
+                       and PhotoPoolBusyError once --max-pending photos are in flight
+    5. recovery        a timed-out photo keeps its slot until its worker is done, a pool
+                       whose worker died starts over, and oversized images are refused
+
+Usage:
+    python testing/photo_check.py
+    python testing/photo_check.py --workers 4 --images 40 --output photo.json
+    python testing/photo_check.py --photo me.jpg      # Analyze a real photo and print the result
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+os.environ.setdefault("DEBUG", "false")
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.photo import PhotoError, PhotoPool, PhotoPoolBusyError, analyze_photo, decode
+from app.schemas import QuestionnaireSubmission
+
+# Synthetic portraits: colors, the findings the pipeline must report for them, and the season
+# families (the last part of a season key) the findings may lead to
+PORTRAITS = [
+    {
+        "name": "Fair, pink skin, dark hair, blue eyes",
+        "skin": "#F2D0C4", "hair": "#2B1E1A", "iris": "#3F74B5", "background": "#D9D9D9",
+        "expected": ["undertone_cool", "value_light", "contrast_high", "chroma_bright"],
+        "families": ["summer", "winter"],
+    },
+    {
+        "name": "Golden skin, auburn hair, hazel eyes",
+        "skin": "#E0AC69", "hair": "#8B3A1A", "iris": "#5B4A2E", "background": "#6F8FAF",
+        "expected": ["undertone_warm", "value_medium", "contrast_medium", "chroma_rich"],
+        "families": ["autumn"],
+    },
+    {
+        "name": "Deep skin, black hair, dark brown eyes",
+        "skin": "#5C3A21", "hair": "#221A16", "iris": "#2E1E14", "background": "#E6E1D6",
+        "expected": ["value_deep", "contrast_low"],
+        "families": ["autumn", "winter"],
+    },
+    {
+        "name": "Light, rosy skin, ash blonde hair, gray eyes",
+        "skin": "#EAC0B0", "hair": "#B89F7A", "iris": "#7D8A96", "background": "#4A5A6A",
+        "expected": ["undertone_cool", "value_light", "contrast_low"],
+        "families": ["summer"],
+    },
+]
+
+
+# An undecided questionnaire (light brown hair, hazel eyes, can't tell, not sure) for the photo findings to refine
+UNDECIDED = QuestionnaireSubmission(
+    first_name="Photo", last_name="Check", email="photo@example.com", privacy_consent=True,
+    hair_color="light_brown", skin_tone="light_medium", eye_color="hazel", vein_color="cant_tell",
+    jewelry_preference="not_sure", colors_worn=["white_cream_ivory"], colors_avoided=[], color_feedback="no_comments",
+)
+
+
+def portrait(skin: str, hair: str, iris: str, background: str, size=(900, 1200), seed: int = 0) -> bytes:
+    """A JPEG head-and-shoulders drawing with side lighting and sensor noise"""
+    image = Image.new("RGB", size, background)
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((250, 120, 650, 700), fill=hair)  # Hair behind the face
+    draw.ellipse((150, 780, 750, 1400), fill="#333344")  # Shoulders (clothing)
+    draw.rectangle((400, 600, 500, 820), fill=skin)  # Neck
+    draw.ellipse((300, 220, 600, 640), fill=skin)  # Face
+    for x in (390, 510):
+        draw.line((x - 30, 352, x + 30, 352), fill=hair, width=8)  # Brows
+        draw.ellipse((x - 26, 378, x + 26, 402), fill="#F4F1EC")  # Sclera
+        draw.ellipse((x - 12, 378, x + 12, 402), fill=iris)
+        draw.ellipse((x - 4, 386, x + 4, 394), fill="#0A0A0A")  # Pupil
+    draw.ellipse((415, 540, 485, 566), fill="#B5656B")  # Lips
+
+    rng = np.random.default_rng(seed)
+    pixels = np.asarray(image, dtype=np.float64)
+    lighting = np.linspace(1.04, 0.92, size[0])[None, :, None]
+    pixels = np.clip(pixels * lighting + rng.normal(0, 4, pixels.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=88)
+    return buffer.getvalue()
+
+
+def check_findings(photos) -> dict:
+    from app.questionnaire import analyzer
+
+    results, failures = [], []
+    for spec, data in photos:
+        analysis = analyze_photo(data)
+        missing = [finding for finding in spec["expected"] if finding not in analysis["findings"]]
+        if missing:
+            failures.append(f"{spec['name']}: missing {missing} (got {analysis['findings']})")
+        season = analyzer.analyze(UNDECIDED, analysis["findings"]).season
+        if season.rsplit("_", 1)[-1] not in spec["families"]:
+            failures.append(f"{spec['name']}: season {season} is not {' or '.join(spec['families'])}")
+
+        results.append({
+            "portrait": spec["name"],
+            "findings": analysis["findings"],
+            "measures": analysis["measures"],
+            "skin": analysis["skin"]["hex"],
+            "hair": analysis["hair"]["hex"] if analysis["hair"] else None,
+            "eyes": analysis["eyes"]["hex"] if analysis["eyes"] else None,
+            "season_without_photo": analyzer.analyze(UNDECIDED).season,
+            "season_with_photo": season,
+            "timings_ms": analysis["timings_ms"],
+        })
+    return {"portraits": results, "failures": failures}
+
+
+async def pool_throughput(photos, workers: int) -> dict:
+    pool = PhotoPool(workers=workers, max_pending=len(photos))
+    await pool.analyze(photos[0])  # Start the worker processes outside the timing
+    start = time.perf_counter()
+    results = await asyncio.gather(*(pool.analyze(data) for data in photos))
+    seconds = time.perf_counter() - start
+    pool.close()
+    totals = [result["timings_ms"]["total"] + result["timings_ms"]["queue"] for result in results]
+    return {
+        "workers": workers,
+        "photos_per_second": round(len(photos) / seconds, 1),
+        "latency_ms_p50": round(float(np.percentile(totals, 50)), 1),
+        "latency_ms_p95": round(float(np.percentile(totals, 95)), 1),
+    }
+
+
+async def pool_busy(photos, max_pending: int) -> int:
+    """Photos rejected with PhotoPoolBusyError when all of them arrive at once"""
+    pool = PhotoPool(workers=1, max_pending=max_pending)
+    outcomes = await asyncio.gather(*(pool.analyze(data) for data in photos), return_exceptions=True)
+    pool.close()
+    return sum(isinstance(outcome, PhotoPoolBusyError) for outcome in outcomes)
+
+
+async def pool_recovery(data: bytes) -> dict:
+    """A timed-out photo holds its slot until its worker finishes; a killed worker costs one photo, not the pool"""
+    pool = PhotoPool(workers=1, max_pending=1)
+    await pool.analyze(data)  # Start the worker process
+    outcome = {}
+
+    pool.timeout_seconds = 0.001
+    try:
+        await pool.analyze(data)
+    except asyncio.TimeoutError:
+        pass
+    try:
+        await pool.analyze(data)
+        outcome["slot_held_after_timeout"] = False
+    except PhotoPoolBusyError:
+        outcome["slot_held_after_timeout"] = True
+    deadline = time.perf_counter() + 10
+    while pool.pending and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    outcome["slot_released"] = pool.pending == 0
+
+    pool.timeout_seconds = 20.0
+    for process in list(pool.executor._processes.values()):
+        process.kill()
+    try:
+        await pool.analyze(data)
+        outcome["broken_pool_raised"] = False
+    except BrokenProcessPool:
+        outcome["broken_pool_raised"] = True
+    outcome["restarted"] = bool((await pool.analyze(data))["findings"])
+    outcome["pending_after"] = pool.pending
+    pool.close()
+    return outcome
+
+
+def check_pixel_limit(spec: dict) -> dict:
+    """PNGs decode at full size, so the limit applies; JPEGs are measured after draft scaling"""
+    image = Image.open(io.BytesIO(portrait(spec["skin"], spec["hair"], spec["iris"], spec["background"])))
+    png, jpeg = io.BytesIO(), io.BytesIO()
+    image.save(png, format="PNG")
+    image.save(jpeg, format="JPEG")
+    limit = image.width * image.height - 1
+    outcome = {}
+    for name, buffer in (("png", png), ("jpeg", jpeg)):
+        try:
+            decode(buffer.getvalue(), 256, max_pixels=limit)
+            outcome[f"{name}_refused"] = False
+        except PhotoError:
+            outcome[f"{name}_refused"] = True
+    return outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the local photo analysis pipeline on synthetic portraits")
+    parser.add_argument("--workers", type=int, default=2, help="PhotoPool workers to compare against 1")
+    parser.add_argument("--images", type=int, default=16, help="Photos per throughput run")
+    parser.add_argument("--max-pending", type=int, default=4, help="PhotoPool bound for the busy check")
+    parser.add_argument("--photo", type=Path, help="Analyze this photo instead and print the result")
+    parser.add_argument("--output", type=Path, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.photo:
+        print(json.dumps(analyze_photo(args.photo.read_bytes()), indent=2))
+        return
+
+    photos = [(spec, portrait(spec["skin"], spec["hair"], spec["iris"], spec["background"])) for spec in PORTRAITS]
+    report = check_findings(photos)
+
+    batch = [data for _, data in photos] * (args.images // len(photos) + 1)
+    batch = batch[:args.images]
+    report["pool"] = [asyncio.run(pool_throughput(batch, workers)) for workers in sorted({1, args.workers})]
+    rejected = asyncio.run(pool_busy(batch, args.max_pending))
+    report["busy_rejected"] = rejected
+    if rejected != len(batch) - args.max_pending:
+        report["failures"].append(f"{rejected} photos rejected with max_pending={args.max_pending}, expected {len(batch) - args.max_pending}")
+
+    report["recovery"] = {**asyncio.run(pool_recovery(batch[0])), **check_pixel_limit(PORTRAITS[0])}
+    expected_recovery = {
+        "slot_held_after_timeout": True, "slot_released": True, "broken_pool_raised": True, "restarted": True,
+        "pending_after": 0, "png_refused": True, "jpeg_refused": False,
+    }
+    for check, expected in expected_recovery.items():
+        if report["recovery"][check] != expected:
+            report["failures"].append(f"recovery: {check} is {report['recovery'][check]}, expected {expected}")
+
+    print("\n" + "="*60)
+    print("PALETTE-AI Photo Analysis")
+    print("="*60)
+    print(json.dumps(report, indent=2))
+
+    print()
+    for result in report["portraits"]:
+        timings = result["timings_ms"]
+        print(f"📷 {result['portrait']}: {', '.join(result['findings'])}")
+        print(f"   {result['season_without_photo']} -> {result['season_with_photo']}  "
+              f"({timings['total']:.0f}ms: decode {timings['decode']:.0f}, segment {timings['segment']:.0f}, cluster {timings['cluster']:.0f})")
+    for run in report["pool"]:
+        print(f"⚙️  {run['workers']} worker(s): {run['photos_per_second']:.1f} photos/s, p50 {run['latency_ms_p50']:.0f}ms, p95 {run['latency_ms_p95']:.0f}ms")
+    print(f"🚦 {rejected} of {len(batch)} rejected at max_pending={args.max_pending}")
+    print(f"🩹 Recovery: {', '.join(f'{check}={value}' for check, value in report['recovery'].items())}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\n💾 Report saved to {args.output}")
+
+    if report["failures"]:
+        print("\n❌ " + "\n❌ ".join(report["failures"]))
+        sys.exit(1)
+    print("\n✅ Photo analysis checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -51,7 +51,7 @@ PERSONAS = [
             "hair_color": "dark_brown",
             "skin_tone": "medium_olive",
             "eye_color": "dark_brown",
-            "vein_color": "green_olive",
+            "vein_color": "green",
             "jewelry_preference": "gold",
             "colors_worn": ["earth_tones", "brown_beige_camel"],
             "colors_avoided": ["pastels", "bright_jewel_tones"],
@@ -101,7 +101,7 @@ PERSONAS = [
             "hair_color": "golden_blonde",
             "skin_tone": "fair",
             "eye_color": "green",
-            "vein_color": "green_olive",
+            "vein_color": "green",
             "jewelry_preference": "gold",
             "colors_worn": ["pastels", "earth_tones"],
             "colors_avoided": ["black_navy_charcoal"],
@@ -126,8 +126,8 @@ PERSONAS = [
             "hair_color": "light_brown",
             "skin_tone": "light_medium",
             "eye_color": "hazel",
-            "vein_color": "both_not_sure",
-            "jewelry_preference": "both_look_good",
+            "vein_color": "blue_green_mix",
+            "jewelry_preference": "both",
             "colors_worn": ["pastels", "muted_colors", "earth_tones"],
             "colors_avoided": ["bright_jewel_tones"],
             "color_feedback": "depends"
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Worker Memory Benchmark for PALETTE-AI
+Memory per gunicorn worker with the app preloaded in the master (shared
+copy-on-write) versus loaded separately in every worker
+
+Starts gunicorn (gunicorn.conf.py) on a free port against a throwaway SQLite
+database with the fake email transport, sends some traffic so every worker has
+served requests, then reads each process's memory from /proc/<pid>/smaps_rollup
+(Linux only):
+
+    rss   resident memory, counting shared pages in full
+    pss   proportional set size - shared pages divided between their users
+    uss   unique set size - pages only this process uses (what a new worker adds)
+
+Usage:
+    python testing/worker_memory.py --workers 4
+    python testing/worker_memory.py --workers 8 --requests 400 --output memory.json
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from test_personas import PERSONAS
+
+PROJECT_DIR = Path(__file__).parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def children(pid: int) -> List[int]:
+    """PIDs whose parent is pid"""
+    found = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        # Field 4 is the parent PID; the command name (field 2) may contain spaces
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            found.append(int(entry.name))
+    return found
+
+
+def memory(pid: int) -> Dict[str, float]:
+    """RSS, PSS and USS of a process in MB"""
+    fields = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()[1:]:
+        name, value = line.split(":", 1)
+        fields[name] = int(value.split()[0])  # kB
+    return {
+        "rss_mb": round(fields["Rss"] / 1024, 1),
+        "pss_mb": round(fields["Pss"] / 1024, 1),
+        "uss_mb": round((fields["Private_Clean"] + fields["Private_Dirty"]) / 1024, 1),
+    }
+
+
+def measure(preload: bool, workers: int, requests: int, database_url: str) -> dict:
+    """Start gunicorn, load it, and read the memory of the master and every worker"""
+    port = free_port()
+    env = {
+        **os.environ,
+        "APP_PORT": str(port),
+        "WEB_CONCURRENCY": str(workers),
+        "GUNICORN_PRELOAD": "true" if preload else "false",
+        "DATABASE_URL": database_url,
+        "EMAIL_TRANSPORT": "fake",
+        "TESTING_MODE": "true",
+        "DEBUG": "false",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        cwd=PROJECT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        deadline = time.monotonic() + 60
+        with httpx.Client(base_url=base_url, timeout=10.0) as client:
+            # Wait until every worker has booted and the app answers
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError("gunicorn exited during startup")
+                if time.monotonic() > deadline:
+                    raise RuntimeError("gunicorn did not start within 60s")
+                try:
+                    if client.get("/health").status_code == 200 and len(children(server.pid)) == workers:
+                        break
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.2)
+            time.sleep(1.0)  # Let the last workers finish their startup hooks
+
+            for i in range(requests):
+                persona = PERSONAS[i % len(PERSONAS)]
+                email = f"memory{i}@test.com"
+                client.post("/api/submit", json={**persona["input"], "email": email})
+                client.get(f"/api/palette/{email}")
+                client.get("/")
+
+        worker_memory = [memory(pid) for pid in children(server.pid)]
+        master_memory = memory(server.pid)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    def average(key: str) -> float:
+        return round(sum(stats[key] for stats in worker_memory) / len(worker_memory), 1)
+
+    return {
+        "preload": preload,
+        "workers": len(worker_memory),
+        "master": master_memory,
+        "per_worker": {key: average(key) for key in ("rss_mb", "pss_mb", "uss_mb")},
+        "total_pss_mb": round(master_memory["pss_mb"] + sum(stats["pss_mb"] for stats in worker_memory), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per gunicorn worker, with and without preloading")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers")
+    parser.add_argument("--requests", type=int, default=200, help="Submit + lookup + page requests before measuring")
+    parser.add_argument("--output", type=Path, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    if not Path("/proc/self/smaps_rollup").exists():
+        print("❌ /proc/<pid>/smaps_rollup is not available (Linux 4.14+ only)")
+        sys.exit(1)
+
+    database_url = f"sqlite:///{tempfile.mkdtemp()}/worker_memory.db"
+    subprocess.run(
+        [sys.executable, "-c", "import app.models; from app.database import init_db; init_db()"],
+        cwd=PROJECT_DIR, env={**os.environ, "DATABASE_URL": database_url}, check=True, capture_output=True,
+    )
+
+    shared = measure(True, args.workers, args.requests, database_url)
+    separate = measure(False, args.workers, args.requests, database_url)
+    report = {
+        "preloaded": shared,
+        "separate": separate,
+        "pss_saved_per_worker_mb": round(separate["per_worker"]["pss_mb"] - shared["per_worker"]["pss_mb"], 1),
+        "total_pss_saved_mb": round(separate["total_pss_mb"] - shared["total_pss_mb"], 1),
+    }
+
+    print("\n" + "="*60)
+    print("PALETTE-AI Worker Memory")
+    print("="*60)
+    print(json.dumps(report, indent=2))
+    print(f"\n📊 {args.workers} workers: {shared['total_pss_mb']} MB preloaded vs {separate['total_pss_mb']} MB "
+          f"loaded per worker ({report['total_pss_saved_mb']} MB saved, "
+          f"{report['pss_saved_per_worker_mb']} MB per worker)")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\n💾 Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()